@@ -0,0 +1,60 @@
+"""add cost layers and stock valuations
+
+Revision ID: 4e8a1c2f9b7d
+Revises: 1cff539dc1bb
+Create Date: 2026-10-19 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8a1c2f9b7d'
+down_revision = '1cff539dc1bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'cost_layers' not in tables:
+        op.create_table(
+            'cost_layers',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('sequence', sa.Integer(), nullable=False),
+            sa.Column('transaction_id', sa.String(length=36), sa.ForeignKey('inventory_transactions.id'), nullable=True),
+            sa.Column('quantity_received', sa.Integer(), nullable=False),
+            sa.Column('quantity_remaining', sa.Integer(), nullable=False),
+            sa.Column('unit_cost', sa.Float(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('idx_cost_layer_fifo', 'cost_layers', ['product_id', 'warehouse_id', 'sequence'], unique=True)
+    
+    if 'stock_valuations' not in tables:
+        op.create_table(
+            'stock_valuations',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('quantity', sa.Integer(), server_default='0'),
+            sa.Column('total_value', sa.Float(), server_default='0.0'),
+            sa.Column('quantity_issued', sa.Integer(), server_default='0'),
+            sa.Column('cogs_total', sa.Float(), server_default='0.0'),
+            sa.Column('last_layer_sequence', sa.Integer(), server_default='0'),
+            sa.Column('fifo_head_sequence', sa.Integer(), server_default='1'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('idx_valuation_product_warehouse', 'stock_valuations', ['product_id', 'warehouse_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_valuation_product_warehouse', table_name='stock_valuations')
+    op.drop_table('stock_valuations')
+    op.drop_index('idx_cost_layer_fifo', table_name='cost_layers')
+    op.drop_table('cost_layers')
@@ -0,0 +1,64 @@
+"""add cost snapshot to sales order items
+
+Revision ID: 9c3d5e7f1a2b
+Revises: 4e8a1c2f9b7d
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d5e7f1a2b'
+down_revision = '4e8a1c2f9b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    items_columns = [col['name'] for col in inspector.get_columns('sales_order_items')]
+    items_indexes = [idx['name'] for idx in inspector.get_indexes('sales_order_items')]
+    
+    if 'unit_cost' not in items_columns:
+        op.add_column('sales_order_items', sa.Column('unit_cost', sa.Float(), nullable=True))
+    if 'unit_cost_inc_tax' not in items_columns:
+        op.add_column('sales_order_items', sa.Column('unit_cost_inc_tax', sa.Float(), nullable=True))
+    
+    # Backfill existing lines from the product's current cost (best available value)
+    op.execute("""
+        UPDATE sales_order_items
+        SET unit_cost = (
+            SELECT COALESCE(p.cost_price, 0)
+            FROM products p
+            WHERE p.id = sales_order_items.product_id
+        )
+        WHERE unit_cost IS NULL
+    """)
+    op.execute("""
+        UPDATE sales_order_items
+        SET unit_cost_inc_tax = (
+            SELECT COALESCE(
+                NULLIF(p.cost_price_inc_tax, 0),
+                COALESCE(p.cost_price, 0) * (1 + COALESCE(p.tax_rate, 0) / 100.0)
+            )
+            FROM products p
+            WHERE p.id = sales_order_items.product_id
+        )
+        WHERE unit_cost_inc_tax IS NULL
+    """)
+    
+    if 'idx_order_item_profit' not in items_indexes:
+        op.create_index(
+            'idx_order_item_profit',
+            'sales_order_items',
+            ['sales_order_id', 'product_id', 'quantity', 'unit_price', 'discount', 'unit_cost', 'unit_cost_inc_tax']
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_order_item_profit', table_name='sales_order_items')
+    op.drop_column('sales_order_items', 'unit_cost_inc_tax')
+    op.drop_column('sales_order_items', 'unit_cost')
@@ -0,0 +1,122 @@
+"""add product leaderboards
+
+Revision ID: a4c8e2f6b190
+Revises: f6b2d8e4a913
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e2f6b190'
+down_revision = 'f6b2d8e4a913'
+branch_labels = None
+depends_on = None
+
+# Matches app.core.leaderboards.WINDOWS
+WINDOWS = (1, 7, 30)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'product_sales_daily' not in tables:
+        product_sales_daily = op.create_table(
+            'product_sales_daily',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('revenue', sa.Float(), server_default='0.0'),
+            sa.Column('quantity', sa.Integer(), server_default='0')
+        )
+        op.create_index('idx_sales_daily_key', 'product_sales_daily', ['product_id', 'warehouse_id', 'day'], unique=True)
+        op.create_index('idx_sales_daily_day', 'product_sales_daily', ['day'])
+    
+    if 'product_leaderboards' not in tables:
+        product_leaderboards = op.create_table(
+            'product_leaderboards',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('scope', sa.String(length=36), nullable=False),
+            sa.Column('window_days', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('revenue', sa.Float(), server_default='0.0'),
+            sa.Column('quantity', sa.Integer(), server_default='0')
+        )
+        op.create_index('idx_leaderboard_key', 'product_leaderboards', ['scope', 'window_days', 'product_id'], unique=True)
+        op.create_index('idx_leaderboard_revenue', 'product_leaderboards', ['scope', 'window_days', 'revenue'])
+        op.create_index('idx_leaderboard_quantity', 'product_leaderboards', ['scope', 'window_days', 'quantity'])
+    
+    if 'leaderboard_windows' not in tables:
+        leaderboard_windows = op.create_table(
+            'leaderboard_windows',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('window_days', sa.Integer(), nullable=False, unique=True),
+            sa.Column('expired_through', sa.Date(), nullable=False)
+        )
+        if 'product_sales_daily' not in tables and 'product_leaderboards' not in tables:
+            _seed(conn, product_sales_daily, product_leaderboards, leaderboard_windows)
+
+
+def _seed(conn, product_sales_daily, product_leaderboards, leaderboard_windows) -> None:
+    # Same as `python jobs.py leaderboards`: last 30 days of non-cancelled orders
+    today = date.today()
+    first_day = today - timedelta(days=max(WINDOWS) - 1)
+    rows = conn.execute(sa.text("""
+        SELECT i.product_id, o.warehouse_id, DATE(o.order_date),
+               COALESCE(SUM(i.line_total), 0), COALESCE(SUM(i.quantity), 0)
+        FROM sales_order_items i
+        JOIN sales_orders o ON o.id = i.sales_order_id
+        WHERE o.order_date >= :start AND o.order_date < :end AND o.status != 'CANCELLED'
+        GROUP BY i.product_id, o.warehouse_id, DATE(o.order_date)
+    """), {
+        'start': datetime.combine(first_day, datetime.min.time()),
+        'end': datetime.combine(today + timedelta(days=1), datetime.min.time())
+    }).fetchall()
+    
+    daily_rows = []
+    boards = defaultdict(lambda: [0.0, 0])
+    for product_id, warehouse_id, day, revenue, quantity in rows:
+        day = date.fromisoformat(str(day)[:10])
+        daily_rows.append({
+            'id': str(uuid.uuid4()), 'product_id': product_id, 'warehouse_id': warehouse_id,
+            'day': day, 'revenue': float(revenue), 'quantity': int(quantity)
+        })
+        for window in WINDOWS:
+            if day > today - timedelta(days=window):
+                totals = boards[(warehouse_id, window, product_id)]
+                totals[0] += float(revenue)
+                totals[1] += int(quantity)
+    
+    if daily_rows:
+        op.bulk_insert(product_sales_daily, daily_rows)
+    if boards:
+        op.bulk_insert(product_leaderboards, [
+            {
+                'id': str(uuid.uuid4()), 'scope': scope, 'window_days': window, 'product_id': product_id,
+                'revenue': revenue, 'quantity': quantity
+            }
+            for (scope, window, product_id), (revenue, quantity) in boards.items()
+        ])
+    op.bulk_insert(leaderboard_windows, [
+        {'id': str(uuid.uuid4()), 'window_days': window, 'expired_through': today - timedelta(days=window)}
+        for window in WINDOWS
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('leaderboard_windows')
+    op.drop_index('idx_leaderboard_quantity', table_name='product_leaderboards')
+    op.drop_index('idx_leaderboard_revenue', table_name='product_leaderboards')
+    op.drop_index('idx_leaderboard_key', table_name='product_leaderboards')
+    op.drop_table('product_leaderboards')
+    op.drop_index('idx_sales_daily_day', table_name='product_sales_daily')
+    op.drop_index('idx_sales_daily_key', table_name='product_sales_daily')
+    op.drop_table('product_sales_daily')
@@ -0,0 +1,65 @@
+"""add inventory ledger archives
+
+Revision ID: a9d4e2c7b316
+Revises: f3c7a9e1b584
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d4e2c7b316'
+down_revision = 'f3c7a9e1b584'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'inventory_monthly_summaries' not in tables:
+        op.create_table(
+            'inventory_monthly_summaries',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('period', sa.String(length=7), nullable=False),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('quantity_in', sa.Integer(), server_default='0'),
+            sa.Column('quantity_out', sa.Integer(), server_default='0'),
+            sa.Column('net_quantity', sa.Integer(), server_default='0'),
+            sa.Column('transaction_count', sa.Integer(), server_default='0'),
+            sa.Column('last_sale_at', sa.DateTime(timezone=True), nullable=True)
+        )
+        op.create_index('idx_inventory_summary_key', 'inventory_monthly_summaries', ['period', 'product_id', 'warehouse_id'], unique=True)
+    
+    if 'inventory_transaction_archives' not in tables:
+        op.create_table(
+            'inventory_transaction_archives',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('period', sa.String(length=7), nullable=False),
+            sa.Column('file_name', sa.String(length=255), nullable=False, unique=True),
+            sa.Column('row_count', sa.Integer(), server_default='0'),
+            sa.Column('sha256', sa.String(length=64), nullable=False),
+            sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('ix_inventory_transaction_archives_period', 'inventory_transaction_archives', ['period'])
+    
+    # Range scans on created_at (backtracking, forecasting, compaction) stay on recent rows
+    indexes = {idx['name'] for idx in inspector.get_indexes('inventory_transactions')}
+    if 'idx_inventory_txn_created' not in indexes:
+        op.create_index('idx_inventory_txn_created', 'inventory_transactions', ['created_at'])
+    if 'idx_inventory_txn_pair_created' not in indexes:
+        op.create_index('idx_inventory_txn_pair_created', 'inventory_transactions', ['product_id', 'warehouse_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_inventory_txn_pair_created', table_name='inventory_transactions')
+    op.drop_index('idx_inventory_txn_created', table_name='inventory_transactions')
+    op.drop_index('ix_inventory_transaction_archives_period', table_name='inventory_transaction_archives')
+    op.drop_table('inventory_transaction_archives')
+    op.drop_index('idx_inventory_summary_key', table_name='inventory_monthly_summaries')
+    op.drop_table('inventory_monthly_summaries')
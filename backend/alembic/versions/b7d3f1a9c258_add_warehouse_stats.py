@@ -0,0 +1,66 @@
+"""add warehouse stats
+
+Revision ID: b7d3f1a9c258
+Revises: a4c8e2f6b190
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import uuid
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f1a9c258'
+down_revision = 'a4c8e2f6b190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    
+    if 'warehouse_stats' not in inspector.get_table_names():
+        warehouse_stats = op.create_table(
+            'warehouse_stats',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False, unique=True),
+            sa.Column('sku_count', sa.Integer(), server_default='0'),
+            sa.Column('total_units', sa.Integer(), server_default='0'),
+            sa.Column('total_value', sa.Float(), server_default='0.0'),
+            sa.Column('low_stock_count', sa.Integer(), server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('reconciled_at', sa.DateTime(timezone=True), nullable=True)
+        )
+        
+        # Seed from current inventory; request paths keep it up to date from here on
+        rows = conn.execute(sa.text("""
+            SELECT i.warehouse_id,
+                   COUNT(i.id),
+                   COALESCE(SUM(i.quantity_on_hand), 0),
+                   COALESCE(SUM(i.quantity_on_hand * COALESCE(p.cost_price, 0)), 0),
+                   COALESCE(SUM(CASE WHEN i.quantity_on_hand <= COALESCE(p.reorder_point, 0) THEN 1 ELSE 0 END), 0)
+            FROM inventory i
+            JOIN products p ON p.id = i.product_id
+            GROUP BY i.warehouse_id
+        """)).fetchall()
+        # Every warehouse gets a row, since writers only increment it
+        stats = {r[0]: r for r in rows}
+        warehouse_ids = [r[0] for r in conn.execute(sa.text("SELECT id FROM warehouses")).fetchall()]
+        if warehouse_ids:
+            op.bulk_insert(warehouse_stats, [
+                {
+                    'id': str(uuid.uuid4()),
+                    'warehouse_id': warehouse_id,
+                    'sku_count': int(stats[warehouse_id][1]) if warehouse_id in stats else 0,
+                    'total_units': int(stats[warehouse_id][2]) if warehouse_id in stats else 0,
+                    'total_value': float(stats[warehouse_id][3]) if warehouse_id in stats else 0.0,
+                    'low_stock_count': int(stats[warehouse_id][4]) if warehouse_id in stats else 0
+                }
+                for warehouse_id in warehouse_ids
+            ])
+
+
+def downgrade() -> None:
+    op.drop_table('warehouse_stats')
@@ -0,0 +1,62 @@
+"""add cycle counts
+
+Revision ID: c2e9f4b7a631
+Revises: b7d3f1a9c258
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e9f4b7a631'
+down_revision = 'b7d3f1a9c258'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'cycle_count_sessions' not in tables:
+        op.create_table(
+            'cycle_count_sessions',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('status', sa.Enum('OPEN', 'CLOSED', 'CANCELLED', name='cyclecountstatus'), nullable=False),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('scan_count', sa.Integer(), server_default='0'),
+            sa.Column('line_count', sa.Integer(), server_default='0'),
+            sa.Column('variance_units', sa.Integer(), server_default='0'),
+            sa.Column('variance_value', sa.Float(), server_default='0.0'),
+            sa.Column('unknown_codes', sa.Text(), nullable=True),
+            sa.Column('opened_by', sa.String(length=36), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('opened_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('closed_by', sa.String(length=36), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('closed_at', sa.DateTime(timezone=True), nullable=True)
+        )
+        op.create_index('idx_cycle_count_warehouse_status', 'cycle_count_sessions', ['warehouse_id', 'status'])
+    
+    if 'cycle_count_lines' not in tables:
+        op.create_table(
+            'cycle_count_lines',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('session_id', sa.String(length=36), sa.ForeignKey('cycle_count_sessions.id'), nullable=False),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('expected_quantity', sa.Integer(), server_default='0'),
+            sa.Column('counted_quantity', sa.Integer(), server_default='0'),
+            sa.Column('variance', sa.Integer(), server_default='0'),
+            sa.Column('unit_cost', sa.Float(), server_default='0.0'),
+            sa.Column('variance_value', sa.Float(), server_default='0.0')
+        )
+        op.create_index('ix_cycle_count_lines_session_id', 'cycle_count_lines', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cycle_count_lines_session_id', table_name='cycle_count_lines')
+    op.drop_table('cycle_count_lines')
+    op.drop_index('idx_cycle_count_warehouse_status', table_name='cycle_count_sessions')
+    op.drop_table('cycle_count_sessions')
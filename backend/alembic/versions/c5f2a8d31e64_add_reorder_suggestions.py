@@ -0,0 +1,45 @@
+"""add reorder suggestions
+
+Revision ID: c5f2a8d31e64
+Revises: 9c3d5e7f1a2b
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f2a8d31e64'
+down_revision = '9c3d5e7f1a2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    
+    if 'reorder_suggestions' not in inspector.get_table_names():
+        op.create_table(
+            'reorder_suggestions',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('daily_demand', sa.Float(), server_default='0.0'),
+            sa.Column('moving_average', sa.Float(), server_default='0.0'),
+            sa.Column('demand_std', sa.Float(), server_default='0.0'),
+            sa.Column('quantity_on_hand', sa.Integer(), server_default='0'),
+            sa.Column('suggested_reorder_point', sa.Integer(), server_default='0'),
+            sa.Column('suggested_reorder_quantity', sa.Integer(), server_default='0'),
+            sa.Column('days_of_cover', sa.Float(), nullable=True),
+            sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False)
+        )
+        op.create_index('idx_reorder_product_warehouse', 'reorder_suggestions', ['product_id', 'warehouse_id'], unique=True)
+        op.create_index('idx_reorder_warehouse_cover', 'reorder_suggestions', ['warehouse_id', 'days_of_cover'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_reorder_warehouse_cover', table_name='reorder_suggestions')
+    op.drop_index('idx_reorder_product_warehouse', table_name='reorder_suggestions')
+    op.drop_table('reorder_suggestions')
@@ -0,0 +1,55 @@
+"""add stock transfers
+
+Revision ID: d5a1c8e3f472
+Revises: c2e9f4b7a631
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a1c8e3f472'
+down_revision = 'c2e9f4b7a631'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'stock_transfers' not in tables:
+        op.create_table(
+            'stock_transfers',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('from_warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('to_warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('line_count', sa.Integer(), server_default='0'),
+            sa.Column('total_units', sa.Integer(), server_default='0'),
+            sa.Column('total_value', sa.Float(), server_default='0.0'),
+            sa.Column('created_by', sa.String(length=36), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('idx_stock_transfer_created', 'stock_transfers', ['created_at'])
+    
+    if 'stock_transfer_lines' not in tables:
+        op.create_table(
+            'stock_transfer_lines',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('transfer_id', sa.String(length=36), sa.ForeignKey('stock_transfers.id'), nullable=False),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('unit_cost', sa.Float(), server_default='0.0')
+        )
+        op.create_index('ix_stock_transfer_lines_transfer_id', 'stock_transfer_lines', ['transfer_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_transfer_lines_transfer_id', table_name='stock_transfer_lines')
+    op.drop_table('stock_transfer_lines')
+    op.drop_index('idx_stock_transfer_created', table_name='stock_transfers')
+    op.drop_table('stock_transfers')
@@ -0,0 +1,52 @@
+"""add inventory analytics
+
+Revision ID: d8e1b4a7c902
+Revises: c5f2a8d31e64
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e1b4a7c902'
+down_revision = 'c5f2a8d31e64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    
+    if 'inventory_analytics' not in inspector.get_table_names():
+        op.create_table(
+            'inventory_analytics',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('product_id', sa.String(length=36), sa.ForeignKey('products.id'), nullable=False),
+            sa.Column('warehouse_id', sa.String(length=36), sa.ForeignKey('warehouses.id'), nullable=False),
+            sa.Column('period_days', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), server_default='0.0'),
+            sa.Column('revenue_share', sa.Float(), server_default='0.0'),
+            sa.Column('units_sold', sa.Integer(), server_default='0'),
+            sa.Column('abc_class', sa.String(length=1), nullable=False),
+            sa.Column('xyz_class', sa.String(length=1), nullable=False),
+            sa.Column('demand_cv', sa.Float(), nullable=True),
+            sa.Column('quantity_on_hand', sa.Integer(), server_default='0'),
+            sa.Column('average_stock', sa.Float(), server_default='0.0'),
+            sa.Column('turnover', sa.Float(), nullable=True),
+            sa.Column('last_sale_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('days_since_last_sale', sa.Integer(), nullable=True),
+            sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False)
+        )
+        op.create_index('idx_analytics_product_warehouse', 'inventory_analytics', ['product_id', 'warehouse_id'], unique=True)
+        op.create_index('idx_analytics_class', 'inventory_analytics', ['warehouse_id', 'abc_class', 'xyz_class'])
+        op.create_index('idx_analytics_last_sale', 'inventory_analytics', ['days_since_last_sale'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_analytics_last_sale', table_name='inventory_analytics')
+    op.drop_index('idx_analytics_class', table_name='inventory_analytics')
+    op.drop_index('idx_analytics_product_warehouse', table_name='inventory_analytics')
+    op.drop_table('inventory_analytics')
@@ -0,0 +1,64 @@
+"""add gst monthly summaries
+
+Revision ID: e3a7c9d2f415
+Revises: d8e1b4a7c902
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c9d2f415'
+down_revision = 'd8e1b4a7c902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    
+    if 'gst_monthly_summaries' not in tables:
+        op.create_table(
+            'gst_monthly_summaries',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('period', sa.String(length=7), nullable=False),
+            sa.Column('hsn_sac', sa.String(length=50), nullable=False),
+            sa.Column('tax_rate', sa.Float(), nullable=False),
+            sa.Column('supply_type', sa.String(length=10), nullable=False),
+            sa.Column('quantity', sa.Integer(), server_default='0'),
+            sa.Column('taxable_value', sa.Float(), server_default='0.0'),
+            sa.Column('igst', sa.Float(), server_default='0.0'),
+            sa.Column('cgst', sa.Float(), server_default='0.0'),
+            sa.Column('sgst', sa.Float(), server_default='0.0'),
+            sa.Column('total_value', sa.Float(), server_default='0.0'),
+            sa.Column('line_count', sa.Integer(), server_default='0')
+        )
+        op.create_index('idx_gst_summary_key', 'gst_monthly_summaries', ['period', 'hsn_sac', 'tax_rate', 'supply_type'], unique=True)
+    
+    if 'gst_closed_periods' not in tables:
+        op.create_table(
+            'gst_closed_periods',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('period', sa.String(length=7), nullable=False, unique=True),
+            sa.Column('line_count', sa.Integer(), server_default='0'),
+            sa.Column('taxable_value', sa.Float(), server_default='0.0'),
+            sa.Column('tax_total', sa.Float(), server_default='0.0'),
+            sa.Column('closed_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('closed_by', sa.String(length=36), sa.ForeignKey('users.id'), nullable=True)
+        )
+    
+    # Range scans on order date drive both the live and the closing aggregate
+    indexes = {idx['name'] for idx in inspector.get_indexes('sales_orders')}
+    if 'idx_sales_order_date_status' not in indexes:
+        op.create_index('idx_sales_order_date_status', 'sales_orders', ['order_date', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_sales_order_date_status', table_name='sales_orders')
+    op.drop_table('gst_closed_periods')
+    op.drop_index('idx_gst_summary_key', table_name='gst_monthly_summaries')
+    op.drop_table('gst_monthly_summaries')
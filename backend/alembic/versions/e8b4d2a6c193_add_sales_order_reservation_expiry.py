@@ -0,0 +1,30 @@
+"""add sales order reservation expiry
+
+Revision ID: e8b4d2a6c193
+Revises: d5a1c8e3f472
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4d2a6c193'
+down_revision = 'd5a1c8e3f472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('sales_orders')]
+    
+    # Existing orders keep their holds on inventory.quantity_reserved (NULL here)
+    if 'reservation_expires_at' not in columns:
+        op.add_column('sales_orders', sa.Column('reservation_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sales_orders', 'reservation_expires_at')
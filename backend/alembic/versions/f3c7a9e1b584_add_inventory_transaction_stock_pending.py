@@ -0,0 +1,33 @@
+"""add inventory transaction stock_pending
+
+Revision ID: f3c7a9e1b584
+Revises: e8b4d2a6c193
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7a9e1b584'
+down_revision = 'e8b4d2a6c193'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('inventory_transactions')]
+    indexes = [i['name'] for i in inspector.get_indexes('inventory_transactions')]
+    
+    if 'stock_pending' not in columns:
+        op.add_column('inventory_transactions', sa.Column('stock_pending', sa.Boolean(), server_default=sa.false(), nullable=True))
+    if 'idx_inventory_txn_pending' not in indexes:
+        op.create_index('idx_inventory_txn_pending', 'inventory_transactions', ['stock_pending'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_inventory_txn_pending', table_name='inventory_transactions')
+    op.drop_column('inventory_transactions', 'stock_pending')
@@ -0,0 +1,46 @@
+"""add customer receivables
+
+Revision ID: f6b2d8e4a913
+Revises: e3a7c9d2f415
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b2d8e4a913'
+down_revision = 'e3a7c9d2f415'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    
+    columns = [col['name'] for col in inspector.get_columns('sales_orders')]
+    if 'amount_paid' not in columns:
+        op.add_column('sales_orders', sa.Column('amount_paid', sa.Float(), server_default='0.0'))
+    
+    if 'customer_receivables' not in inspector.get_table_names():
+        op.create_table(
+            'customer_receivables',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('customer_id', sa.String(length=36), sa.ForeignKey('customers.id'), nullable=False),
+            sa.Column('due_date', sa.Date(), nullable=False),
+            sa.Column('amount', sa.Float(), server_default='0.0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+        )
+        op.create_index('idx_receivable_customer_due', 'customer_receivables', ['customer_id', 'due_date'], unique=True)
+        op.create_index('idx_receivable_due', 'customer_receivables', ['due_date'])
+    
+    # Populate the ledger from existing orders with: python jobs.py receivables
+
+
+def downgrade() -> None:
+    op.drop_index('idx_receivable_due', table_name='customer_receivables')
+    op.drop_index('idx_receivable_customer_due', table_name='customer_receivables')
+    op.drop_table('customer_receivables')
+    op.drop_column('sales_orders', 'amount_paid')
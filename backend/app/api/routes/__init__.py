@@ -1,3 +1,3 @@
 # Empty file to make this a Python package
 # This file can be used to import all routers
-from . import auth, products, sales, customers, warehouses, inventory, alerts, audit, reports, invoices
+from . import auth, products, sales, customers, warehouses, inventory, alerts, audit, reports, invoices, forecasting, analytics, cycle_counts, stock_transfers, reservations, events
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
+from app.core.events import ALERT, alert_event, publish, publish_alert
 from app.models.models import (
     InventoryAlert, Product, Warehouse, Inventory, User, AlertStatus
 )
@@ -51,6 +52,7 @@ async def acknowledge_alert(
     alert.status = AlertStatus.ACKNOWLEDGED
     db.commit()
     db.refresh(alert)
+    publish_alert("acknowledged", alert)
     
     return alert
 
@@ -74,6 +76,7 @@ async def resolve_alert(
     alert.resolved_by = current_user.id
     db.commit()
     db.refresh(alert)
+    publish_alert("resolved", alert)
     
     return alert
 
@@ -87,6 +90,7 @@ async def check_inventory_alerts(
     from app.models.models import AlertType
     
     alerts_created = 0
+    raised = []
     
     # Get all inventory records
     inventories = db.query(Inventory).join(Product).all()
@@ -114,6 +118,7 @@ async def check_inventory_alerts(
                     message=f"Low stock alert: {product.name} has {inventory.quantity_on_hand} units (reorder point: {product.reorder_point})"
                 )
                 db.add(alert)
+                raised.append(alert)
                 alerts_created += 1
         
         # Check for out of stock
@@ -135,9 +140,15 @@ async def check_inventory_alerts(
                     message=f"Out of stock alert: {product.name} is out of stock"
                 )
                 db.add(alert)
+                raised.append(alert)
                 alerts_created += 1
     
+    # Snapshot the new alerts before the commit expires them
+    db.flush()
+    raised = [alert_event("raised", alert) for alert in raised]
     db.commit()
+    for event in raised:
+        publish(ALERT, event)
     
     return {
         "message": f"Alert check completed. {alerts_created} new alerts created.",
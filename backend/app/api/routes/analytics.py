@@ -0,0 +1,153 @@
+"""Inventory analytics endpoints (ABC/XYZ classification, turnover, dead stock)."""
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Optional
+
+from app.core.database import get_db
+from app.core.auth import get_current_user, get_current_active_admin
+from app.core.analytics import run_inventory_analytics
+from app.models.models import InventoryAnalytics, Product, Warehouse, User
+
+router = APIRouter()
+
+SORT_COLUMNS = {
+    "revenue": InventoryAnalytics.revenue.desc(),
+    "turnover": InventoryAnalytics.turnover.asc(),
+    "days_since_last_sale": InventoryAnalytics.days_since_last_sale.desc(),
+    "quantity_on_hand": InventoryAnalytics.quantity_on_hand.desc(),
+}
+
+
+@router.get("/inventory")
+async def get_inventory_analytics(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    warehouse_id: Optional[str] = None,
+    product_id: Optional[str] = None,
+    abc_class: Optional[str] = Query(None, regex="^[ABC]$"),
+    xyz_class: Optional[str] = Query(None, regex="^[XYZ]$"),
+    min_days_since_last_sale: Optional[int] = Query(None, ge=0),
+    dead_stock_only: bool = False,
+    sort_by: str = Query("revenue", regex="^(revenue|turnover|days_since_last_sale|quantity_on_hand)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get ABC/XYZ class, turnover and last-sale age per product and warehouse.
+    
+    Reads the precomputed inventory_analytics table only.
+    
+    Filters:
+    - abc_class / xyz_class: classification to match
+    - min_days_since_last_sale: only pairs not sold for at least this many days
+    - dead_stock_only: only pairs holding stock with no sales in the period
+    """
+    query = db.query(
+        InventoryAnalytics,
+        Product.name.label("product_name"),
+        Product.sku,
+        Warehouse.name.label("warehouse_name")
+    ).join(
+        Product, InventoryAnalytics.product_id == Product.id
+    ).join(
+        Warehouse, InventoryAnalytics.warehouse_id == Warehouse.id
+    )
+    
+    if warehouse_id:
+        query = query.filter(InventoryAnalytics.warehouse_id == warehouse_id)
+    
+    if product_id:
+        query = query.filter(InventoryAnalytics.product_id == product_id)
+    
+    if abc_class:
+        query = query.filter(InventoryAnalytics.abc_class == abc_class)
+    
+    if xyz_class:
+        query = query.filter(InventoryAnalytics.xyz_class == xyz_class)
+    
+    if min_days_since_last_sale is not None:
+        query = query.filter(
+            (InventoryAnalytics.days_since_last_sale >= min_days_since_last_sale) |
+            (InventoryAnalytics.days_since_last_sale.is_(None))
+        )
+    
+    if dead_stock_only:
+        query = query.filter(
+            InventoryAnalytics.units_sold == 0,
+            InventoryAnalytics.quantity_on_hand > 0
+        )
+    
+    total = query.count()
+    rows = query.order_by(SORT_COLUMNS[sort_by]).offset(skip).limit(limit).all()
+    
+    return {
+        "computed_at": db.query(func.max(InventoryAnalytics.computed_at)).scalar(),
+        "total": total,
+        "items": [
+            {
+                "product_id": a.product_id,
+                "product_name": product_name,
+                "sku": sku,
+                "warehouse_id": a.warehouse_id,
+                "warehouse_name": warehouse_name,
+                "period_days": a.period_days,
+                "revenue": a.revenue,
+                "revenue_share": a.revenue_share,
+                "units_sold": a.units_sold,
+                "abc_class": a.abc_class,
+                "xyz_class": a.xyz_class,
+                "demand_cv": a.demand_cv,
+                "quantity_on_hand": a.quantity_on_hand,
+                "average_stock": a.average_stock,
+                "turnover": a.turnover,
+                "last_sale_at": a.last_sale_at,
+                "days_since_last_sale": a.days_since_last_sale
+            }
+            for a, product_name, sku, warehouse_name in rows
+        ]
+    }
+
+
+@router.get("/inventory/matrix")
+async def get_abc_xyz_matrix(
+    warehouse_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get product/warehouse counts and revenue for each ABC x XYZ cell."""
+    query = db.query(
+        InventoryAnalytics.abc_class,
+        InventoryAnalytics.xyz_class,
+        func.count(InventoryAnalytics.id).label("count"),
+        func.sum(InventoryAnalytics.revenue).label("revenue")
+    )
+    
+    if warehouse_id:
+        query = query.filter(InventoryAnalytics.warehouse_id == warehouse_id)
+    
+    rows = query.group_by(InventoryAnalytics.abc_class, InventoryAnalytics.xyz_class).all()
+    
+    return [
+        {
+            "abc_class": r.abc_class,
+            "xyz_class": r.xyz_class,
+            "count": r.count,
+            "revenue": float(r.revenue or 0)
+        }
+        for r in rows
+    ]
+
+
+@router.post("/run")
+async def run_analytics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Recompute inventory analytics now (normally runs as a nightly job)."""
+    count = await run_in_threadpool(run_inventory_analytics, db)
+    return {
+        "message": f"Analytics completed for {count} product/warehouse pairs.",
+        "pairs": count
+    }
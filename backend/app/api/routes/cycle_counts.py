@@ -0,0 +1,228 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from collections import Counter
+from datetime import datetime
+import json
+
+from app.core.database import get_db
+from app.core.auth import get_current_user
+from app.core.cycle_counts import scan_buffer, close_session
+from app.models.models import (
+    CycleCountSession, CycleCountLine, CycleCountStatus, Product, Warehouse, User
+)
+from app.schemas.schemas import (
+    CycleCountCreate,
+    CycleCountScanBatch,
+    CycleCountClose,
+    CycleCountSessionResponse,
+    CycleCountSessionDetail
+)
+
+router = APIRouter()
+
+
+def _session_response(session: CycleCountSession, **extra) -> dict:
+    return {
+        **{c.name: getattr(session, c.name) for c in session.__table__.columns},
+        "scan_count": scan_buffer.scan_count(session.id) if session.status == CycleCountStatus.OPEN else session.scan_count,
+        "unknown_codes": json.loads(session.unknown_codes) if session.unknown_codes else [],
+        **extra
+    }
+
+
+def _check_tallies(session: CycleCountSession) -> None:
+    # scan_count is set by the first batch; tallies missing after that were lost
+    if session.scan_count and not scan_buffer.is_open(session.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The scans of this cycle count were lost (scan buffer restarted); cancel it and count again"
+        )
+
+
+def _get_session(db: Session, session_id: str, open_only: bool = False) -> CycleCountSession:
+    query = db.query(CycleCountSession).filter(CycleCountSession.id == session_id)
+    if open_only:
+        query = query.with_for_update()
+    session = query.first()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cycle count session not found"
+        )
+    if open_only and session.status != CycleCountStatus.OPEN:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cycle count session is {session.status.value}"
+        )
+    return session
+
+
+@router.get("/", response_model=List[CycleCountSessionResponse])
+async def get_cycle_counts(
+    warehouse_id: Optional[str] = None,
+    status_filter: Optional[CycleCountStatus] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List cycle count sessions, newest first."""
+    query = db.query(CycleCountSession)
+    if warehouse_id:
+        query = query.filter(CycleCountSession.warehouse_id == warehouse_id)
+    if status_filter:
+        query = query.filter(CycleCountSession.status == status_filter)
+    sessions = query.order_by(CycleCountSession.opened_at.desc()).offset(skip).limit(limit).all()
+    return [_session_response(session) for session in sessions]
+
+
+@router.post("/", response_model=CycleCountSessionResponse, status_code=status.HTTP_201_CREATED)
+async def open_cycle_count(
+    payload: CycleCountCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Open a cycle count session for a warehouse (one open session per warehouse)."""
+    warehouse = db.query(Warehouse).filter(Warehouse.id == payload.warehouse_id).first()
+    if not warehouse:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Warehouse not found"
+        )
+
+    existing = db.query(CycleCountSession).filter(
+        CycleCountSession.warehouse_id == payload.warehouse_id,
+        CycleCountSession.status == CycleCountStatus.OPEN
+    ).first()
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Warehouse already has an open cycle count ({existing.id})"
+        )
+
+    session = CycleCountSession(
+        warehouse_id=payload.warehouse_id,
+        status=CycleCountStatus.OPEN,
+        notes=payload.notes,
+        opened_by=current_user.id
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    scan_buffer.open(session.id)
+
+    return _session_response(session)
+
+
+@router.get("/{session_id}", response_model=CycleCountSessionDetail)
+async def get_cycle_count(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a session with its live tallies (open) or its count lines (closed)."""
+    session = _get_session(db, session_id)
+
+    if session.status == CycleCountStatus.OPEN:
+        return _session_response(session, tallies=scan_buffer.tallies(session.id))
+
+    lines = db.query(
+        CycleCountLine,
+        Product.name.label("product_name"),
+        Product.sku.label("product_sku")
+    ).join(
+        Product, CycleCountLine.product_id == Product.id
+    ).filter(
+        CycleCountLine.session_id == session.id
+    ).order_by(Product.sku).all()
+
+    return _session_response(session, lines=[
+        {
+            **{c.name: getattr(line, c.name) for c in line.__table__.columns},
+            "product_name": product_name,
+            "product_sku": product_sku
+        }
+        for line, product_name, product_sku in lines
+    ])
+
+
+@router.post("/{session_id}/scans")
+async def add_cycle_count_scans(
+    session_id: str,
+    payload: CycleCountScanBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Record a batch of scans.
+
+    Scans only update the session's tallies in the scan buffer; codes are
+    matched to products and compared with stock when the session closes.
+    """
+    if not scan_buffer.is_open(session_id) or not scan_buffer.scan_count(session_id):
+        # Unknown to this buffer, or first batch: re-arm only a session that
+        # has not scanned yet, and mark it as scanned before taking the batch
+        session = _get_session(db, session_id, open_only=True)
+        _check_tallies(session)
+        scan_buffer.open(session_id)
+        session.scan_count = len(payload.scans)
+        db.commit()
+
+    counts = Counter()
+    for scan in payload.scans:
+        counts[scan.code.strip()] += scan.quantity
+    total = scan_buffer.add(session_id, counts, len(payload.scans))
+
+    return {"accepted": len(payload.scans), "scan_count": total}
+
+
+@router.post("/{session_id}/close", response_model=CycleCountSessionDetail)
+async def close_cycle_count(
+    session_id: str,
+    payload: CycleCountClose,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Close a session: reconcile the tallies against on-hand stock, record the
+    variances and (unless apply is false) adjust stock to the counts.
+    """
+    session = _get_session(db, session_id, open_only=True)
+    _check_tallies(session)
+    session.scan_count = scan_buffer.scan_count(session.id)
+
+    failed = close_session(
+        db, session, scan_buffer.tallies(session.id), current_user.id,
+        zero_uncounted=payload.zero_uncounted, apply=payload.apply
+    )
+    if failed:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Counts could not be applied", "errors": failed}
+        )
+
+    db.commit()
+    scan_buffer.discard(session.id)
+
+    return await get_cycle_count(session.id, db, current_user)
+
+
+@router.post("/{session_id}/cancel", response_model=CycleCountSessionResponse)
+async def cancel_cycle_count(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cancel an open session and discard its scans."""
+    session = _get_session(db, session_id, open_only=True)
+    session.scan_count = scan_buffer.scan_count(session.id)
+    session.status = CycleCountStatus.CANCELLED
+    session.closed_by = current_user.id
+    session.closed_at = datetime.now()
+    db.commit()
+    db.refresh(session)
+    scan_buffer.discard(session.id)
+
+    return _session_response(session)
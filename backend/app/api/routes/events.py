@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.events import EVENT_TYPES, event_bus
+from app.models.models import User
+
+router = APIRouter()
+
+
+def _format(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _authenticate(request: Request, token: Optional[str]) -> None:
+    # EventSource cannot send headers, so the token may come as a query param
+    if token is None:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        token = credentials if scheme.lower() == "bearer" else None
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # A short-lived session: the stream must not hold a connection open
+    db = SessionLocal()
+    try:
+        await get_current_user(token, db)
+    finally:
+        db.close()
+
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    types: Optional[str] = Query(None, description="Comma-separated: stock, order, alert"),
+    warehouse_id: Optional[str] = None,
+    token: Optional[str] = None
+):
+    """
+    Stream change events as server-sent events.
+
+    Events are `stock`, `order` and `alert` (see app.core.events), plus
+    `resync` when this stream fell behind and dropped events; clients
+    should refetch then and after reconnecting. Pass the access token as
+    `token` when the client cannot set an Authorization header.
+    """
+    await _authenticate(request, token)
+
+    wanted = set(EVENT_TYPES)
+    if types:
+        wanted = {t.strip() for t in types.split(",") if t.strip()}
+        unknown = wanted - set(EVENT_TYPES)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown event types: {', '.join(sorted(unknown))}"
+            )
+
+    subscriber = event_bus.subscribe(wanted, warehouse_id)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscriber.overflowed:
+                    while not subscriber.queue.empty():
+                        subscriber.queue.get_nowait()
+                    subscriber.overflowed = False
+                    yield _format("resync", {})
+                    continue
+                yield _format(event["type"], event["data"], event["id"])
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def get_event_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Subscribers connected to this worker."""
+    return {"backend": settings.EVENTS_BACKEND, "subscribers": event_bus.subscriber_count()}
@@ -0,0 +1,104 @@
+"""Demand forecasting and reorder suggestion endpoints."""
+from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Optional
+
+from app.core.database import get_db
+from app.core.auth import get_current_user, get_current_active_admin
+from app.core.forecasting import run_forecast
+from app.models.models import ReorderSuggestion, Product, Warehouse, User
+
+router = APIRouter()
+
+
+@router.get("/reorder-suggestions")
+async def get_reorder_suggestions(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    warehouse_id: Optional[str] = None,
+    product_id: Optional[str] = None,
+    below_reorder_point: bool = False,
+    max_days_of_cover: Optional[float] = Query(None, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get suggested reorder points and quantities from the last forecast run.
+    
+    Filters:
+    - below_reorder_point: only pairs whose stock is at or below the suggested point
+    - max_days_of_cover: only pairs that will run out within this many days
+    """
+    query = db.query(
+        ReorderSuggestion,
+        Product.name.label("product_name"),
+        Product.sku,
+        Product.reorder_point,
+        Product.reorder_quantity,
+        Warehouse.name.label("warehouse_name")
+    ).join(
+        Product, ReorderSuggestion.product_id == Product.id
+    ).join(
+        Warehouse, ReorderSuggestion.warehouse_id == Warehouse.id
+    )
+    
+    if warehouse_id:
+        query = query.filter(ReorderSuggestion.warehouse_id == warehouse_id)
+    
+    if product_id:
+        query = query.filter(ReorderSuggestion.product_id == product_id)
+    
+    if below_reorder_point:
+        query = query.filter(
+            ReorderSuggestion.quantity_on_hand <= ReorderSuggestion.suggested_reorder_point
+        )
+    
+    if max_days_of_cover is not None:
+        query = query.filter(ReorderSuggestion.days_of_cover <= max_days_of_cover)
+    
+    total = query.count()
+    rows = query.order_by(
+        ReorderSuggestion.days_of_cover.is_(None),
+        ReorderSuggestion.days_of_cover
+    ).offset(skip).limit(limit).all()
+    
+    computed_at = db.query(func.max(ReorderSuggestion.computed_at)).scalar()
+    
+    return {
+        "computed_at": computed_at,
+        "total": total,
+        "items": [
+            {
+                "product_id": s.product_id,
+                "product_name": product_name,
+                "sku": sku,
+                "warehouse_id": s.warehouse_id,
+                "warehouse_name": warehouse_name,
+                "quantity_on_hand": s.quantity_on_hand,
+                "daily_demand": s.daily_demand,
+                "moving_average": s.moving_average,
+                "demand_std": s.demand_std,
+                "days_of_cover": s.days_of_cover,
+                "suggested_reorder_point": s.suggested_reorder_point,
+                "suggested_reorder_quantity": s.suggested_reorder_quantity,
+                "current_reorder_point": reorder_point,
+                "current_reorder_quantity": reorder_quantity
+            }
+            for s, product_name, sku, reorder_point, reorder_quantity, warehouse_name in rows
+        ]
+    }
+
+
+@router.post("/run")
+async def run_demand_forecast(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Recompute reorder suggestions now (normally runs as a nightly job)."""
+    count = await run_in_threadpool(run_forecast, db)
+    return {
+        "message": f"Forecast completed for {count} product/warehouse pairs.",
+        "pairs": count
+    }
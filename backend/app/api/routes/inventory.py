@@ -1,34 +1,165 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
+from datetime import datetime, timedelta
+import base64
+import json
 
 from app.core.database import get_db
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, get_current_active_admin
+from app.core.availability import bulk_availability
+from app.core.costing import apply_stock_movement
+from app.core.db_retry import retry_stats, retry_transaction
+from app.core.events import publish_stock
+from app.core.stock_adjustments import apply_adjustments, APPLIED, UNCHANGED, ERROR
+from app.core.stock_timeline import as_local_naive, stock_timeline, AUTO, DAY, MOVEMENT
+from app.core.stock_transfers import transfer_stock, transfer_changes, TransferLine
+from app.core.reservations import held_quantities
+from app.core.stock_coalescer import stock_coalescer
+from app.core.warehouse_stats import record_stock_change
 from app.models.models import Inventory, Product, Warehouse, User, InventoryTransaction, TransactionType
 from app.schemas.schemas import (
     InventoryResponse,
+    InventoryProductTotals,
     InventoryCreate,
     InventoryUpdate,
-    InventoryAdjustment
+    InventoryAdjustment,
+    BulkInventoryAdjustment,
+    StockTimeline,
+    AvailabilityLookup,
+    BulkAvailability
 )
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[InventoryResponse])
+INVENTORY_SORTS = {
+    "sku": Product.sku,
+    "name": Product.name,
+    "warehouse": Warehouse.name,
+    "quantity": Inventory.quantity_on_hand,
+    "updated": Inventory.last_updated_at,
+}
+TOTAL_SORTS = {
+    "sku": Product.sku,
+    "name": Product.name,
+    "quantity": func.sum(Inventory.quantity_on_hand),
+}
+
+
+def _encode_cursor(value, row_id: str) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort: str):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "updated" and value is not None:
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return value, row_id
+
+
+def _after_cursor(sort_column, id_column, cursor: Optional[str], sort: str, descending: bool):
+    """Keyset condition for rows after the cursor in (sort_column, id) order."""
+    value, row_id = _decode_cursor(cursor, sort)
+    if descending:
+        return or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+    return or_(sort_column > value, and_(sort_column == value, id_column > row_id))
+
+
+@router.get("/", response_model=Union[List[InventoryResponse], List[InventoryProductTotals]])
 async def get_inventory(
+    response: Response,
     warehouse_id: str = None,
     product_id: str = None,
+    search: Optional[str] = None,
+    low_stock_only: bool = False,
+    aggregate: Optional[str] = Query(None, regex="^product$"),
+    sort: str = Query("sku", regex="^(sku|name|warehouse|quantity|updated)$"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get inventory levels with optional filtering."""
-    from sqlalchemy.orm import joinedload
-    
-    query = db.query(Inventory).options(
-        joinedload(Inventory.product),
-        joinedload(Inventory.warehouse)
-    )
+    """
+    Get inventory levels with filtering, sorting and cursor pagination.
+    
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the
+    next page; it is absent on the last page.
+    
+    Query params:
+    - search: SKU or product name prefix
+    - low_stock_only: on hand at or below the product's reorder point
+      (per warehouse, or across warehouses with aggregate=product)
+    - aggregate=product: one row per product with totals across warehouses
+    - sort: sku | name | warehouse | quantity | updated (aggregate: sku | name | quantity)
+    """
+    descending = order == "desc"
+    
+    if aggregate == "product":
+        if sort not in TOTAL_SORTS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Sort '{sort}' is not available with aggregate=product"
+            )
+        sort_column = TOTAL_SORTS[sort]
+        id_column = Product.id
+        total_on_hand = func.sum(Inventory.quantity_on_hand)
+        query = db.query(
+            Product.id.label("product_id"),
+            Product.name.label("product_name"),
+            Product.sku.label("product_sku"),
+            Product.cost_price.label("product_cost_price"),
+            Product.selling_price.label("product_selling_price"),
+            Product.reorder_point,
+            func.count(Inventory.id).label("warehouse_count"),
+            total_on_hand.label("quantity_on_hand"),
+            func.sum(Inventory.quantity_reserved).label("quantity_reserved"),
+            func.max(Inventory.last_updated_at).label("last_updated_at")
+        ).join(
+            Inventory, Inventory.product_id == Product.id
+        ).group_by(
+            Product.id, Product.name, Product.sku, Product.cost_price,
+            Product.selling_price, Product.reorder_point
+        )
+        if low_stock_only:
+            query = query.having(total_on_hand <= Product.reorder_point)
+        if cursor:
+            query = query.having(_after_cursor(sort_column, id_column, cursor, sort, descending))
+    else:
+        sort_column = INVENTORY_SORTS[sort]
+        id_column = Inventory.id
+        query = db.query(
+            Inventory.id,
+            Inventory.product_id,
+            Inventory.warehouse_id,
+            Inventory.quantity_on_hand,
+            Inventory.quantity_reserved,
+            Inventory.last_counted_at,
+            Inventory.last_updated_at,
+            Product.name.label("product_name"),
+            Product.sku.label("product_sku"),
+            Product.cost_price.label("product_cost_price"),
+            Product.selling_price.label("product_selling_price"),
+            Warehouse.name.label("warehouse_name")
+        ).join(
+            Product, Inventory.product_id == Product.id
+        ).join(
+            Warehouse, Inventory.warehouse_id == Warehouse.id
+        )
+        if low_stock_only:
+            query = query.filter(Inventory.quantity_on_hand <= Product.reorder_point)
+        if cursor:
+            query = query.filter(_after_cursor(sort_column, id_column, cursor, sort, descending))
     
     if warehouse_id:
         query = query.filter(Inventory.warehouse_id == warehouse_id)
@@ -36,22 +167,73 @@ async def get_inventory(
     if product_id:
         query = query.filter(Inventory.product_id == product_id)
     
-    inventory_items = query.all()
-    
-    # Build response with product and warehouse names
-    result = []
-    for item in inventory_items:
-        item_dict = {
-            **{c.name: getattr(item, c.name) for c in item.__table__.columns},
-            'product_name': item.product.name if item.product else 'Unknown',
-            'product_sku': item.product.sku if item.product else 'N/A',
-            'product_cost_price': item.product.cost_price if item.product else 0.0,
-            'product_selling_price': item.product.selling_price if item.product else 0.0,
-            'warehouse_name': item.warehouse.name if item.warehouse else 'Unknown'
-        }
-        result.append(item_dict)
+    if search:
+        query = query.filter(
+            (Product.sku.startswith(search, autoescape=True)) |
+            (Product.name.startswith(search, autoescape=True))
+        )
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+    
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = last.quantity_on_hand if sort == "quantity" else {
+            "sku": last.product_sku,
+            "name": last.product_name,
+            "warehouse": getattr(last, "warehouse_name", None),
+            "updated": last.last_updated_at
+        }[sort]
+        response.headers["X-Next-Cursor"] = _encode_cursor(
+            sort_value, last.product_id if aggregate == "product" else last.id
+        )
+    
+    # Holds in the reservation ledger count as reserved
+    results = [row._asdict() for row in rows]
+    if aggregate == "product":
+        warehouse_ids = [warehouse_id] if warehouse_id else [w for (w,) in db.query(Warehouse.id)]
+        by_product = {r["product_id"]: r for r in results}
+        held = held_quantities((product_id, w) for product_id in by_product for w in warehouse_ids)
+        for (product_id, _), quantity in held.items():
+            by_product[product_id]["quantity_reserved"] = (by_product[product_id]["quantity_reserved"] or 0) + quantity
+    else:
+        held = held_quantities((r["product_id"], r["warehouse_id"]) for r in results)
+        for r in results:
+            r["quantity_reserved"] = (r["quantity_reserved"] or 0) + held.get((r["product_id"], r["warehouse_id"]), 0)
+    
+    return results
+
+
+@router.post("/availability", response_model=BulkAvailability)
+async def get_bulk_availability(
+    lookup: AvailabilityLookup,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Available stock for many products at once, by id or SKU.
+
+    Without a warehouse the figures cover all active warehouses. Results
+    are cached for a few seconds (AVAILABILITY_CACHE_TTL_SECONDS), so use
+    them for display; orders and reservations check live stock.
+    """
+    if not lookup.product_ids and not lookup.skus:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give product_ids or skus"
+        )
+    if lookup.warehouse_id and not db.query(Warehouse.id).filter(Warehouse.id == lookup.warehouse_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Warehouse not found"
+        )
     
-    return result
+    items, not_found = bulk_availability(db, lookup.product_ids, lookup.skus, lookup.warehouse_id)
+    return {"warehouse_id": lookup.warehouse_id, "items": items, "not_found": not_found}
 
 
 @router.get("/product/{product_id}/warehouses", response_model=List[InventoryResponse])
@@ -65,7 +247,152 @@ async def get_product_inventory_by_warehouse(
     return inventory
 
 
+@router.get("/product/{product_id}/timeline", response_model=StockTimeline)
+async def get_product_stock_timeline(
+    product_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    warehouse_id: Optional[List[str]] = Query(None),
+    bucket: str = Query(AUTO, pattern=f"^({AUTO}|{MOVEMENT}|{DAY})$"),
+    max_points: int = Query(500, ge=10, le=5000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stock level of a product over time, per warehouse.
+    
+    Defaults to the last 90 days. `bucket=movement` gives the level after
+    every transaction; `day` gives daily closing levels with the day's
+    min/max and in/out, merged into n-day buckets to stay within
+    `max_points`; `auto` picks movements when they fit.
+    """
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
+    end = as_local_naive(end) or datetime.now()
+    start = as_local_naive(start) or end - timedelta(days=90)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    return stock_timeline(db, product_id, start, end, warehouse_id, bucket, max_points)
+
+
+@router.get("/matrix")
+async def get_stock_matrix(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    search: Optional[str] = None,
+    category_id: Optional[str] = None,
+    warehouse_id: Optional[List[str]] = Query(None),
+    in_stock_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get stock levels as a products x warehouses matrix.
+
+    Products (paginated by SKU) and warehouses are returned once as column
+    arrays; `on_hand` and `reserved` are dense row-major arrays of
+    len(products) * len(warehouses) where cell [p * len(warehouses) + w]
+    is product p in warehouse w (0 when there is no inventory row).
+
+    Query params:
+    - search: matches product name, SKU or barcode
+    - category_id: product category
+    - warehouse_id: repeat to restrict the warehouse columns
+    - in_stock_only: only products with stock on hand in those warehouses
+    """
+    warehouse_query = db.query(Warehouse.id, Warehouse.name).order_by(Warehouse.name)
+    if warehouse_id:
+        warehouse_query = warehouse_query.filter(Warehouse.id.in_(warehouse_id))
+    warehouses = warehouse_query.all()
+    position = {w.id: i for i, w in enumerate(warehouses)}
+
+    def stock_in_warehouses(product_id_column):
+        condition = Inventory.product_id == product_id_column
+        if warehouse_id:
+            condition = and_(condition, Inventory.warehouse_id.in_(warehouse_id))
+        return condition
+
+    products = db.query(
+        Product.id, Product.sku, Product.name, Product.cost_price,
+        Product.selling_price, Product.reorder_point
+    )
+    if search:
+        products = products.filter(
+            (Product.name.contains(search)) |
+            (Product.sku.contains(search)) |
+            (Product.barcode.contains(search))
+        )
+    if category_id:
+        products = products.filter(Product.category_id == category_id)
+    if in_stock_only:
+        products = products.filter(
+            db.query(Inventory.id).filter(
+                stock_in_warehouses(Product.id), Inventory.quantity_on_hand > 0
+            ).exists()
+        )
+    # One extra product tells whether there is a next page
+    page = products.order_by(Product.sku).offset(skip).limit(limit + 1).subquery()
+
+    rows = db.query(
+        page,
+        Inventory.warehouse_id,
+        Inventory.quantity_on_hand,
+        Inventory.quantity_reserved
+    ).outerjoin(
+        Inventory, stock_in_warehouses(page.c.id)
+    ).order_by(page.c.sku).all()
+
+    product_columns = {field: [] for field in ("id", "sku", "name", "cost_price", "selling_price", "reorder_point")}
+    on_hand = []
+    reserved = []
+    width = len(warehouses)
+    has_more = False
+    for row in rows:
+        if not product_columns["id"] or product_columns["id"][-1] != row.id:
+            if len(product_columns["id"]) == limit:
+                has_more = True
+                break
+            for field, values in product_columns.items():
+                values.append(getattr(row, field))
+            on_hand.extend([0] * width)
+            reserved.extend([0] * width)
+        w = position.get(row.warehouse_id)
+        if w is not None:
+            cell = (len(product_columns["id"]) - 1) * width + w
+            on_hand[cell] = row.quantity_on_hand or 0
+            reserved[cell] = row.quantity_reserved or 0
+
+    # Holds in the reservation ledger count as reserved
+    held = held_quantities(
+        (product_id, w.id) for product_id in product_columns["id"] for w in warehouses
+    )
+    row_of = {product_id: p for p, product_id in enumerate(product_columns["id"])}
+    for (product_id, w), quantity in held.items():
+        reserved[row_of[product_id] * width + position[w]] += quantity
+
+    return {
+        "skip": skip,
+        "limit": limit,
+        "next_skip": skip + limit if has_more else None,
+        "warehouses": {
+            "id": [w.id for w in warehouses],
+            "name": [w.name for w in warehouses]
+        },
+        "products": product_columns,
+        "on_hand": on_hand,
+        "reserved": reserved
+    }
+
+
 @router.post("/adjust", status_code=status.HTTP_200_OK)
+@retry_transaction
 async def adjust_inventory(
     adjustment: InventoryAdjustment,
     db: Session = Depends(get_db),
@@ -88,13 +415,15 @@ async def adjust_inventory(
             detail="Warehouse not found"
         )
     
-    # Get or create inventory record
+    # Get or create inventory record, after taking unflushed coalesced sales off it
+    stock_coalescer.apply_pending(db, [(adjustment.product_id, adjustment.warehouse_id)])
     inventory = db.query(Inventory).filter(
         Inventory.product_id == adjustment.product_id,
         Inventory.warehouse_id == adjustment.warehouse_id
     ).first()
     
-    if not inventory:
+    is_new = inventory is None
+    if is_new:
         inventory = Inventory(
             product_id=adjustment.product_id,
             warehouse_id=adjustment.warehouse_id,
@@ -104,7 +433,8 @@ async def adjust_inventory(
         db.add(inventory)
     
     # Update quantity
-    new_quantity = inventory.quantity_on_hand + adjustment.quantity
+    on_hand_before = inventory.quantity_on_hand
+    new_quantity = on_hand_before + adjustment.quantity
     if new_quantity < 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -113,6 +443,7 @@ async def adjust_inventory(
     
     inventory.quantity_on_hand = new_quantity
     inventory.updated_by = current_user.id
+    record_stock_change(db, adjustment.warehouse_id, product, None if is_new else on_hand_before, new_quantity)
     
     # Create transaction record
     transaction = InventoryTransaction(
@@ -124,9 +455,19 @@ async def adjust_inventory(
         created_by=current_user.id
     )
     db.add(transaction)
+    db.flush()
+    
+    # Keep cost layers in step with the stock movement
+    apply_stock_movement(
+        db, product, adjustment.warehouse_id, adjustment.quantity, on_hand_before,
+        unit_cost=adjustment.unit_cost, transaction_id=transaction.id
+    )
     
     db.commit()
     db.refresh(inventory)
+    publish_stock("adjustment", [
+        (inventory.product_id, inventory.warehouse_id, adjustment.quantity, inventory.quantity_on_hand)
+    ])
     
     return {
         "message": "Inventory adjusted successfully",
@@ -134,7 +475,50 @@ async def adjust_inventory(
     }
 
 
+@router.post("/adjust/bulk", status_code=status.HTTP_200_OK)
+@retry_transaction
+async def bulk_adjust_inventory(
+    payload: BulkInventoryAdjustment,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply many stock adjustments or counts in one transaction.
+    
+    Each line gives a signed `quantity` or an absolute `counted_quantity`.
+    Invalid lines are reported per line and skipped, unless `atomic` is
+    set, in which case the whole batch is rejected with 400.
+    """
+    results = apply_adjustments(db, payload.lines, current_user.id, payload.notes, payload.atomic)
+    summary = {
+        outcome: sum(1 for r in results if r["status"] == outcome)
+        for outcome in (APPLIED, UNCHANGED, ERROR)
+    }
+    
+    if payload.atomic and summary[ERROR]:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "message": f"{summary[ERROR]} invalid lines; nothing was applied",
+                "errors": [r for r in results if r["status"] == ERROR]
+            }
+        )
+    
+    db.commit()
+    
+    changes = {}
+    for r in results:
+        if r["status"] == APPLIED:
+            key = (r["product_id"], r["warehouse_id"])
+            changes[key] = (changes.get(key, (0,))[0] + r["delta"], r["quantity_after"])
+    publish_stock("adjustment", [key + change for key, change in changes.items()])
+    
+    return {**summary, "results": results}
+
+
 @router.put("/{inventory_id}", status_code=status.HTTP_200_OK)
+@retry_transaction
 async def update_inventory(
     inventory_id: str,
     inventory_data: InventoryUpdate,
@@ -154,6 +538,7 @@ async def update_inventory(
     
     # Store old values for audit
     old_values = serialize_model(inventory)
+    on_hand_before = inventory.quantity_on_hand
     
     # Update fields
     update_data = inventory_data.dict(exclude_unset=True)
@@ -169,8 +554,13 @@ async def update_inventory(
     
     inventory.updated_by = current_user.id
     
-    db.commit()
-    db.refresh(inventory)
+    # Direct corrections of on-hand stock still move cost layers
+    if inventory.quantity_on_hand != on_hand_before:
+        apply_stock_movement(
+            db, inventory.product, inventory.warehouse_id,
+            inventory.quantity_on_hand - on_hand_before, on_hand_before
+        )
+        record_stock_change(db, inventory.warehouse_id, inventory.product, on_hand_before, inventory.quantity_on_hand)
     
     # Audit log
     create_audit_log(
@@ -182,7 +572,12 @@ async def update_inventory(
         old_values=old_values,
         new_values=serialize_model(inventory)
     )
+    
     db.commit()
+    db.refresh(inventory)
+    publish_stock("correction", [
+        (inventory.product_id, inventory.warehouse_id, inventory.quantity_on_hand - on_hand_before, inventory.quantity_on_hand)
+    ])
     
     return {
         "message": "Inventory updated successfully",
@@ -191,6 +586,7 @@ async def update_inventory(
 
 
 @router.post("/transfer", status_code=status.HTTP_200_OK)
+@retry_transaction
 async def transfer_inventory(
     product_id: str,
     from_warehouse_id: str,
@@ -200,77 +596,33 @@ async def transfer_inventory(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Transfer inventory between warehouses."""
-    if from_warehouse_id == to_warehouse_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot transfer to the same warehouse"
-        )
+    """
+    Transfer one product between warehouses.
     
+    Kept for existing clients; it records a one-line transfer document.
+    Use POST /stock-transfers to move many products at once.
+    """
     if quantity <= 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Quantity must be positive"
         )
     
-    # Get source inventory
-    source_inventory = db.query(Inventory).filter(
-        Inventory.product_id == product_id,
-        Inventory.warehouse_id == from_warehouse_id
-    ).first()
-    
-    if not source_inventory or source_inventory.quantity_on_hand < quantity:
+    transfer, errors = transfer_stock(
+        db, from_warehouse_id, to_warehouse_id,
+        [TransferLine(product_id, None, quantity)], current_user.id, notes
+    )
+    if errors:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient stock in source warehouse"
-        )
-    
-    # Get or create destination inventory
-    dest_inventory = db.query(Inventory).filter(
-        Inventory.product_id == product_id,
-        Inventory.warehouse_id == to_warehouse_id
-    ).first()
-    
-    if not dest_inventory:
-        dest_inventory = Inventory(
-            product_id=product_id,
-            warehouse_id=to_warehouse_id,
-            quantity_on_hand=0,
-            quantity_reserved=0
+            detail=errors[0]["error"]
         )
-        db.add(dest_inventory)
-    
-    # Perform transfer
-    source_inventory.quantity_on_hand -= quantity
-    source_inventory.updated_by = current_user.id
-    
-    dest_inventory.quantity_on_hand += quantity
-    dest_inventory.updated_by = current_user.id
-    
-    # Create transaction records
-    from_transaction = InventoryTransaction(
-        product_id=product_id,
-        warehouse_id=from_warehouse_id,
-        transaction_type=TransactionType.TRANSFER,
-        quantity=-quantity,
-        notes=f"Transfer to warehouse {to_warehouse_id}. {notes or ''}",
-        created_by=current_user.id
-    )
-    
-    to_transaction = InventoryTransaction(
-        product_id=product_id,
-        warehouse_id=to_warehouse_id,
-        transaction_type=TransactionType.TRANSFER,
-        quantity=quantity,
-        notes=f"Transfer from warehouse {from_warehouse_id}. {notes or ''}",
-        created_by=current_user.id
-    )
     
-    db.add(from_transaction)
-    db.add(to_transaction)
     db.commit()
+    publish_stock("transfer", transfer_changes(db, transfer))
     
-    return {"message": "Inventory transferred successfully"}
+    return {"message": "Inventory transferred successfully", "transfer_id": transfer.id}
 
 
 @router.get("/transactions", response_model=List[dict])
@@ -313,3 +665,28 @@ async def get_transactions(
         }
         for t in transactions
     ]
+
+
+@router.get("/coalescing")
+async def get_coalescing_stats(
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Write coalescing counters for this worker (hot pairs, admissions, flushes)."""
+    return stock_coalescer.stats()
+
+
+@router.post("/coalescing/flush")
+async def flush_coalesced_issues(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Apply all pending coalesced issues now."""
+    return {"applied": stock_coalescer.flush(db)}
+
+
+@router.get("/write-retries")
+async def get_write_retry_stats(
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Lock-conflict retries per write route for this worker (retries, recovered, failed)."""
+    return retry_stats()
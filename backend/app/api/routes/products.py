@@ -6,6 +6,7 @@ from typing import List, Optional
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.core.audit import create_audit_log, serialize_model
+from app.core.warehouse_stats import record_product_change
 from app.models.models import Product, User, Category, Inventory
 from app.schemas.schemas import ProductCreate, ProductUpdate, ProductResponse
 
@@ -177,12 +178,16 @@ async def update_product(
     
     # Store old values for audit
     old_values = serialize_model(product)
+    old_cost_price, old_reorder_point = product.cost_price, product.reorder_point
     
     # Update fields
     update_data = product_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
     
+    # Cost and reorder point feed the warehouse valuation read model
+    record_product_change(db, product, old_cost_price, old_reorder_point)
+    
     db.commit()
     db.refresh(product)
     
@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Dict, List
+from datetime import datetime, timezone
+
+from app.core.database import get_db
+from app.core.auth import get_current_user, get_current_active_admin
+from app.core.reservations import (
+    available_stock, extend_reservation, get_reservation, release_reservation, reserve_stock, sweep_expired
+)
+from app.models.models import Warehouse, User
+from app.schemas.schemas import (
+    ReservationCreate,
+    ReservationExtend,
+    ReservationResponse,
+    StockAvailability
+)
+
+router = APIRouter()
+
+# Sales orders hold stock under "order:<id>"; only the sales routes manage those
+ORDER_PREFIX = "order:"
+
+
+def _hold_response(hold: dict) -> dict:
+    return {**hold, "expires_at": datetime.fromtimestamp(hold["expires_at"], timezone.utc)}
+
+
+def _check_owner(owner: str) -> None:
+    if owner.startswith(ORDER_PREFIX):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sales order reservations are managed through the order"
+        )
+
+
+@router.get("/availability", response_model=List[StockAvailability])
+async def get_availability(
+    warehouse_id: str,
+    product_id: List[str] = Query(..., max_length=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """On hand, reserved and available stock for products in a warehouse."""
+    stock = available_stock(db, warehouse_id, product_id)
+    return [{"product_id": product_id, **values} for product_id, values in stock.items()]
+
+
+@router.post("/", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(
+    payload: ReservationCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Place or replace a hold on stock for a cart or checkout.
+
+    Posting again for the same owner replaces its hold, so a cart can be
+    re-posted whenever it changes. The hold lapses after `ttl_seconds`
+    unless extended or released; all lines are held or none are.
+    """
+    _check_owner(payload.owner)
+    if not db.query(Warehouse.id).filter(Warehouse.id == payload.warehouse_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Warehouse not found"
+        )
+
+    quantities: Dict[str, int] = {}
+    for line in payload.lines:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    expires_at, short = reserve_stock(db, payload.owner, payload.warehouse_id, quantities, payload.ttl_seconds)
+    if short:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Insufficient stock", "product_ids": short}
+        )
+
+    return _hold_response({
+        "owner": payload.owner,
+        "warehouse_id": payload.warehouse_id,
+        "expires_at": expires_at,
+        "lines": quantities
+    })
+
+
+@router.get("/{owner}", response_model=ReservationResponse)
+async def get_reservation_hold(
+    owner: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Get an owner's active hold."""
+    hold = get_reservation(owner)
+    if hold is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active reservation for this owner"
+        )
+    return _hold_response(hold)
+
+
+@router.post("/{owner}/extend", response_model=ReservationResponse)
+async def extend_reservation_hold(
+    owner: str,
+    payload: ReservationExtend,
+    current_user: User = Depends(get_current_user)
+):
+    """Push an active hold's expiry out by `ttl_seconds` from now."""
+    _check_owner(owner)
+    if extend_reservation(owner, payload.ttl_seconds) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active reservation for this owner"
+        )
+    return _hold_response(get_reservation(owner))
+
+
+@router.delete("/{owner}")
+async def release_reservation_hold(
+    owner: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Release an owner's hold (e.g. the cart was checked out or emptied)."""
+    _check_owner(owner)
+    released = release_reservation(owner)
+    return {"released": released}
+
+
+@router.post("/sweep")
+async def sweep_reservations(
+    current_user: User = Depends(get_current_active_admin)
+):
+    """Release a batch of expired holds now."""
+    return {"expired": sweep_expired()}
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from typing import Dict, List
+from datetime import datetime, timezone
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.core.audit import create_audit_log, serialize_model
+from app.core.costing import issue_stock, cost_inc_tax
+from app.core.db_retry import retry_transaction
+from app.core.events import publish_order, publish_stock
+from app.core import leaderboards, receivables
+from app.core.config import settings
+from app.core.reservations import get_reservation, order_owner, reserve_stock, release_reservation
+from app.core.stock_coalescer import stock_coalescer
+from app.core.warehouse_stats import record_stock_change
 from app.models.models import (
     SalesOrder, SalesOrderItem, Customer, Product, Inventory,
-    User, InventoryTransaction, TransactionType, OrderStatus
+    User, InventoryTransaction, TransactionType, OrderStatus, PaymentStatus, generate_uuid
 )
 from app.schemas.schemas import (
     SalesOrderCreate,
@@ -19,6 +27,17 @@ from app.schemas.schemas import (
 router = APIRouter()
 
 
+def _release_legacy_reservation(db: Session, order: SalesOrder) -> None:
+    """Drop the quantity_reserved of an order placed before the reservation ledger."""
+    for item in order.items:
+        inventory = db.query(Inventory).filter(
+            Inventory.product_id == item.product_id,
+            Inventory.warehouse_id == order.warehouse_id
+        ).first()
+        if inventory:
+            inventory.quantity_reserved = max(0, (inventory.quantity_reserved or 0) - item.quantity)
+
+
 def generate_order_number(db: Session) -> str:
     """Generate unique order number."""
     from datetime import datetime
@@ -110,13 +129,14 @@ async def get_sales_order(
 
 
 @router.post("/", response_model=SalesOrderResponse, status_code=status.HTTP_201_CREATED)
+@retry_transaction
 async def create_sales_order(
     order_data: SalesOrderCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new sales order."""
-    # Verify customer exists
+    # Verify customer exists (locked below only if the order touches the balance)
     customer = db.query(Customer).filter(Customer.id == order_data.customer_id).first()
     if not customer:
         raise HTTPException(
@@ -128,6 +148,7 @@ async def create_sales_order(
     order_items = []
     subtotal = 0
     total_tax = 0  # Track total tax from all items
+    products: Dict[str, Product] = {}
     
     for item_data in order_data.items:
         # Fetch product to get tax rate
@@ -137,19 +158,7 @@ async def create_sales_order(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product {item_data.product_id} not found"
             )
-        
-        # Check inventory availability
-        inventory = db.query(Inventory).filter(
-            Inventory.product_id == item_data.product_id,
-            Inventory.warehouse_id == order_data.warehouse_id
-        ).first()
-        
-        available_qty = (inventory.quantity_on_hand - inventory.quantity_reserved) if inventory else 0
-        if available_qty < item_data.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for product {product.name}"
-            )
+        products[product.id] = product
 
         # Use product's tax rate if not provided in item
         tax_rate = item_data.tax_rate if hasattr(item_data, 'tax_rate') and item_data.tax_rate is not None else product.tax_rate
@@ -170,7 +179,10 @@ async def create_sales_order(
             discount=item_data.discount,
             tax_rate=tax_rate,
             tax_amount=tax_amount,
-            line_total=line_total
+            line_total=line_total,
+            # Snapshot cost so historical margins don't follow product edits
+            unit_cost=product.cost_price or 0.0,
+            unit_cost_inc_tax=product.cost_price_inc_tax or cost_inc_tax(product.cost_price or 0.0, product.tax_rate)
         )
         order_items.append(order_item)
         
@@ -246,42 +258,73 @@ async def create_sales_order(
         invoice_date=datetime.now(),
         due_date=order_data.due_date,
         payment_method=order_data.payment_method
-    )    
-    db.add(sales_order)
-    db.flush()  # Get the order ID
+    )
+    if sales_order.payment_status == PaymentStatus.PAID:
+        sales_order.amount_paid = total
+    
+    # Locked so concurrent orders can't both pass the credit check; fully paid
+    # sales to customers without a limit skip it and don't serialize
+    open_amount = receivables.open_amount(sales_order)
+    if receivables.needs_lock(customer, open_amount):
+        customer = receivables.lock_customer(db, customer.id)
+    if not receivables.check_credit(customer, open_amount):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Credit limit exceeded for customer {customer.name} "
+                   f"(outstanding {customer.outstanding_balance:.2f} of {customer.credit_limit:.2f})"
+        )
     
-    # Add order items (already created above) and reserve inventory
+    # Hold the stock in the reservation ledger; an abandoned order's hold lapses
+    sales_order.id = generate_uuid()
+    quantities: Dict[str, int] = {}
     for order_item in order_items:
-        order_item.sales_order_id = sales_order.id
-        db.add(order_item)
+        quantities[order_item.product_id] = quantities.get(order_item.product_id, 0) + order_item.quantity
+    expires_at, short = reserve_stock(
+        db, order_owner(sales_order.id), order_data.warehouse_id, quantities,
+        settings.ORDER_RESERVATION_TTL_SECONDS
+    )
+    if short:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient stock for product {products[short[0]].name}"
+        )
+    sales_order.reservation_expires_at = datetime.fromtimestamp(expires_at, timezone.utc)
+    
+    try:
+        db.add(sales_order)
+        db.flush()
         
-        # Reserve inventory
-        inventory = db.query(Inventory).filter(
-            Inventory.product_id == order_item.product_id,
-            Inventory.warehouse_id == order_data.warehouse_id
-        ).first()
+        # Add order items (already created above)
+        for order_item in order_items:
+            order_item.sales_order_id = sales_order.id
+            db.add(order_item)
         
-        if inventory:
-            inventory.quantity_reserved += order_item.quantity
-    
-    db.commit()
+        receivables.post_order(db, sales_order)
+        leaderboards.record_order(db, sales_order, order_items)
+        db.flush()
+        
+        # Audit log (in the same commit, so a replayed attempt never leaves half an order)
+        create_audit_log(
+            db=db,
+            user_id=current_user.id,
+            action="CREATE",
+            entity_type="SalesOrder",
+            entity_id=sales_order.id,
+            new_values=serialize_model(sales_order)
+        )
+        
+        db.commit()
+    except Exception:
+        release_reservation(order_owner(sales_order.id))
+        raise
     db.refresh(sales_order)
-    
-    # Audit log
-    create_audit_log(
-        db=db,
-        user_id=current_user.id,
-        action="CREATE",
-        entity_type="SalesOrder",
-        entity_id=sales_order.id,
-        new_values=serialize_model(sales_order)
-    )
-    db.commit()
+    publish_order("created", sales_order)
     
     return sales_order
 
 
 @router.put("/{order_id}", response_model=SalesOrderResponse)
+@retry_transaction
 async def update_sales_order(
     order_id: str,
     order_data: SalesOrderUpdate,
@@ -296,18 +339,40 @@ async def update_sales_order(
             detail="Sales order not found"
         )
     
+    receivables.lock_customer(db, order.customer_id)
+    before = receivables.snapshot(order)
+    was_cancelled = order.status == OrderStatus.CANCELLED
+    was_delivered = order.status == OrderStatus.DELIVERED
+    
     # Update fields
     update_data = order_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(order, field, value)
+    if order.payment_status == PaymentStatus.PAID and "amount_paid" not in update_data:
+        order.amount_paid = order.total_amount
+    
+    # Payment and cancellation changes move the customer's receivable
+    receivables.post_order(db, order, before)
+    if (order.status == OrderStatus.CANCELLED) != was_cancelled:
+        leaderboards.record_order(db, order, sign=1 if was_cancelled else -1)
+    
+    # Cancelling an unfulfilled order frees its stock hold
+    release_hold = order.status == OrderStatus.CANCELLED and not was_cancelled and not was_delivered
+    if release_hold and order.reservation_expires_at is None:
+        _release_legacy_reservation(db, order)
     
     db.commit()
+    if release_hold and order.reservation_expires_at is not None:
+        release_reservation(order_owner(order.id))
     db.refresh(order)
+    if order.status == OrderStatus.CANCELLED and not was_cancelled:
+        publish_order("cancelled", order)
     
     return order
 
 
 @router.post("/{order_id}/fulfill", status_code=status.HTTP_200_OK)
+@retry_transaction
 async def fulfill_sales_order(
     order_id: str,
     db: Session = Depends(get_db),
@@ -327,49 +392,112 @@ async def fulfill_sales_order(
             detail="Order already fulfilled"
         )
     
-    # Process each item
-    for item in order.items:
-        inventory = db.query(Inventory).filter(
-            Inventory.product_id == item.product_id,
-            Inventory.warehouse_id == order.warehouse_id
-        ).first()
-        
-        if not inventory:
+    # A hold that lapsed (ORDER_RESERVATION_TTL_SECONDS) let its stock go;
+    # take it again, or refuse, before issuing anything
+    if order.reservation_expires_at is not None and get_reservation(order_owner(order.id)) is None:
+        quantities: Dict[str, int] = {}
+        for item in order.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        expires_at, short = reserve_stock(
+            db, order_owner(order.id), order.warehouse_id, quantities,
+            settings.ORDER_RESERVATION_TTL_SECONDS
+        )
+        if short:
+            product = next(item.product for item in order.items if item.product_id == short[0])
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Inventory record not found for product {item.product_id}"
+                detail=f"Stock hold of this order has lapsed and {product.name} is no longer available"
             )
+        order.reservation_expires_at = datetime.fromtimestamp(expires_at, timezone.utc)
+    
+    # Process each item
+    coalesced = []
+    changes = []
+    try:
+        for item in order.items:
+            # Hot SKUs skip the stock row locks; the flusher applies the issue
+            # (orders still holding quantity_reserved always take the locked path)
+            if order.reservation_expires_at is not None and stock_coalescer.admit(
+                db, item.product_id, order.warehouse_id, item.quantity
+            ):
+                coalesced.append(((item.product_id, order.warehouse_id), item.quantity))
+                item.unit_cost = stock_coalescer.estimate_unit_cost(db, item.product, order.warehouse_id)
+                item.unit_cost_inc_tax = cost_inc_tax(item.unit_cost, item.product.tax_rate)
+                db.add(InventoryTransaction(
+                    product_id=item.product_id,
+                    warehouse_id=order.warehouse_id,
+                    transaction_type=TransactionType.SALE,
+                    quantity=-item.quantity,
+                    reference_id=order.id,
+                    notes=f"Sales order {order.order_number}",
+                    stock_pending=True,
+                    created_by=current_user.id
+                ))
+                changes.append((item.product_id, order.warehouse_id, -item.quantity, None))
+                continue
+        
+            inventory = db.query(Inventory).filter(
+                Inventory.product_id == item.product_id,
+                Inventory.warehouse_id == order.warehouse_id
+            ).with_for_update().first()
         
-        # Deduct from inventory
-        inventory.quantity_reserved -= item.quantity
-        inventory.quantity_on_hand -= item.quantity
-        inventory.updated_by = current_user.id
+            if not inventory:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Inventory record not found for product {item.product_id}"
+                )
         
-        # Create transaction
-        transaction = InventoryTransaction(
-            product_id=item.product_id,
-            warehouse_id=order.warehouse_id,
-            transaction_type=TransactionType.SALE,
-            quantity=-item.quantity,
-            reference_id=order.id,
-            notes=f"Sales order {order.order_number}",
-            created_by=current_user.id
+            # Consume cost layers and record the actual cost of the issued units
+            cost = issue_stock(db, item.product, order.warehouse_id, item.quantity, inventory.quantity_on_hand)
+            if item.quantity:
+                item.unit_cost = cost / item.quantity
+                item.unit_cost_inc_tax = cost_inc_tax(item.unit_cost, item.product.tax_rate)
+        
+            # Deduct from inventory
+            record_stock_change(
+                db, order.warehouse_id, item.product,
+                inventory.quantity_on_hand, inventory.quantity_on_hand - item.quantity
+            )
+            if order.reservation_expires_at is None:
+                inventory.quantity_reserved = max(0, (inventory.quantity_reserved or 0) - item.quantity)
+            inventory.quantity_on_hand -= item.quantity
+            inventory.updated_by = current_user.id
+            changes.append((item.product_id, order.warehouse_id, -item.quantity, inventory.quantity_on_hand))
+        
+            # Create transaction
+            transaction = InventoryTransaction(
+                product_id=item.product_id,
+                warehouse_id=order.warehouse_id,
+                transaction_type=TransactionType.SALE,
+                quantity=-item.quantity,
+                reference_id=order.id,
+                notes=f"Sales order {order.order_number}",
+                created_by=current_user.id
+            )
+            db.add(transaction)
+    
+        # Update order status
+        order.status = OrderStatus.DELIVERED
+    
+        # Audit log
+        create_audit_log(
+            db=db,
+            user_id=current_user.id,
+            action="FULFILL",
+            entity_type="SalesOrder",
+            entity_id=order.id,
+            new_values={"status": "delivered", "fulfilled_by": current_user.id}
         )
-        db.add(transaction)
-    
-    # Update order status
-    order.status = OrderStatus.DELIVERED
-    
-    # Audit log
-    create_audit_log(
-        db=db,
-        user_id=current_user.id,
-        action="FULFILL",
-        entity_type="SalesOrder",
-        entity_id=order.id,
-        new_values={"status": "delivered", "fulfilled_by": current_user.id}
-    )
     
-    db.commit()
+        db.commit()
+    except Exception:
+        # Admissions of a failed (or to be replayed) attempt give their headroom back
+        stock_coalescer.revert(coalesced)
+        raise
+    stock_coalescer.committed(coalesced)
+    if order.reservation_expires_at is not None:
+        release_reservation(order_owner(order.id))
+    publish_stock("sale", changes)
+    publish_order("fulfilled", order)
     
     return {"message": "Sales order fulfilled successfully", "order": order}
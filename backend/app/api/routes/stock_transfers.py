@@ -0,0 +1,105 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.database import get_db
+from app.core.auth import get_current_user
+from app.core.events import publish_stock
+from app.core.db_retry import retry_transaction
+from app.core.stock_transfers import transfer_stock, transfer_changes
+from app.models.models import StockTransfer, StockTransferLine, Product, User
+from app.schemas.schemas import (
+    StockTransferCreate,
+    StockTransferResponse,
+    StockTransferDetail
+)
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[StockTransferResponse])
+async def get_stock_transfers(
+    warehouse_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List transfer documents, newest first; warehouse_id matches either side."""
+    query = db.query(StockTransfer)
+    if warehouse_id:
+        query = query.filter(or_(
+            StockTransfer.from_warehouse_id == warehouse_id,
+            StockTransfer.to_warehouse_id == warehouse_id
+        ))
+    return query.order_by(StockTransfer.created_at.desc()).offset(skip).limit(limit).all()
+
+
+@router.post("/", response_model=StockTransferDetail, status_code=status.HTTP_201_CREATED)
+@retry_transaction
+async def create_stock_transfer(
+    payload: StockTransferCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Move many products between two warehouses in one transaction.
+
+    The transfer is all or nothing: any unknown product or short line
+    rejects the whole document with 400 and the per-line errors.
+    """
+    transfer, errors = transfer_stock(
+        db, payload.from_warehouse_id, payload.to_warehouse_id,
+        payload.lines, current_user.id, payload.notes
+    )
+    if errors:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Transfer could not be applied", "errors": errors}
+        )
+
+    db.commit()
+    publish_stock("transfer", transfer_changes(db, transfer))
+
+    return await get_stock_transfer(transfer.id, db, current_user)
+
+
+@router.get("/{transfer_id}", response_model=StockTransferDetail)
+async def get_stock_transfer(
+    transfer_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a transfer document with its lines."""
+    transfer = db.query(StockTransfer).filter(StockTransfer.id == transfer_id).first()
+    if not transfer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock transfer not found"
+        )
+
+    lines = db.query(
+        StockTransferLine,
+        Product.name.label("product_name"),
+        Product.sku.label("product_sku")
+    ).join(
+        Product, StockTransferLine.product_id == Product.id
+    ).filter(
+        StockTransferLine.transfer_id == transfer.id
+    ).order_by(Product.sku).all()
+
+    return {
+        **{c.name: getattr(transfer, c.name) for c in transfer.__table__.columns},
+        "lines": [
+            {
+                "product_id": line.product_id,
+                "product_name": product_name,
+                "product_sku": product_sku,
+                "quantity": line.quantity,
+                "unit_cost": line.unit_cost
+            }
+            for line, product_name, product_sku in lines
+        ]
+    }
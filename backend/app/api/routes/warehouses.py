@@ -4,8 +4,8 @@ from typing import List
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.models import Warehouse, User
-from app.schemas.schemas import WarehouseCreate, WarehouseResponse, WarehouseUpdate
+from app.models.models import Warehouse, WarehouseStats, User
+from app.schemas.schemas import WarehouseCreate, WarehouseResponse, WarehouseUpdate, WarehouseSummary
 
 router = APIRouter()
 
@@ -22,6 +22,32 @@ async def get_warehouses(
     return warehouses
 
 
+@router.get("/summary", response_model=List[WarehouseSummary])
+async def get_warehouse_summary(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get SKU count, units, stock value and low-stock SKUs for every warehouse."""
+    rows = db.query(Warehouse, WarehouseStats).outerjoin(
+        WarehouseStats, WarehouseStats.warehouse_id == Warehouse.id
+    ).order_by(Warehouse.name).all()
+    
+    return [
+        WarehouseSummary(
+            warehouse_id=warehouse.id,
+            warehouse_name=warehouse.name,
+            location=warehouse.location,
+            is_active=warehouse.is_active if warehouse.is_active is not None else True,
+            sku_count=(stats.sku_count or 0) if stats else 0,
+            total_units=(stats.total_units or 0) if stats else 0,
+            total_value=(stats.total_value or 0.0) if stats else 0.0,
+            low_stock_count=(stats.low_stock_count or 0) if stats else 0,
+            updated_at=stats.updated_at if stats else None
+        )
+        for warehouse, stats in rows
+    ]
+
+
 @router.get("/{warehouse_id}", response_model=WarehouseResponse)
 async def get_warehouse(
     warehouse_id: str,
@@ -55,6 +81,9 @@ async def create_warehouse(
     # Create warehouse
     db_warehouse = Warehouse(**warehouse_dict)
     db.add(db_warehouse)
+    db.flush()
+    # Stock writers only increment the stats row, so it must exist up front
+    db.add(WarehouseStats(warehouse_id=db_warehouse.id, sku_count=0, total_units=0, total_value=0.0, low_stock_count=0))
     db.commit()
     db.refresh(db_warehouse)
     
@@ -105,6 +134,7 @@ async def delete_warehouse(
             detail="Warehouse not found"
         )
     
+    db.query(WarehouseStats).filter(WarehouseStats.warehouse_id == warehouse_id).delete(synchronize_session=False)
     db.delete(warehouse)
     db.commit()
     
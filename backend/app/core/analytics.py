@@ -0,0 +1,198 @@
+"""
+ABC/XYZ classification and inventory turnover analytics.
+
+A batch job computes, for every (product, warehouse), revenue share (ABC),
+demand variability (XYZ), average stock, annualized turnover and days since
+the last sale. Daily sales and net stock movements are loaded as NumPy
+matrices (see app.core.forecasting) so the whole catalog is processed in a
+few vectorized operations. Results land in inventory_analytics, which is the
+only table the analytics API reads.
+"""
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.forecasting import load_daily_sales, load_daily_matrix
+from app.core.ledger_archive import last_sales
+from app.models.models import (
+    Inventory, InventoryAnalytics, InventoryTransaction, SalesOrder,
+    SalesOrderItem, OrderStatus, TransactionType
+)
+
+
+def classify_abc(revenue: np.ndarray, groups: np.ndarray, a_share: float, b_share: float) -> np.ndarray:
+    """
+    ABC class per row from its revenue rank within its group.
+
+    A row is A while the cumulative revenue share of the rows ranked above
+    it is below `a_share`, B below `b_share`, otherwise C. Rows without
+    revenue are always C.
+    """
+    order = np.lexsort((-revenue, groups))
+    sorted_revenue = revenue[order]
+    sorted_groups = groups[order]
+
+    group_totals = np.bincount(groups, weights=revenue)
+    cumulative = np.cumsum(sorted_revenue)
+    # Subtract the running total at the start of each group
+    group_start = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    offsets = np.repeat(cumulative[group_start] - sorted_revenue[group_start], np.diff(np.r_[group_start, len(order)]))
+    share_before = np.divide(
+        cumulative - sorted_revenue - offsets,
+        group_totals[sorted_groups],
+        out=np.ones_like(sorted_revenue),
+        where=group_totals[sorted_groups] > 0
+    )
+
+    sorted_classes = np.where(share_before < a_share, "A", np.where(share_before < b_share, "B", "C"))
+    sorted_classes[sorted_revenue <= 0] = "C"
+
+    classes = np.empty(len(revenue), dtype=sorted_classes.dtype)
+    classes[order] = sorted_classes
+    return classes
+
+
+def classify_xyz(sales: np.ndarray, x_cv: float, y_cv: float):
+    """
+    XYZ class per row from the coefficient of variation of daily demand.
+
+    Returns:
+        Tuple of (classes, cv); rows without demand are Z with NaN cv
+    """
+    mean = sales.mean(axis=1)
+    std = sales.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = np.where(mean > 0, std / mean, np.nan)
+    classes = np.where(cv <= x_cv, "X", np.where(cv <= y_cv, "Y", "Z"))
+    return classes, cv
+
+
+def _pad_rows(matrix: np.ndarray, n: int) -> np.ndarray:
+    if matrix.shape[0] >= n:
+        return matrix
+    return np.vstack([matrix, np.zeros((n - matrix.shape[0], matrix.shape[1]))])
+
+
+def run_inventory_analytics(db: Session, end_date: Optional[date] = None) -> int:
+    """
+    Recompute inventory_analytics for every (product, warehouse) pair.
+
+    Returns:
+        Number of rows written
+    """
+    end_date = end_date or date.today()
+    period_days = settings.ANALYTICS_PERIOD_DAYS
+    start_dt = datetime.combine(end_date - timedelta(days=period_days - 1), datetime.min.time())
+    end_dt = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    # Pairs are appended to a shared index, so earlier matrices stay aligned
+    index = {}
+    _, sales = load_daily_sales(db, end_date, period_days, index)
+    _, net = load_daily_matrix(db, end_date, period_days, InventoryTransaction.quantity, index)
+
+    on_hand_by_pair = {}
+    for s in db.query(Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand).all():
+        pair = (s.product_id, s.warehouse_id)
+        on_hand_by_pair[pair] = s.quantity_on_hand or 0
+        index.setdefault(pair, len(index))
+
+    pairs = list(index)
+    n = len(pairs)
+    if n == 0:
+        db.query(InventoryAnalytics).delete(synchronize_session=False)
+        db.commit()
+        return 0
+
+    sales = _pad_rows(sales, n)
+    net = _pad_rows(net, n)
+
+    on_hand = np.array([on_hand_by_pair.get(p, 0) for p in pairs], dtype=np.float64)
+
+    # Stock at the end of day d = current stock minus movements after day d
+    movements_from = np.cumsum(net[:, ::-1], axis=1)[:, ::-1]
+    end_of_day_stock = on_hand[:, None] - movements_from + net
+    average_stock = np.clip(end_of_day_stock, 0, None).mean(axis=1)
+
+    units_sold = sales.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        turnover = np.where(average_stock > 0, units_sold / average_stock * 365 / period_days, np.nan)
+
+    revenue_by_pair = {
+        (r.product_id, r.warehouse_id): float(r.revenue or 0)
+        for r in db.query(
+            SalesOrderItem.product_id,
+            SalesOrder.warehouse_id,
+            func.sum(SalesOrderItem.line_total).label("revenue")
+        ).join(
+            SalesOrder, SalesOrderItem.sales_order_id == SalesOrder.id
+        ).filter(
+            SalesOrder.order_date >= start_dt,
+            SalesOrder.order_date < end_dt,
+            SalesOrder.status != OrderStatus.CANCELLED
+        ).group_by(
+            SalesOrderItem.product_id, SalesOrder.warehouse_id
+        ).all()
+    }
+    revenue = np.array([revenue_by_pair.get(p, 0.0) for p in pairs])
+
+    warehouse_codes = {}
+    groups = np.array([warehouse_codes.setdefault(p[1], len(warehouse_codes)) for p in pairs])
+    abc = classify_abc(revenue, groups, settings.ANALYTICS_ABC_A_SHARE, settings.ANALYTICS_ABC_B_SHARE)
+    xyz, cv = classify_xyz(sales, settings.ANALYTICS_XYZ_X_CV, settings.ANALYTICS_XYZ_Y_CV)
+    warehouse_revenue = np.bincount(groups, weights=revenue)
+    revenue_share = np.divide(
+        revenue, warehouse_revenue[groups],
+        out=np.zeros_like(revenue), where=warehouse_revenue[groups] > 0
+    )
+
+    # Last sale may be older than the analysis window
+    last_sale_by_pair = {
+        (r.product_id, r.warehouse_id): r.last_sale_at
+        for r in db.query(
+            InventoryTransaction.product_id,
+            InventoryTransaction.warehouse_id,
+            func.max(InventoryTransaction.created_at).label("last_sale_at")
+        ).filter(
+            InventoryTransaction.transaction_type == TransactionType.SALE
+        ).group_by(
+            InventoryTransaction.product_id, InventoryTransaction.warehouse_id
+        ).all()
+    }
+    # Pairs whose last sale has been compacted out of the live table
+    last_sale_by_pair.update(
+        last_sales(db, [pair for pair in pairs if pair not in last_sale_by_pair])
+    )
+
+    computed_at = datetime.utcnow()
+    rows = []
+    for i, pair in enumerate(pairs):
+        last_sale_at = last_sale_by_pair.get(pair)
+        rows.append({
+            "product_id": pair[0],
+            "warehouse_id": pair[1],
+            "period_days": period_days,
+            "revenue": float(revenue[i]),
+            "revenue_share": float(revenue_share[i]),
+            "units_sold": int(units_sold[i]),
+            "abc_class": str(abc[i]),
+            "xyz_class": str(xyz[i]),
+            "demand_cv": None if np.isnan(cv[i]) else float(cv[i]),
+            "quantity_on_hand": int(on_hand[i]),
+            "average_stock": float(average_stock[i]),
+            "turnover": None if np.isnan(turnover[i]) else float(turnover[i]),
+            "last_sale_at": last_sale_at,
+            "days_since_last_sale": (end_date - last_sale_at.date()).days if last_sale_at else None,
+            "computed_at": computed_at
+        })
+
+    # Replace the previous run in one transaction
+    db.query(InventoryAnalytics).delete(synchronize_session=False)
+    for start in range(0, len(rows), 5000):
+        db.execute(insert(InventoryAnalytics), rows[start:start + 5000])
+    db.commit()
+
+    return len(rows)
@@ -0,0 +1,412 @@
+"""
+Optional DuckDB analytics sidecar.
+
+When ANALYTICS_DUCKDB_PATH is set and duckdb is installed, products, sales
+orders and their lines, and inventory transactions are copied into a local
+DuckDB file, and the heavy reports run their scans and GROUP BYs there
+instead of on the OLTP database.
+
+Copying is incremental. Each table keeps a watermark on its created/updated
+timestamps; rows changed since the watermark (less
+ANALYTICS_SYNC_OVERLAP_SECONDS, for transactions that committed after a
+later one was copied) are replaced by id, and the lines of every changed
+order are replaced with it. Deleted products are pruned on every sync;
+everything else in the copied tables is insert/update only.
+
+Syncing never runs on a report request. The first report check starts a
+background thread that syncs every ANALYTICS_SYNC_SECONDS; reports use the
+sidecar once it has synced once in this process, and read through their own
+DuckDB cursors, so they do not wait for a sync in progress.
+
+A DuckDB file can only be opened for writing by one process. Run the
+initial load with `python jobs.py analytics-sync` before starting the API;
+a worker that cannot open the file logs a warning and keeps reporting from
+the OLTP database.
+"""
+import enum
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import (
+    InventoryTransaction, OrderStatus, Product, SalesOrder, SalesOrderItem
+)
+
+try:  # Optional dependencies; the sidecar stays disabled without them
+    import duckdb
+    import pandas as pd
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+# Copied columns per table; the sidecar only holds what reports read
+PRODUCT_COLUMNS = ["id", "sku", "name", "category_id", "cost_price", "hsn_sac", "created_at", "updated_at"]
+ORDER_COLUMNS = [
+    "id", "order_number", "customer_id", "warehouse_id", "order_date", "status", "payment_status",
+    "subtotal", "tax_amount", "discount_amount", "total_amount", "created_at", "updated_at"
+]
+ITEM_COLUMNS = [
+    "id", "sales_order_id", "product_id", "quantity", "unit_price", "discount", "tax_rate",
+    "tax_amount", "line_total", "unit_cost", "unit_cost_inc_tax", "created_at"
+]
+TRANSACTION_COLUMNS = [
+    "id", "product_id", "warehouse_id", "transaction_type", "quantity", "reference_id", "created_at"
+]
+
+TABLES = {
+    "products": (Product, PRODUCT_COLUMNS),
+    "sales_orders": (SalesOrder, ORDER_COLUMNS),
+    "sales_order_items": (SalesOrderItem, ITEM_COLUMNS),
+    "inventory_transactions": (InventoryTransaction, TRANSACTION_COLUMNS),
+}
+
+
+def _duckdb_type(column) -> str:
+    if isinstance(column.type, Boolean):
+        return "BOOLEAN"
+    if isinstance(column.type, Integer):
+        return "BIGINT"
+    if isinstance(column.type, (Float, Numeric)):
+        return "DOUBLE"
+    if isinstance(column.type, DateTime):
+        return "TIMESTAMP"
+    if isinstance(column.type, Date):
+        return "DATE"
+    return "VARCHAR"  # Strings, text and enums (stored by value)
+
+
+def _plain(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+class AnalyticsStore:
+    def __init__(self):
+        self._lock = threading.Lock()  # Held by a sync
+        self._cursor_lock = threading.Lock()
+        self._conn = None
+        self._synced_at = 0.0
+        self._syncer: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.ANALYTICS_DUCKDB_PATH) and duckdb is not None
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(settings.ANALYTICS_DUCKDB_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = duckdb.connect(settings.ANALYTICS_DUCKDB_PATH)
+            for table, (model, columns) in TABLES.items():
+                definitions = ", ".join(
+                    f"{name} {_duckdb_type(model.__table__.c[name])}" for name in columns
+                )
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definitions})")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state "
+                "(table_name VARCHAR PRIMARY KEY, watermark TIMESTAMP, synced_at TIMESTAMP)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _cursor(self):
+        """A cursor of its own for the calling thread; None until the store is open."""
+        with self._cursor_lock:
+            return self._conn.cursor() if self._conn is not None else None
+
+    def available(self) -> bool:
+        """
+        Whether reports can run on the sidecar: it is open and has synced once.
+
+        Starts the background syncer on first use. False while the sidecar
+        is disabled, not yet synced or failing to open; the caller then
+        queries the OLTP database.
+        """
+        if not self.enabled or self._stopping.is_set():
+            return False
+        self._ensure_syncer()
+        return self._conn is not None and self._synced_at > 0
+
+    def _ensure_syncer(self) -> None:
+        if self._syncer is not None and self._syncer.is_alive():
+            return
+        with self._cursor_lock:
+            if self._syncer is None or not self._syncer.is_alive():
+                self._syncer = threading.Thread(target=self._run, name="analytics-sync", daemon=True)
+                self._syncer.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.sync()
+                delay = settings.ANALYTICS_SYNC_SECONDS
+            except Exception as e:
+                logger.warning(f"Analytics sidecar sync failed, reports use the main database until it syncs: {e}")
+                delay = settings.ANALYTICS_RETRY_SECONDS
+            self._stopping.wait(delay)
+
+    def stop(self) -> None:
+        """Stop the background syncer after its current sync and close the file."""
+        self._stopping.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        with self._lock, self._cursor_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def sync(self, db: Optional[Session] = None, full: bool = False) -> Dict[str, int]:
+        """
+        Copy rows changed since the last sync (everything with `full`).
+
+        Returns:
+            Rows copied per table
+        """
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            with self._lock:
+                with self._cursor_lock:
+                    self._connect()
+                conn = self._cursor()
+                try:
+                    if full:
+                        self._synced_at = 0.0  # Reports use the main database while the copy is empty
+                        for table in TABLES:
+                            conn.execute(f"DELETE FROM {table}")
+                        conn.execute("DELETE FROM sync_state")
+                    state = dict(conn.execute("SELECT table_name, watermark FROM sync_state").fetchall())
+
+                    copied = {
+                        "products": self._sync_table(conn, db, "products", state),
+                        "sales_orders": self._sync_orders(conn, db, state),
+                        "inventory_transactions": self._sync_table(conn, db, "inventory_transactions", state),
+                    }
+                    copied["products_pruned"] = self._prune_products(conn, db)
+                finally:
+                    conn.close()
+                self._synced_at = time.monotonic()
+                return copied
+        finally:
+            if own_session:
+                db.close()
+
+    def _changed_rows(self, db: Session, table: str, state: dict):
+        model, columns = TABLES[table]
+        query = select(*(model.__table__.c[name] for name in columns))
+        watermark = state.get(table)
+        if watermark is not None:
+            since = watermark - timedelta(seconds=settings.ANALYTICS_SYNC_OVERLAP_SECONDS)
+            conditions = [model.created_at >= since]
+            if hasattr(model, "updated_at"):
+                conditions.append(model.updated_at >= since)
+            query = query.where(or_(*conditions))
+        return db.execute(query.execution_options(yield_per=BATCH_SIZE)).partitions()
+
+    def _replace(self, conn, table: str, rows: list) -> None:
+        columns = TABLES[table][1]
+        frame = pd.DataFrame([[_plain(v) for v in row] for row in rows], columns=columns)
+        conn.register("batch", frame)
+        try:
+            conn.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM batch)")
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM batch")
+        finally:
+            conn.unregister("batch")
+
+    def _advance(self, conn, table: str, watermark: Optional[datetime]) -> None:
+        if watermark is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", [table, watermark, datetime.now()]
+        )
+
+    def _sync_table(self, conn, db: Session, table: str, state: dict) -> int:
+        columns = TABLES[table][1]
+        stamps = [columns.index(name) for name in ("created_at", "updated_at") if name in columns]
+        watermark = state.get(table)
+        count = 0
+        for rows in self._changed_rows(db, table, state):
+            conn.begin()
+            self._replace(conn, table, rows)
+            conn.commit()
+            count += len(rows)
+            for row in rows:
+                for i in stamps:
+                    if row[i] is not None and (watermark is None or row[i] > watermark):
+                        watermark = row[i]
+        self._advance(conn, table, watermark)
+        return count
+
+    def _sync_orders(self, conn, db: Session, state: dict) -> int:
+        """Orders changed since the watermark, each with all of its lines."""
+        created_at, updated_at = ORDER_COLUMNS.index("created_at"), ORDER_COLUMNS.index("updated_at")
+        item_columns = [SalesOrderItem.__table__.c[name] for name in ITEM_COLUMNS]
+        watermark = state.get("sales_orders")
+        count = 0
+        for rows in self._changed_rows(db, "sales_orders", state):
+            order_ids = [row[0] for row in rows]
+            items = db.execute(
+                select(*item_columns).where(SalesOrderItem.sales_order_id.in_(order_ids))
+            ).all()
+
+            conn.begin()
+            self._replace(conn, "sales_orders", rows)
+            conn.register("changed_orders", pd.DataFrame({"id": order_ids}))
+            try:
+                conn.execute("DELETE FROM sales_order_items WHERE sales_order_id IN (SELECT id FROM changed_orders)")
+            finally:
+                conn.unregister("changed_orders")
+            if items:
+                self._replace(conn, "sales_order_items", items)
+            conn.commit()
+
+            count += len(rows)
+            for row in rows:
+                for i in (created_at, updated_at):
+                    if row[i] is not None and (watermark is None or row[i] > watermark):
+                        watermark = row[i]
+        self._advance(conn, "sales_orders", watermark)
+        return count
+
+    def _prune_products(self, conn, db: Session) -> int:
+        live = pd.DataFrame({"id": [product_id for (product_id,) in db.query(Product.id).all()]})
+        conn.register("live_products", live)
+        try:
+            return conn.execute(
+                "DELETE FROM products WHERE id NOT IN (SELECT id FROM live_products)"
+            ).fetchone()[0]
+        finally:
+            conn.unregister("live_products")
+
+    def query(self, sql: str, params: Optional[list] = None) -> list:
+        """Run a query on the sidecar; rows are named tuples like SQLAlchemy rows."""
+        cursor = self._cursor()
+        if cursor is None:
+            raise RuntimeError("Analytics sidecar is not open")
+        try:
+            cursor.execute(sql, params or [])
+            Row = namedtuple("Row", [d[0] for d in cursor.description])
+            return [Row(*values) for values in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    # Report queries, mirroring their OLTP versions in app/api/routes/reports.py
+
+    def sales_timeseries(
+        self,
+        start: datetime,
+        end: datetime,
+        label_format: str,
+        split_by: Optional[str] = None,
+        warehouse_id: Optional[str] = None
+    ) -> list:
+        series = {"warehouse": "o.warehouse_id", "tax_rate": "i.tax_rate"}.get(split_by)
+        sql = f"""
+            SELECT strftime(o.order_date, ?) AS bucket,
+                   {series + ' AS series,' if series else ''}
+                   SUM(i.line_total) AS revenue,
+                   COUNT(DISTINCT i.sales_order_id) AS orders,
+                   SUM(i.quantity) AS units,
+                   SUM(i.tax_amount) AS tax
+            FROM sales_order_items i
+            JOIN sales_orders o ON o.id = i.sales_order_id
+            WHERE o.order_date >= ? AND o.order_date < ? AND o.status != ?
+            {'AND o.warehouse_id = ?' if warehouse_id else ''}
+            GROUP BY bucket{', series' if series else ''}
+        """
+        params = [label_format, start, end, OrderStatus.CANCELLED.value]
+        if warehouse_id:
+            params.append(warehouse_id)
+        return self.query(sql, params)
+
+    def gst_summary(self, start: datetime, end: datetime) -> list:
+        return self.query("""
+            SELECT i.tax_rate,
+                   SUM(i.quantity * i.unit_price - i.discount) AS taxable_amount,
+                   SUM(i.tax_amount) AS tax_collected,
+                   COUNT(DISTINCT i.sales_order_id) AS order_count,
+                   SUM(i.quantity) AS items_sold
+            FROM sales_order_items i
+            JOIN sales_orders o ON o.id = i.sales_order_id
+            WHERE o.created_at >= ? AND o.created_at < ? AND o.status != ?
+            GROUP BY i.tax_rate
+            ORDER BY i.tax_rate
+        """, [start, end, OrderStatus.CANCELLED.value])
+
+    def detailed_sales(self, start: datetime, end: datetime) -> list:
+        return self.query("""
+            SELECT o.id AS order_id, o.order_date, o.order_number,
+                   o.discount_amount AS order_discount,
+                   p.name AS product_name,
+                   i.unit_cost AS cost_price_unit,
+                   i.unit_cost_inc_tax AS cost_price_unit_inc_tax,
+                   i.quantity,
+                   i.unit_price AS selling_price_unit,
+                   i.discount AS item_discount,
+                   i.tax_rate, i.tax_amount, i.line_total
+            FROM sales_order_items i
+            JOIN sales_orders o ON o.id = i.sales_order_id
+            JOIN products p ON p.id = i.product_id
+            WHERE o.order_date >= ? AND o.order_date < ? AND o.status != ?
+            ORDER BY o.order_date DESC
+        """, [start, end, OrderStatus.CANCELLED.value])
+
+    def stock_movements_since(self, since: datetime) -> Tuple[Dict[tuple, int], Optional[datetime]]:
+        """
+        Net quantity moved per (product, warehouse) after `since`, up to where the copy is complete.
+
+        Returns:
+            (movements, until): movements after `until` may be missing from
+            the copy and must come from the main database; until is None
+            (and movements empty) when the copy is not complete past `since`
+        """
+        state = self.query("SELECT watermark FROM sync_state WHERE table_name = 'inventory_transactions'")
+        if not state or state[0].watermark is None:
+            return {}, None
+        # Same allowance for late commits as the sync itself
+        until = state[0].watermark - timedelta(seconds=settings.ANALYTICS_SYNC_OVERLAP_SECONDS)
+        if until <= since:
+            return {}, None
+        rows = self.query("""
+            SELECT product_id, warehouse_id, SUM(quantity) AS quantity
+            FROM inventory_transactions
+            WHERE created_at > ? AND created_at <= ?
+            GROUP BY product_id, warehouse_id
+        """, [since, until])
+        return {(r.product_id, r.warehouse_id): int(r.quantity or 0) for r in rows}, until
+
+    def stats(self) -> dict:
+        """Row counts and watermarks for the status endpoint."""
+        if not self.enabled:
+            return {"enabled": False}
+        state = {
+            r.table_name: {"watermark": r.watermark, "synced_at": r.synced_at}
+            for r in self.query("SELECT table_name, watermark, synced_at FROM sync_state")
+        }
+        return {
+            "enabled": True,
+            "path": settings.ANALYTICS_DUCKDB_PATH,
+            "tables": {
+                table: {
+                    "rows": self.query(f"SELECT COUNT(*) AS n FROM {table}")[0].n,
+                    **state.get(table, {"watermark": None, "synced_at": None})
+                }
+                for table in TABLES
+            }
+        }
+
+
+analytics_store = AnalyticsStore()
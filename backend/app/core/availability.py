@@ -0,0 +1,122 @@
+"""
+Bulk stock availability for the storefront and integrations.
+
+A category page needs availability for dozens of products at once.
+bulk_availability() answers them with one query: products by id or SKU
+(primary key and the unique SKU index), outer-joined to their inventory
+rows on idx_product_warehouse, in one warehouse or across the active ones.
+Holds come from the reservation store, not from the database. Sales the
+stock coalescer has admitted but not yet flushed are taken off on hand.
+
+Each product's figures are cached in this process for
+AVAILABILITY_CACHE_TTL_SECONDS, per warehouse scope and per lookup key (id
+or SKU). Unknown keys are cached too, so repeated page loads do not reach
+the database at all. The figures can be that stale: they are for display,
+never for accepting an order. Orders and reservations check live stock.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.reservations import held_quantities
+from app.core.stock_coalescer import pending_issues
+from app.models.models import Inventory, Product, Warehouse
+
+ALL_WAREHOUSES = "*"
+NOT_FOUND = False  # Cached for unknown keys; TTLCache.get returns None on a miss
+
+availability_cache = TTLCache(maxsize=settings.AVAILABILITY_CACHE_SIZE)
+
+Lookup = Tuple[str, str]  # ("id" | "sku", value)
+
+
+def _cache_key(scope: str, lookup: Lookup) -> str:
+    return f"{scope}:{lookup[0]}:{lookup[1]}"
+
+
+def _load(db: Session, warehouse_id: Optional[str], product_ids: List[str], skus: List[str]) -> Dict[str, dict]:
+    if warehouse_id:
+        in_scope = Inventory.warehouse_id == warehouse_id
+    else:
+        in_scope = Inventory.warehouse_id.in_(select(Warehouse.id).where(Warehouse.is_active.is_(True)))
+    lookups = []
+    if product_ids:
+        lookups.append(Product.id.in_(product_ids))
+    if skus:
+        lookups.append(Product.sku.in_(skus))
+
+    rows = db.query(
+        Product.id, Product.sku, Inventory.warehouse_id, Inventory.quantity_on_hand, Inventory.quantity_reserved
+    ).outerjoin(
+        Inventory, and_(Inventory.product_id == Product.id, in_scope)
+    ).filter(or_(*lookups)).all()
+
+    pairs = [(product_id, wid) for product_id, _, wid, _, _ in rows if wid]
+    held = held_quantities(pairs)
+    pending = pending_issues(db, pairs)
+    items = {}
+    for product_id, sku, wid, on_hand, reserved in rows:
+        item = items.setdefault(product_id, {
+            "product_id": product_id, "sku": sku, "quantity_on_hand": 0, "quantity_reserved": 0, "available": 0
+        })
+        if wid is None:
+            continue
+        on_hand = (on_hand or 0) - pending.get((product_id, wid), 0)
+        reserved = (reserved or 0) + held.get((product_id, wid), 0)
+        item["quantity_on_hand"] += on_hand
+        item["quantity_reserved"] += reserved
+        # An over-reserved warehouse does not eat into the others
+        item["available"] += max(on_hand - reserved, 0)
+    return items
+
+
+def bulk_availability(
+    db: Session,
+    product_ids: List[str],
+    skus: List[str],
+    warehouse_id: Optional[str] = None
+) -> Tuple[List[dict], List[str]]:
+    """
+    Availability per product, in request order (ids first, then SKUs).
+
+    Returns:
+        Items (one per product, even if asked for by both id and SKU) and
+        the requested ids and SKUs that match no product
+    """
+    scope = warehouse_id or ALL_WAREHOUSES
+    wanted: List[Lookup] = [("id", v) for v in dict.fromkeys(product_ids)] + [("sku", v) for v in dict.fromkeys(skus)]
+
+    found: Dict[Lookup, object] = {}
+    misses = []
+    for lookup in wanted:
+        cached = availability_cache.get(_cache_key(scope, lookup))
+        if cached is None:
+            misses.append(lookup)
+        else:
+            found[lookup] = cached
+
+    if misses:
+        loaded = _load(
+            db, warehouse_id,
+            [v for kind, v in misses if kind == "id"],
+            [v for kind, v in misses if kind == "sku"]
+        )
+        by_sku = {item["sku"]: item for item in loaded.values()}
+        for lookup in misses:
+            kind, value = lookup
+            item = (loaded if kind == "id" else by_sku).get(value, NOT_FOUND)
+            availability_cache.set(_cache_key(scope, lookup), item, settings.AVAILABILITY_CACHE_TTL_SECONDS)
+            found[lookup] = item
+
+    items, not_found, seen = [], [], set()
+    for lookup in wanted:
+        item = found[lookup]
+        if item is NOT_FOUND:
+            not_found.append(lookup[1])
+        elif item["product_id"] not in seen:
+            seen.add(item["product_id"])
+            items.append(dict(item))
+    return items, not_found
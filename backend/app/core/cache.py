@@ -0,0 +1,75 @@
+"""In-process TTL cache for short-lived report payloads."""
+import heapq
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire after a per-entry TTL.
+
+    Each worker process keeps its own copy, so cached values can be at most
+    `ttl` seconds stale and must never be used for stock checks on write paths.
+
+    Expiry times are also kept in a heap so a full cache evicts in O(log n)
+    per insert; heap entries left behind by overwritten or dropped keys are
+    skipped when popped and compacted away once they outnumber live ones.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: Dict[str, Tuple[float, Any]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for `ttl` seconds."""
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                self._evict()
+            expires_at = time.monotonic() + ttl
+            self._data[key] = (expires_at, value)
+            heapq.heappush(self._expiry, (expires_at, key))
+            if len(self._expiry) > 2 * len(self._data) + 64:
+                self._compact()
+
+    def invalidate(self, prefix: str = "") -> None:
+        """Drop every entry whose key starts with `prefix` (all entries by default)."""
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+            self._compact()
+
+    def _evict(self) -> None:
+        # Drop expired entries first, then the entry closest to expiry
+        now = time.monotonic()
+        while self._expiry:
+            expires_at, key = self._expiry[0]
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == expires_at:
+                if expires_at >= now and len(self._data) < self.maxsize:
+                    break
+                del self._data[key]
+            heapq.heappop(self._expiry)
+
+    def _compact(self) -> None:
+        # Rebuild the heap from live entries only
+        self._expiry = [(exp, key) for key, (exp, _) in self._data.items()]
+        heapq.heapify(self._expiry)
+
+
+# Shared cache for report payloads
+report_cache = TTLCache()
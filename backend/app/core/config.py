@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -31,6 +31,10 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Worker processes (uvicorn/gunicorn read the same variable); per-process
+    # stores such as RESERVATION_STORE=memory need 1
+    WEB_CONCURRENCY: int = 1
+    
     # Email
     SMTP_HOST: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
@@ -47,6 +51,95 @@ class Settings(BaseSettings):
     ALERT_CHECK_INTERVAL_MINUTES: int = 60
     ALERT_EMAIL_RECIPIENTS: str = "admin@example.com"
     
+    # Reports
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    
+    # Inventory costing: "fifo" or "average"
+    INVENTORY_COSTING_METHOD: str = "fifo"
+    
+    # Demand forecasting
+    FORECAST_HISTORY_DAYS: int = 90
+    FORECAST_SMOOTHING_ALPHA: float = 0.3
+    FORECAST_MOVING_AVERAGE_DAYS: int = 28
+    FORECAST_LEAD_TIME_DAYS: float = 7.0
+    FORECAST_SERVICE_LEVEL_Z: float = 1.65  # ~95% service level
+    FORECAST_ORDER_COST: float = 500.0  # Fixed cost per purchase order
+    FORECAST_HOLDING_COST_RATE: float = 0.25  # Annual holding cost as a share of unit cost
+    
+    # ABC/XYZ analytics
+    ANALYTICS_PERIOD_DAYS: int = 365
+    ANALYTICS_ABC_A_SHARE: float = 0.8
+    ANALYTICS_ABC_B_SHARE: float = 0.95
+    ANALYTICS_XYZ_X_CV: float = 0.5
+    ANALYTICS_XYZ_Y_CV: float = 1.0
+    
+    # Receivables
+    RECEIVABLES_DEFAULT_TERMS_DAYS: int = 30  # Due date when an order has none
+    
+    # Heavy report guard
+    REPORT_MAX_CONCURRENT: int = 2  # Per worker
+    REPORT_RETRY_AFTER_SECONDS: int = 10
+    REPORT_STATEMENT_TIMEOUT_SECONDS: float = 30.0  # 0 disables
+    REPORT_STATEMENT_TIMEOUTS: str = "detailed-sales-report:120,stock-inventory:120,gstr1:120"
+    
+    @property
+    def report_statement_timeouts(self) -> Dict[str, float]:
+        """Convert REPORT_STATEMENT_TIMEOUTS ("report:seconds,...") to a dict."""
+        timeouts = {}
+        for entry in self.REPORT_STATEMENT_TIMEOUTS.split(','):
+            if ':' in entry:
+                name, seconds = entry.split(':', 1)
+                timeouts[name.strip()] = float(seconds)
+        return timeouts
+    
+    # GST returns
+    GST_PERIOD_LOCK_DAYS: int = 11  # Days after month end before a period is frozen
+    
+    # In-memory sales cube for pivot queries
+    CUBE_MAX_ROWS: int = 2_000_000
+    CUBE_RETENTION_DAYS: int = 730
+    CUBE_REFRESH_SECONDS: int = 30
+    
+    # Cycle counts: scan tallies kept "memory" (single worker) or in "redis"
+    CYCLE_COUNT_BUFFER: str = "memory"
+    
+    # Stock reservations: holds kept in "memory" (single worker) or in "redis"
+    RESERVATION_STORE: str = "memory"
+    RESERVATION_TTL_SECONDS: int = 900  # Default hold for carts and checkouts
+    ORDER_RESERVATION_TTL_SECONDS: int = 259200  # Hold for unfulfilled sales orders (3 days)
+    RESERVATION_SWEEP_BATCH: int = 500  # Expired holds released per sweep
+    
+    # Bulk availability lookups for the storefront (see app.core.availability)
+    AVAILABILITY_CACHE_TTL_SECONDS: int = 5  # Max staleness of a cached product's availability
+    AVAILABILITY_CACHE_SIZE: int = 20000  # Cached (warehouse, product) entries per worker
+    
+    # Write coalescing of fulfilment issues for hot SKUs (see app.core.stock_coalescer)
+    STOCK_COALESCING: bool = False
+    COALESCE_HOT_PER_MINUTE: int = 60  # Issues per minute before a (product, warehouse) is coalesced
+    COALESCE_SAFETY_MARGIN: int = 5  # Units held back from admission between flushes
+    COALESCE_FLUSH_MS: int = 200  # Group commit interval of the flusher
+    
+    # Live change events (GET /events): fan-out in "memory" (single worker) or through "redis"
+    EVENTS_BACKEND: str = "memory"
+    EVENTS_QUEUE_SIZE: int = 1000  # Events buffered per subscriber before it must resync
+    EVENTS_KEEPALIVE_SECONDS: int = 15
+    
+    # Ledger compaction: older months of inventory_transactions are rolled up and archived
+    TRANSACTION_RETENTION_MONTHS: int = 24  # Months kept live (never less than the analytics windows)
+    TRANSACTION_ARCHIVE_DIR: str = "./archive/inventory_transactions"
+    
+    # Replay of write routes that hit a deadlock or lock wait timeout (see app.core.db_retry)
+    DB_RETRY_ATTEMPTS: int = 4  # Attempts in total, including the first
+    DB_RETRY_BASE_MS: int = 25
+    DB_RETRY_MAX_MS: int = 1000
+    DB_RETRY_AFTER_SECONDS: int = 1  # Retry-After once the attempts run out
+    
+    # DuckDB analytics sidecar for heavy reports (empty path disables it)
+    ANALYTICS_DUCKDB_PATH: str = ""
+    ANALYTICS_SYNC_SECONDS: int = 60  # Interval of the background sync
+    ANALYTICS_SYNC_OVERLAP_SECONDS: int = 300  # Re-copied window for late commits
+    ANALYTICS_RETRY_SECONDS: int = 60  # Back-off after the sidecar fails to open or sync
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,198 @@
+"""
+Cost layer engine for perpetual inventory valuation.
+
+Inbound stock opens a cost layer and outbound stock consumes layers oldest
+first. Under FIFO the cost of an issue is the sum of the layers it consumed;
+under moving average it is the running average cost of the (product,
+warehouse). Either way the StockValuation row is updated in the caller's
+transaction, so current value and COGS are a single-row read instead of a
+replay of inventory_transactions.
+
+This is the book value of stock (GET /reports/stock-valuation). The
+inventory valuation report and the dashboard read warehouse_stats instead,
+which values on-hand units at the current product cost price: a
+replacement value that is one row per warehouse to read. The two differ by
+cost price changes on stock not yet sold through.
+"""
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import CostLayer, StockValuation, Product
+
+FIFO = "fifo"
+AVERAGE = "average"
+
+
+def get_stock_valuation(
+    db: Session,
+    product: Product,
+    warehouse_id: str,
+    on_hand_before: int = 0
+) -> StockValuation:
+    """
+    Fetch and lock the valuation row for a product in a warehouse.
+
+    The row is opened on first use. Stock that was on hand before costing
+    started becomes an opening layer at the product's current cost price.
+    When two transactions open the same row, the one that loses the insert
+    waits for the other and uses its row and opening layer.
+    """
+    valuation = db.query(StockValuation).filter(
+        StockValuation.product_id == product.id,
+        StockValuation.warehouse_id == warehouse_id
+    ).with_for_update().first()
+
+    if valuation is None:
+        try:
+            with db.begin_nested():
+                valuation = StockValuation(
+                    product_id=product.id,
+                    warehouse_id=warehouse_id,
+                    quantity=0,
+                    total_value=0.0,
+                    quantity_issued=0,
+                    cogs_total=0.0,
+                    last_layer_sequence=0,
+                    fifo_head_sequence=1
+                )
+                db.add(valuation)
+                db.flush()
+        except IntegrityError:
+            # Opened by a concurrent transaction; the insert waited for its commit
+            return db.query(StockValuation).filter(
+                StockValuation.product_id == product.id,
+                StockValuation.warehouse_id == warehouse_id
+            ).with_for_update().one()
+        if on_hand_before > 0:
+            _add_layer(db, valuation, on_hand_before, product.cost_price or 0.0)
+            db.flush()
+
+    return valuation
+
+
+def receive_stock(
+    db: Session,
+    product: Product,
+    warehouse_id: str,
+    quantity: int,
+    unit_cost: Optional[float] = None,
+    on_hand_before: int = 0,
+    transaction_id: Optional[str] = None
+) -> StockValuation:
+    """Open a cost layer for inbound stock (defaults to the product cost price)."""
+    if unit_cost is None:
+        unit_cost = product.cost_price or 0.0
+
+    valuation = get_stock_valuation(db, product, warehouse_id, on_hand_before)
+    _add_layer(db, valuation, quantity, unit_cost, transaction_id)
+    db.flush()
+
+    return valuation
+
+
+def issue_stock(
+    db: Session,
+    product: Product,
+    warehouse_id: str,
+    quantity: int,
+    on_hand_before: int = 0,
+    is_cogs: bool = True
+) -> float:
+    """
+    Consume cost layers for outbound stock.
+
+    Transfers pass is_cogs=False so the moved cost is not booked as COGS.
+
+    Returns:
+        Cost of the issued units according to INVENTORY_COSTING_METHOD
+    """
+    valuation = get_stock_valuation(db, product, warehouse_id, on_hand_before)
+    fallback_cost = product.cost_price or 0.0
+    average_cost = valuation.average_cost if valuation.quantity > 0 else fallback_cost
+
+    layers = db.query(CostLayer).filter(
+        CostLayer.product_id == product.id,
+        CostLayer.warehouse_id == warehouse_id,
+        CostLayer.sequence >= valuation.fifo_head_sequence,
+        CostLayer.quantity_remaining > 0
+    ).order_by(CostLayer.sequence).with_for_update().all()
+
+    remaining = quantity
+    layered_cost = 0.0
+    for layer in layers:
+        if remaining == 0:
+            break
+        taken = min(remaining, layer.quantity_remaining)
+        layer.quantity_remaining -= taken
+        layered_cost += taken * layer.unit_cost
+        remaining -= taken
+        if layer.quantity_remaining == 0:
+            valuation.fifo_head_sequence = layer.sequence + 1
+
+    if settings.INVENTORY_COSTING_METHOD == AVERAGE:
+        cost = quantity * average_cost
+    else:
+        # Units beyond the recorded layers (negative stock) use the current cost price
+        cost = layered_cost + remaining * fallback_cost
+
+    valuation.quantity -= quantity
+    valuation.total_value = valuation.total_value - cost if valuation.quantity != 0 else 0.0
+    if is_cogs:
+        valuation.quantity_issued += quantity
+        valuation.cogs_total += cost
+
+    return cost
+
+
+def cost_inc_tax(unit_cost: float, tax_rate: Optional[float]) -> float:
+    """Unit cost including input GST at the given rate."""
+    return unit_cost * (1 + (tax_rate or 0.0) / 100)
+
+
+def apply_stock_movement(
+    db: Session,
+    product: Product,
+    warehouse_id: str,
+    quantity: int,
+    on_hand_before: int,
+    unit_cost: Optional[float] = None,
+    transaction_id: Optional[str] = None
+) -> float:
+    """
+    Apply a signed stock movement to the cost layers.
+
+    Returns:
+        Value of the movement (receipt value for inbound, cost for outbound)
+    """
+    if quantity > 0:
+        receive_stock(db, product, warehouse_id, quantity, unit_cost, on_hand_before, transaction_id)
+        return quantity * (unit_cost if unit_cost is not None else (product.cost_price or 0.0))
+    if quantity < 0:
+        return issue_stock(db, product, warehouse_id, -quantity, on_hand_before)
+    return 0.0
+
+
+def _add_layer(
+    db: Session,
+    valuation: StockValuation,
+    quantity: int,
+    unit_cost: float,
+    transaction_id: Optional[str] = None
+) -> None:
+    # Units already issued into negative stock were costed at issue time,
+    # so only the remainder of the receipt stays open in the layer
+    deficit = max(0, -(valuation.quantity or 0))
+    valuation.last_layer_sequence = (valuation.last_layer_sequence or 0) + 1
+    db.add(CostLayer(
+        product_id=valuation.product_id,
+        warehouse_id=valuation.warehouse_id,
+        sequence=valuation.last_layer_sequence,
+        transaction_id=transaction_id,
+        quantity_received=quantity,
+        quantity_remaining=max(0, quantity - deficit),
+        unit_cost=unit_cost
+    ))
+    valuation.quantity = (valuation.quantity or 0) + quantity
+    valuation.total_value = (valuation.total_value or 0.0) + quantity * unit_cost
@@ -0,0 +1,219 @@
+"""
+Cycle-count sessions.
+
+While a session is open, scans only increment per-code tallies in a scan
+buffer: an in-process Counter by default, or Redis hashes when
+CYCLE_COUNT_BUFFER is "redis" (needed with more than one worker, and the
+only option that survives a restart). Nothing touches the database per
+scan. Closing the session resolves the scanned codes to products (barcode
+first, then SKU) with set-based lookups, posts the counts through the bulk
+adjustment path and records the count lines against the on-hand each
+adjustment was applied to.
+
+The first scan batch of a session also sets its scan_count in the
+database. If the buffer later no longer knows a session that has scanned,
+its tallies were lost (a restart of the memory buffer, or Redis data loss).
+Scans and close then answer 409 rather than count from zero.
+"""
+import json
+import threading
+from collections import Counter, namedtuple
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.stock_adjustments import apply_adjustments, ERROR
+from app.core.stock_coalescer import pending_issues
+from app.models.models import (
+    CycleCountLine, CycleCountSession, CycleCountStatus, Inventory, Product, generate_uuid
+)
+
+LOOKUP_CHUNK = 1000
+
+# Shape expected by apply_adjustments
+CountLine = namedtuple("CountLine", "product_id sku warehouse_id quantity counted_quantity unit_cost notes")
+
+
+class MemoryScanBuffer:
+    """Per-process tallies; scans are lost if the worker restarts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tallies: Dict[str, Counter] = {}
+        self._scans: Dict[str, int] = {}
+
+    def open(self, session_id: str) -> None:
+        with self._lock:
+            self._tallies.setdefault(session_id, Counter())
+            self._scans.setdefault(session_id, 0)
+
+    def is_open(self, session_id: str) -> bool:
+        return session_id in self._tallies
+
+    def add(self, session_id: str, counts: Dict[str, int], scans: int) -> int:
+        with self._lock:
+            self._tallies[session_id].update(counts)
+            self._scans[session_id] += scans
+            return self._scans[session_id]
+
+    def tallies(self, session_id: str) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._tallies.get(session_id, {}))
+
+    def scan_count(self, session_id: str) -> int:
+        return self._scans.get(session_id, 0)
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._tallies.pop(session_id, None)
+            self._scans.pop(session_id, None)
+
+
+class RedisScanBuffer:
+    """Tallies in a Redis hash per session, shared by all workers."""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"cycle_count:{session_id}"
+
+    def open(self, session_id: str) -> None:
+        self._redis.setnx(f"{self._key(session_id)}:scans", 0)
+
+    def is_open(self, session_id: str) -> bool:
+        return bool(self._redis.exists(f"{self._key(session_id)}:scans"))
+
+    def add(self, session_id: str, counts: Dict[str, int], scans: int) -> int:
+        key = self._key(session_id)
+        pipe = self._redis.pipeline(transaction=False)
+        for code, quantity in counts.items():
+            pipe.hincrby(key, code, quantity)
+        pipe.incrby(f"{key}:scans", scans)
+        return int(pipe.execute()[-1])
+
+    def tallies(self, session_id: str) -> Dict[str, int]:
+        return {code: int(quantity) for code, quantity in self._redis.hgetall(self._key(session_id)).items()}
+
+    def scan_count(self, session_id: str) -> int:
+        return int(self._redis.get(f"{self._key(session_id)}:scans") or 0)
+
+    def discard(self, session_id: str) -> None:
+        key = self._key(session_id)
+        self._redis.delete(key, f"{key}:scans")
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def resolve_codes(db: Session, codes: List[str]) -> Dict[str, Product]:
+    """Map scanned codes to products by barcode, then by SKU."""
+    resolved = {}
+    for chunk in _chunks(codes):
+        for product in db.query(Product).filter(Product.barcode.in_(chunk)):
+            resolved[product.barcode] = product
+    remaining = [code for code in codes if code not in resolved]
+    for chunk in _chunks(remaining):
+        for product in db.query(Product).filter(Product.sku.in_(chunk)):
+            resolved[product.sku] = product
+    return resolved
+
+
+def close_session(
+    db: Session,
+    session: CycleCountSession,
+    tallies: Dict[str, int],
+    user_id: str,
+    zero_uncounted: bool = False,
+    apply: bool = True
+) -> List[dict]:
+    """
+    Reconcile a session's tallies against on-hand stock; the caller commits.
+
+    `zero_uncounted` treats products with stock in the warehouse that were
+    never scanned as counted at zero (a full count rather than a partial
+    one). With `apply` false the variances are recorded but stock is not
+    adjusted.
+
+    Returns:
+        Adjustment results for lines that could not be applied
+    """
+    products = resolve_codes(db, list(tallies))
+    counted: Dict[str, int] = {}
+    by_id: Dict[str, Product] = {}
+    for code, quantity in tallies.items():
+        product = products.get(code)
+        if product is not None:
+            counted[product.id] = counted.get(product.id, 0) + quantity
+            by_id[product.id] = product
+    unknown = sorted(code for code in tallies if code not in products)
+
+    expected: Dict[str, int] = {}
+    stock = db.query(Inventory.product_id, Inventory.quantity_on_hand).filter(
+        Inventory.warehouse_id == session.warehouse_id
+    )
+    if zero_uncounted:
+        for product_id, quantity in stock.filter(Inventory.quantity_on_hand != 0):
+            expected[product_id] = quantity or 0
+            counted.setdefault(product_id, 0)
+        missing = [product_id for product_id in counted if product_id not in by_id]
+        for chunk in _chunks(missing):
+            by_id.update((p.id, p) for p in db.query(Product).filter(Product.id.in_(chunk)))
+    else:
+        for chunk in _chunks(list(counted)):
+            for product_id, quantity in stock.filter(Inventory.product_id.in_(chunk)):
+                expected[product_id] = quantity or 0
+    # Sales not yet flushed are already off the shelf
+    for (product_id, _), quantity in pending_issues(db, ((product_id, session.warehouse_id) for product_id in expected)).items():
+        expected[product_id] -= quantity
+
+    failed = []
+    if apply and counted:
+        notes = f"Cycle count {session.id[:8]}"
+        results = apply_adjustments(db, [
+            CountLine(product_id, None, session.warehouse_id, None, quantity, None, notes)
+            for product_id, quantity in counted.items()
+        ], user_id)
+        failed = [r for r in results if r["status"] == ERROR]
+        # Record the on-hand the adjustment was posted against (read under
+        # lock), not the earlier unlocked read
+        for result in results:
+            if result["quantity_before"] is not None:
+                expected[result["product_id"]] = result["quantity_before"]
+
+    lines = []
+    for product_id, quantity in counted.items():
+        unit_cost = by_id[product_id].cost_price or 0.0
+        variance = quantity - expected.get(product_id, 0)
+        lines.append({
+            "id": generate_uuid(),
+            "session_id": session.id,
+            "product_id": product_id,
+            "expected_quantity": expected.get(product_id, 0),
+            "counted_quantity": quantity,
+            "variance": variance,
+            "unit_cost": unit_cost,
+            "variance_value": variance * unit_cost
+        })
+    for chunk in _chunks(lines):
+        db.execute(insert(CycleCountLine), chunk)
+
+    session.status = CycleCountStatus.CLOSED
+    session.closed_by = user_id
+    session.closed_at = datetime.now()
+    session.line_count = len(lines)
+    session.variance_units = sum(line["variance"] for line in lines)
+    session.variance_value = sum(line["variance_value"] for line in lines)
+    session.unknown_codes = json.dumps(unknown) if unknown else None
+
+    return failed
+
+
+scan_buffer = RedisScanBuffer(settings.REDIS_URL) if settings.CYCLE_COUNT_BUFFER == "redis" else MemoryScanBuffer()
@@ -0,0 +1,120 @@
+"""
+Replay of write routes that lose a lock conflict.
+
+Concurrent fulfilments and transfers lock the same inventory, valuation
+and stats rows, sometimes in different orders. The database then aborts
+one of the transactions. The codes it uses:
+
+- MySQL: deadlock 1213, lock wait timeout 1205
+- PostgreSQL: deadlock 40P01, serialization failure 40001,
+  lock not available 55P03
+- SQLite: "database is locked"
+
+@retry_transaction catches these, rolls the session back and runs the
+route again, up to DB_RETRY_ATTEMPTS times. Between attempts it sleeps a
+random time of up to DB_RETRY_BASE_MS * 2^n, capped at DB_RETRY_MAX_MS
+(full jitter), so the losers do not collide again in step.
+
+A route is only replayed while nothing it did has been committed, so the
+wrapped routes commit once, audit log included. A conflict after a commit
+is raised as is. Side effects outside the database must be undone on error (holds,
+coalescer admissions), as the wrapped routes already do. When the
+attempts run out, the error reaches the OperationalError handler, which
+answers 503 with Retry-After instead of 500.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import threading
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MYSQL_RETRYABLE_ERRORS = {1213, 1205}
+POSTGRES_RETRYABLE_STATES = {"40P01", "40001", "55P03"}
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _count_commit(session: Session) -> None:
+    session.info["commits"] = session.info.get("commits", 0) + 1
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a database error means the transaction lost a lock conflict."""
+    if not isinstance(exc, DBAPIError):
+        return False
+    orig = getattr(exc, "orig", None)
+    if orig is None:
+        return False
+    code = orig.args[0] if orig.args else None
+    return (
+        code in MYSQL_RETRYABLE_ERRORS
+        or getattr(orig, "pgcode", None) in POSTGRES_RETRYABLE_STATES
+        or "database is locked" in str(orig)
+    )
+
+
+def _record(name: str, outcome: str) -> None:
+    with _lock:
+        counters = _stats.setdefault(name, {"retries": 0, "recovered": 0, "failed": 0})
+        counters[outcome] += 1
+
+
+def retry_stats() -> Dict[str, Dict[str, int]]:
+    """Retry counters per route since the process started."""
+    with _lock:
+        return {name: dict(counters) for name, counters in _stats.items()}
+
+
+def backoff_seconds(attempt: int) -> float:
+    ceiling = min(settings.DB_RETRY_MAX_MS, settings.DB_RETRY_BASE_MS * 2 ** attempt)
+    return random.uniform(0, ceiling) / 1000
+
+
+def retry_transaction(func):
+    """Replay an async route on deadlocks and lock timeouts; it must take a `db` session."""
+    signature = inspect.signature(func)
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        db: Session = signature.bind_partial(*args, **kwargs).arguments["db"]
+        attempt = 0
+        while True:
+            commits = db.info.get("commits", 0)
+            try:
+                result = await func(*args, **kwargs)
+            except DBAPIError as exc:
+                retry = (
+                    is_retryable(exc)
+                    and attempt + 1 < settings.DB_RETRY_ATTEMPTS
+                    and db.info.get("commits", 0) == commits
+                )
+                if is_retryable(exc) and not retry:
+                    _record(name, "failed")
+                if not retry:
+                    raise
+                db.rollback()
+                delay = backoff_seconds(attempt)
+                attempt += 1
+                _record(name, "retries")
+                logger.warning(f"{name}: lock conflict ({exc.orig}); retry {attempt} in {delay * 1000:.0f} ms")
+                await asyncio.sleep(delay)
+                continue
+            if attempt:
+                _record(name, "recovered")
+            return result
+
+    return wrapper
@@ -0,0 +1,206 @@
+"""
+Change events for live clients.
+
+Write paths publish a compact event after they commit; GET /events streams
+them to subscribers as server-sent events. Event types:
+
+    stock  {"source", "changes": [{"product_id", "warehouse_id", "delta", "on_hand"}]}
+    order  {"action": created|fulfilled|cancelled, "order_id", "order_number", "warehouse_id", "status"}
+    alert  {"action": raised|acknowledged|resolved, "alert_id", "product_id", "warehouse_id", "alert_type"}
+
+`on_hand` is null where the writer does not know it without another read
+(coalesced issues, transfers); clients apply the delta or refetch.
+
+With EVENTS_BACKEND "memory" events only reach subscribers of the worker
+that published them. With "redis" every worker publishes to one Redis
+channel and relays it to its own subscribers, so any worker can serve a
+stream. If Redis cannot be reached the event is delivered locally instead.
+Events are fire-and-forget: a subscriber that falls EVENTS_QUEUE_SIZE
+events behind gets a `resync` event and should refetch.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STOCK = "stock"
+ORDER = "order"
+ALERT = "alert"
+EVENT_TYPES = (STOCK, ORDER, ALERT)
+
+
+class Subscriber:
+    """One stream's queue, fed from any thread via its event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, types: Set[str], warehouse_id: Optional[str]):
+        self.loop = loop
+        self.types = types
+        self.warehouse_id = warehouse_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _view(self, event: dict) -> Optional[dict]:
+        """The event as this subscriber should see it, or None to skip it."""
+        if event["type"] not in self.types:
+            return None
+        if self.warehouse_id is None:
+            return event
+        data = event["data"]
+        if event["type"] == STOCK:
+            changes = [c for c in data["changes"] if c["warehouse_id"] == self.warehouse_id]
+            if not changes:
+                return None
+            return {**event, "data": {**data, "changes": changes}}
+        return event if data.get("warehouse_id") == self.warehouse_id else None
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def offer(self, event: dict) -> None:
+        event = self._view(event)
+        if event is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Loop closed; the stream is gone
+
+
+class MemoryEventBus:
+    """Fans events out to this worker's subscribers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._seq = 0
+
+    def subscribe(self, types: Iterable[str], warehouse_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop(), set(types), warehouse_id)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def _event(self, event_type: str, data: dict) -> dict:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        return {"id": f"{int(time.time() * 1000)}-{seq}", "type": event_type, "data": data}
+
+    def deliver(self, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(event)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        self.deliver(self._event(event_type, data))
+
+
+class RedisEventBus(MemoryEventBus):
+    """Publishes through a Redis channel; each worker relays it locally."""
+
+    CHANNEL = "inventory:events"
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, types: Iterable[str], warehouse_id: Optional[str] = None) -> Subscriber:
+        self._ensure_listener()
+        return super().subscribe(types, warehouse_id)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        event = self._event(event_type, data)
+        try:
+            self._redis.publish(self.CHANNEL, json.dumps(event, default=str))
+        except Exception as exc:
+            logger.warning(f"Event publish to Redis failed, delivering locally: {exc}")
+            self.deliver(event)
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="event-relay", daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        backoff = 1
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                backoff = 1
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.deliver(json.loads(message["data"]))
+            except Exception as exc:
+                logger.warning(f"Event relay lost Redis, retrying in {backoff}s: {exc}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+event_bus = RedisEventBus(settings.REDIS_URL) if settings.EVENTS_BACKEND == "redis" else MemoryEventBus()
+
+
+def publish(event_type: str, data: dict) -> None:
+    """Publish an event; never raises into the write path that committed it."""
+    try:
+        event_bus.publish(event_type, data)
+    except Exception:
+        logger.exception(f"Failed to publish {event_type} event")
+
+
+def publish_stock(source: str, changes: Iterable[Tuple[str, str, int, Optional[int]]]) -> None:
+    """Publish (product_id, warehouse_id, delta, on_hand) stock changes."""
+    rows: List[dict] = [
+        {"product_id": product_id, "warehouse_id": warehouse_id, "delta": delta, "on_hand": on_hand}
+        for product_id, warehouse_id, delta, on_hand in changes
+        if delta
+    ]
+    if rows:
+        publish(STOCK, {"source": source, "changes": rows})
+
+
+def publish_order(action: str, order) -> None:
+    publish(ORDER, {
+        "action": action,
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "warehouse_id": order.warehouse_id,
+        "status": getattr(order.status, "value", order.status)
+    })
+
+
+def alert_event(action: str, alert) -> dict:
+    return {
+        "action": action,
+        "alert_id": alert.id,
+        "product_id": alert.product_id,
+        "warehouse_id": alert.warehouse_id,
+        "alert_type": getattr(alert.alert_type, "value", alert.alert_type)
+    }
+
+
+def publish_alert(action: str, alert) -> None:
+    publish(ALERT, alert_event(action, alert))
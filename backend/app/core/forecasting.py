@@ -0,0 +1,220 @@
+"""
+Batch demand forecasting and reorder suggestions.
+
+Daily sales per (product, warehouse) are pulled from inventory_transactions
+into a single NumPy matrix (one row per pair, one column per day) and the
+whole catalog is smoothed in one vectorized pass. Results are written to
+reorder_suggestions so the API never recomputes them at request time.
+"""
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    Inventory, InventoryTransaction, Product, ReorderSuggestion, TransactionType
+)
+
+Pair = Tuple[str, str]
+
+
+def load_daily_sales(
+    db: Session,
+    end_date: date,
+    history_days: int,
+    index: Optional[Dict[Pair, int]] = None
+) -> Tuple[List[Pair], np.ndarray]:
+    """
+    Load units sold per (product, warehouse) per day.
+
+    Returns:
+        Tuple of (pairs, matrix) where matrix[i, d] is the quantity of
+        pairs[i] sold on day d of the window ending at end_date
+    """
+    return load_daily_matrix(
+        db, end_date, history_days, -InventoryTransaction.quantity, index,
+        InventoryTransaction.transaction_type == TransactionType.SALE
+    )
+
+
+def load_daily_matrix(
+    db: Session,
+    end_date: date,
+    history_days: int,
+    quantity_expr,
+    index: Optional[Dict[Pair, int]] = None,
+    *filters
+) -> Tuple[List[Pair], np.ndarray]:
+    """
+    Sum `quantity_expr` over inventory_transactions per pair per day.
+
+    Passing an existing pair `index` keeps rows aligned with an earlier
+    matrix; new pairs are appended to it.
+    """
+    start_date = end_date - timedelta(days=history_days - 1)
+    day = func.date(InventoryTransaction.created_at)
+
+    rows = db.query(
+        InventoryTransaction.product_id,
+        InventoryTransaction.warehouse_id,
+        day.label("day"),
+        func.sum(quantity_expr).label("units")
+    ).filter(
+        InventoryTransaction.created_at >= datetime.combine(start_date, datetime.min.time()),
+        InventoryTransaction.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        *filters
+    ).group_by(
+        InventoryTransaction.product_id,
+        InventoryTransaction.warehouse_id,
+        day
+    ).all()
+
+    index = {} if index is None else index
+    row_idx = np.empty(len(rows), dtype=np.int64)
+    day_idx = np.empty(len(rows), dtype=np.int64)
+    units = np.empty(len(rows), dtype=np.float64)
+    for i, r in enumerate(rows):
+        row_idx[i] = index.setdefault((r.product_id, r.warehouse_id), len(index))
+        # DATE() comes back as a date on MySQL and as a string on SQLite
+        day_idx[i] = (date.fromisoformat(str(r.day)[:10]) - start_date).days
+        units[i] = r.units or 0
+
+    matrix = np.zeros((len(index), history_days), dtype=np.float64)
+    np.add.at(matrix, (row_idx, day_idx), units)
+
+    return list(index), matrix
+
+
+def smooth_demand(
+    matrix: np.ndarray,
+    alpha: float,
+    window: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit demand for every row of a daily sales matrix at once.
+
+    Returns:
+        Tuple of (exponentially smoothed level, trailing moving average,
+        standard deviation of daily demand), one value per row
+    """
+    n_pairs, n_days = matrix.shape
+    if n_days == 0:
+        zeros = np.zeros(n_pairs)
+        return zeros, zeros, zeros
+
+    level = matrix[:, 0].copy()
+    for t in range(1, n_days):
+        level = alpha * matrix[:, t] + (1 - alpha) * level
+
+    moving_average = matrix[:, -window:].mean(axis=1)
+    std = matrix.std(axis=1)
+
+    return level, moving_average, std
+
+
+def compute_suggestions(
+    daily_demand: np.ndarray,
+    demand_std: np.ndarray,
+    on_hand: np.ndarray,
+    unit_cost: np.ndarray,
+    lead_time_days: float,
+    service_level_z: float,
+    order_cost: float,
+    holding_cost_rate: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Derive reorder point, EOQ and days of cover from fitted demand.
+
+    Returns:
+        Tuple of (reorder_point, reorder_quantity, days_of_cover); days of
+        cover is NaN where there is no demand
+    """
+    safety_stock = service_level_z * demand_std * math.sqrt(lead_time_days)
+    reorder_point = np.ceil(daily_demand * lead_time_days + safety_stock)
+
+    annual_demand = daily_demand * 365
+    holding_cost = np.maximum(unit_cost * holding_cost_rate, 1e-6)
+    eoq = np.ceil(np.sqrt(2 * annual_demand * order_cost / holding_cost))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(daily_demand > 0, on_hand / daily_demand, np.nan)
+
+    return reorder_point, eoq, days_of_cover
+
+
+def run_forecast(db: Session, end_date: Optional[date] = None) -> int:
+    """
+    Recompute reorder suggestions for every (product, warehouse) pair.
+
+    Pairs that hold stock but have no sales in the window are included with
+    zero demand so dead stock is visible too.
+
+    Returns:
+        Number of suggestions written
+    """
+    end_date = end_date or date.today()
+    history_days = settings.FORECAST_HISTORY_DAYS
+
+    pairs, matrix = load_daily_sales(db, end_date, history_days)
+    index = {pair: i for i, pair in enumerate(pairs)}
+
+    stock = db.query(
+        Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand
+    ).all()
+    on_hand_by_pair = {}
+    for s in stock:
+        pair = (s.product_id, s.warehouse_id)
+        on_hand_by_pair[pair] = s.quantity_on_hand or 0
+        if pair not in index:
+            index[pair] = len(pairs)
+            pairs.append(pair)
+
+    if len(pairs) > matrix.shape[0]:
+        matrix = np.vstack([matrix, np.zeros((len(pairs) - matrix.shape[0], history_days))])
+
+    cost_by_product = dict(db.query(Product.id, Product.cost_price).all())
+    on_hand = np.array([on_hand_by_pair.get(p, 0) for p in pairs], dtype=np.float64)
+    unit_cost = np.array([cost_by_product.get(p[0]) or 0.0 for p in pairs], dtype=np.float64)
+
+    level, moving_average, demand_std = smooth_demand(
+        matrix, settings.FORECAST_SMOOTHING_ALPHA, settings.FORECAST_MOVING_AVERAGE_DAYS
+    )
+    reorder_point, reorder_quantity, days_of_cover = compute_suggestions(
+        level,
+        demand_std,
+        on_hand,
+        unit_cost,
+        settings.FORECAST_LEAD_TIME_DAYS,
+        settings.FORECAST_SERVICE_LEVEL_Z,
+        settings.FORECAST_ORDER_COST,
+        settings.FORECAST_HOLDING_COST_RATE
+    )
+
+    computed_at = datetime.utcnow()
+    rows = [
+        {
+            "product_id": pair[0],
+            "warehouse_id": pair[1],
+            "daily_demand": float(level[i]),
+            "moving_average": float(moving_average[i]),
+            "demand_std": float(demand_std[i]),
+            "quantity_on_hand": int(on_hand[i]),
+            "suggested_reorder_point": int(reorder_point[i]),
+            "suggested_reorder_quantity": int(reorder_quantity[i]),
+            "days_of_cover": None if np.isnan(days_of_cover[i]) else float(days_of_cover[i]),
+            "computed_at": computed_at
+        }
+        for i, pair in enumerate(pairs)
+    ]
+
+    # Replace the previous run in one transaction
+    db.query(ReorderSuggestion).delete(synchronize_session=False)
+    for start in range(0, len(rows), 5000):
+        db.execute(insert(ReorderSuggestion), rows[start:start + 5000])
+    db.commit()
+
+    return len(rows)
@@ -0,0 +1,219 @@
+"""
+HSN/SAC-wise GST summaries for return filing.
+
+Sales lines are aggregated per month by HSN/SAC code, tax rate and supply
+type (intra-state lines split tax equally into CGST/SGST, inter-state lines
+carry IGST). Months that are past the filing lock are frozen into
+gst_monthly_summaries by close_gst_periods(); open months are aggregated
+live. Either way the database returns grouped rows, so a full financial
+year is produced one month at a time without loading individual lines.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    GstClosedPeriod, GstMonthlySummary, OrderStatus, Product, SalesOrder, SalesOrderItem
+)
+
+INTRA = "intra"
+INTER = "inter"
+DEFAULT_UQC = "NOS"
+
+SUMMARY_FIELDS = ("quantity", "taxable_value", "igst", "cgst", "sgst", "total_value", "line_count")
+
+
+def financial_year_periods(financial_year: str) -> List[str]:
+    """
+    Months of an Indian financial year (April to March).
+
+    Accepts "2025-26" or "2025" for the year starting April 2025.
+    """
+    start_year = int(financial_year.split("-")[0])
+    return [
+        f"{start_year + (month > 12)}-{(month - 1) % 12 + 1:02d}"
+        for month in range(4, 16)
+    ]
+
+
+def period_bounds(period: str) -> Tuple[datetime, datetime]:
+    """Start (inclusive) and end (exclusive) datetimes of a YYYY-MM period."""
+    year, month = (int(part) for part in period.split("-"))
+    start = datetime(year, month, 1)
+    end = datetime(year + (month == 12), month % 12 + 1, 1)
+    return start, end
+
+
+def is_closable(period: str, today: Optional[date] = None) -> bool:
+    """A period can be frozen once GST_PERIOD_LOCK_DAYS have passed after it ends."""
+    today = today or date.today()
+    _, end = period_bounds(period)
+    return end.date() + timedelta(days=settings.GST_PERIOD_LOCK_DAYS) <= today
+
+
+def aggregate_period(db: Session, period: str) -> List[dict]:
+    """Aggregate one month of sales lines by HSN/SAC, rate and supply type."""
+    start, end = period_bounds(period)
+    hsn = func.coalesce(Product.hsn_sac, "0")
+    # Lines without a rate are filed at 0%, in the same row as 0% lines
+    rate = func.coalesce(SalesOrderItem.tax_rate, 0)
+    supply_type = case(
+        (
+            (SalesOrder.billing_state.isnot(None))
+            & (SalesOrder.seller_state.isnot(None))
+            & (func.lower(SalesOrder.billing_state) != func.lower(SalesOrder.seller_state)),
+            INTER
+        ),
+        else_=INTRA
+    )
+
+    rows = db.query(
+        hsn.label("hsn_sac"),
+        rate.label("tax_rate"),
+        supply_type.label("supply_type"),
+        func.sum(SalesOrderItem.quantity).label("quantity"),
+        func.sum((SalesOrderItem.quantity * SalesOrderItem.unit_price) - SalesOrderItem.discount).label("taxable_value"),
+        func.sum(SalesOrderItem.tax_amount).label("tax_amount"),
+        func.sum(SalesOrderItem.line_total).label("total_value"),
+        func.count(SalesOrderItem.id).label("line_count")
+    ).join(
+        SalesOrder, SalesOrderItem.sales_order_id == SalesOrder.id
+    ).join(
+        Product, SalesOrderItem.product_id == Product.id
+    ).filter(
+        SalesOrder.order_date >= start,
+        SalesOrder.order_date < end,
+        SalesOrder.status != OrderStatus.CANCELLED
+    ).group_by(
+        hsn, rate, supply_type
+    ).order_by(
+        hsn, rate
+    ).all()
+
+    result = []
+    for r in rows:
+        tax = float(r.tax_amount or 0)
+        inter = r.supply_type == INTER
+        result.append({
+            "period": period,
+            "hsn_sac": r.hsn_sac,
+            "tax_rate": float(r.tax_rate or 0),
+            "supply_type": r.supply_type,
+            "quantity": int(r.quantity or 0),
+            "taxable_value": float(r.taxable_value or 0),
+            "igst": tax if inter else 0.0,
+            "cgst": 0.0 if inter else tax / 2,
+            "sgst": 0.0 if inter else tax / 2,
+            "total_value": float(r.total_value or 0),
+            "line_count": int(r.line_count or 0)
+        })
+    return result
+
+
+def close_gst_periods(
+    db: Session,
+    periods: Optional[List[str]] = None,
+    rebuild: bool = False,
+    user_id: Optional[str] = None
+) -> List[str]:
+    """
+    Freeze closable months into gst_monthly_summaries.
+
+    Without `periods`, every closable month from the first sale onwards that
+    is not yet closed is processed. `rebuild` recomputes months that are
+    already closed (e.g. after an amendment).
+
+    Returns:
+        Periods written
+    """
+    closed = {p for (p,) in db.query(GstClosedPeriod.period).all()}
+
+    if periods is None:
+        first_order = db.query(func.min(SalesOrder.order_date)).scalar()
+        periods = []
+        if first_order is not None:
+            cursor = date(first_order.year, first_order.month, 1)
+            while is_closable(cursor.strftime("%Y-%m")):
+                periods.append(cursor.strftime("%Y-%m"))
+                cursor = (cursor + timedelta(days=32)).replace(day=1)
+
+    written = []
+    for period in periods:
+        if not is_closable(period) or (period in closed and not rebuild):
+            continue
+
+        rows = aggregate_period(db, period)
+        db.query(GstMonthlySummary).filter(GstMonthlySummary.period == period).delete(synchronize_session=False)
+        db.query(GstClosedPeriod).filter(GstClosedPeriod.period == period).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(GstMonthlySummary), rows)
+        db.add(GstClosedPeriod(
+            period=period,
+            line_count=sum(r["line_count"] for r in rows),
+            taxable_value=sum(r["taxable_value"] for r in rows),
+            tax_total=sum(r["igst"] + r["cgst"] + r["sgst"] for r in rows),
+            closed_by=user_id
+        ))
+        db.commit()
+        written.append(period)
+
+    return written
+
+
+def iter_period_summaries(db: Session, periods: List[str]) -> Iterator[Tuple[str, bool, List[dict]]]:
+    """
+    Yield (period, is_closed, rows) month by month.
+
+    Closed months are read from gst_monthly_summaries; open months are
+    aggregated live.
+    """
+    closed = {
+        p for (p,) in db.query(GstClosedPeriod.period).filter(GstClosedPeriod.period.in_(periods)).all()
+    }
+    for period in periods:
+        if period in closed:
+            rows = [
+                {"period": s.period, "hsn_sac": s.hsn_sac, "tax_rate": s.tax_rate, "supply_type": s.supply_type,
+                 **{field: getattr(s, field) or 0 for field in SUMMARY_FIELDS}}
+                for s in db.query(GstMonthlySummary).filter(
+                    GstMonthlySummary.period == period
+                ).order_by(GstMonthlySummary.hsn_sac, GstMonthlySummary.tax_rate)
+            ]
+            yield period, True, rows
+        else:
+            yield period, False, aggregate_period(db, period)
+
+
+def gstr1_hsn_data(rows: List[dict]) -> List[dict]:
+    """
+    Collapse supply types into GSTR-1 HSN summary entries (one per HSN and rate).
+    """
+    merged: Dict[Tuple[str, float], dict] = {}
+    for r in rows:
+        key = (r["hsn_sac"], r["tax_rate"])
+        entry = merged.setdefault(key, {
+            "hsn_sc": r["hsn_sac"],
+            "uqc": DEFAULT_UQC,
+            "qty": 0,
+            "rt": r["tax_rate"],
+            "txval": 0.0,
+            "iamt": 0.0,
+            "camt": 0.0,
+            "samt": 0.0,
+            "csamt": 0.0
+        })
+        entry["qty"] += r["quantity"]
+        entry["txval"] += r["taxable_value"]
+        entry["iamt"] += r["igst"]
+        entry["camt"] += r["cgst"]
+        entry["samt"] += r["sgst"]
+
+    data = []
+    for num, entry in enumerate(merged.values(), start=1):
+        for field in ("txval", "iamt", "camt", "samt"):
+            entry[field] = round(entry[field], 2)
+        data.append({"num": num, **entry})
+    return data
@@ -0,0 +1,295 @@
+"""
+Rolling top-N product leaderboards.
+
+Sales are kept as daily buckets per (product, warehouse) in
+product_sales_daily, and product_leaderboards holds the running totals of
+every 1/7/30 day window per warehouse. Orders add their lines to the bucket
+and to each window when created and subtract them when cancelled, with one
+upsert per row, so concurrent first sales of a product do not race on the
+unique keys. Windows roll forward by subtracting the buckets that fall out
+of them, so reading a warehouse's top N is an indexed ORDER BY ... LIMIT N
+on the totals regardless of sales volume.
+
+The board across all warehouses is summed from the warehouse totals when it
+is read. Keeping it as rows of its own would make every checkout of a
+product lock the same row in every warehouse.
+
+Windows are calendar days: the 1 day window is today, the 7 day window is
+today and the six days before it. Reads never write: order writers roll the
+windows forward when the day has changed, and `python jobs.py
+leaderboards-roll` does it on days without orders.
+
+The tables are seeded by their migration or by `python jobs.py
+leaderboards`. Until then orders are not recorded (is_built() is false)
+and readers aggregate order lines instead.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import (
+    LeaderboardWindow, OrderStatus, Product, ProductLeaderboard, ProductSalesDaily,
+    SalesOrder, SalesOrderItem, generate_uuid
+)
+
+WINDOWS = (1, 7, 30)
+GLOBAL_SCOPE = "all"  # Scope of the former all-warehouse rows; ignored, dropped by a rebuild
+
+
+def _order_day(order: SalesOrder) -> date:
+    return (order.order_date or datetime.now()).date()
+
+
+def is_built(db: Session) -> bool:
+    """Whether the leaderboards have been seeded from the order history."""
+    return db.query(LeaderboardWindow.id).first() is not None
+
+
+def _window_state(db: Session, today: date, lock: bool = False) -> Dict[int, date]:
+    """Last expired day per window ({} until built); a newly added window opens empty."""
+    query = db.query(LeaderboardWindow)
+    # Order writers share the lock, rolling a window takes it exclusively
+    query = query.with_for_update() if lock else query.with_for_update(read=True)
+    state = {w.window_days: w.expired_through for w in query.all()}
+    if not state:
+        return state
+
+    for window in WINDOWS:
+        if window not in state:
+            state[window] = today - timedelta(days=window)
+            db.add(LeaderboardWindow(window_days=window, expired_through=state[window]))
+            db.flush()
+    return state
+
+
+def _add(db: Session, model, key: dict, revenue: float, quantity: int) -> None:
+    """Add to the row with this unique key, inserting it if missing, in one statement."""
+    table = model.__table__
+    values = {"id": generate_uuid(), **key, "revenue": revenue, "quantity": quantity}
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(
+            revenue=func.coalesce(table.c.revenue, 0) + stmt.inserted.revenue,
+            quantity=func.coalesce(table.c.quantity, 0) + stmt.inserted.quantity
+        )
+    elif dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_={
+            "revenue": func.coalesce(table.c.revenue, 0) + stmt.excluded.revenue,
+            "quantity": func.coalesce(table.c.quantity, 0) + stmt.excluded.quantity
+        })
+    else:
+        row = db.query(model).filter_by(**key).with_for_update().first()
+        if row is None:
+            db.add(model(**values))
+        else:
+            row.revenue = (row.revenue or 0.0) + revenue
+            row.quantity = (row.quantity or 0) + quantity
+        db.flush()
+        return
+    db.execute(stmt)
+
+
+def record_order(
+    db: Session,
+    order: SalesOrder,
+    items: Optional[Iterable[SalesOrderItem]] = None,
+    sign: int = 1
+) -> None:
+    """
+    Add an order's lines to the leaderboards (sign=-1 removes them on cancellation).
+
+    Runs in the caller's transaction, after rolling the windows to today.
+    """
+    day = _order_day(order)
+    roll_windows(db)
+    state = _window_state(db, date.today())
+    if not state:
+        return  # Not built yet; the seed will include this order
+    if day <= state[max(WINDOWS)]:
+        return  # Older than every window
+
+    totals = defaultdict(lambda: [0.0, 0])
+    for item in (items if items is not None else order.items):
+        totals[item.product_id][0] += sign * (item.line_total or 0.0)
+        totals[item.product_id][1] += sign * (item.quantity or 0)
+
+    for product_id, (revenue, quantity) in totals.items():
+        _add(db, ProductSalesDaily, {
+            "product_id": product_id, "warehouse_id": order.warehouse_id, "day": day
+        }, revenue, quantity)
+        for window in WINDOWS:
+            if day <= state[window]:
+                continue  # Already rolled out of this window
+            _add(db, ProductLeaderboard, {
+                "scope": order.warehouse_id, "window_days": window, "product_id": product_id
+            }, revenue, quantity)
+
+
+def roll_windows(db: Session, today: Optional[date] = None) -> bool:
+    """
+    Subtract daily buckets that have left each window and purge old buckets.
+
+    Cheap when nothing has expired, so order writers call it every time.
+
+    Returns:
+        Whether anything changed (the caller commits)
+    """
+    today = today or date.today()
+    state = {w.window_days: w.expired_through for w in db.query(LeaderboardWindow).all()}
+    if not state or all(state.get(window) == today - timedelta(days=window) for window in WINDOWS):
+        return False
+
+    state = _window_state(db, today, lock=True)
+    changed = False
+    for window in WINDOWS:
+        through = today - timedelta(days=window)
+        if state[window] >= through:
+            continue
+
+        expired = db.query(
+            ProductSalesDaily.product_id,
+            ProductSalesDaily.warehouse_id,
+            func.sum(ProductSalesDaily.revenue).label("revenue"),
+            func.sum(ProductSalesDaily.quantity).label("quantity")
+        ).filter(
+            ProductSalesDaily.day > state[window],
+            ProductSalesDaily.day <= through
+        ).group_by(
+            ProductSalesDaily.product_id, ProductSalesDaily.warehouse_id
+        ).all()
+
+        for r in expired:
+            _add(db, ProductLeaderboard, {
+                "scope": r.warehouse_id, "window_days": window, "product_id": r.product_id
+            }, -float(r.revenue or 0), -int(r.quantity or 0))
+
+        db.query(LeaderboardWindow).filter(
+            LeaderboardWindow.window_days == window
+        ).update({LeaderboardWindow.expired_through: through}, synchronize_session=False)
+        changed = True
+
+    # Drop totals that expired to nothing and buckets no window needs
+    db.query(ProductLeaderboard).filter(
+        func.abs(ProductLeaderboard.revenue) < 0.005,
+        ProductLeaderboard.quantity == 0
+    ).delete(synchronize_session=False)
+    db.query(ProductSalesDaily).filter(
+        ProductSalesDaily.day <= today - timedelta(days=max(WINDOWS))
+    ).delete(synchronize_session=False)
+
+    return changed
+
+
+def top_products(
+    db: Session,
+    window: int,
+    metric: str = "revenue",
+    warehouse_id: Optional[str] = None,
+    limit: int = 10
+):
+    """Top `limit` products of a window by revenue or quantity, in one warehouse or all."""
+    if warehouse_id is None:
+        revenue = func.sum(ProductLeaderboard.revenue)
+        quantity = func.sum(ProductLeaderboard.quantity)
+        order_column = revenue if metric == "revenue" else quantity
+        return db.query(
+            ProductLeaderboard.product_id,
+            Product.name.label("product_name"),
+            revenue.label("revenue"),
+            quantity.label("quantity")
+        ).join(
+            Product, ProductLeaderboard.product_id == Product.id
+        ).filter(
+            ProductLeaderboard.window_days == window,
+            ProductLeaderboard.scope != GLOBAL_SCOPE
+        ).group_by(
+            ProductLeaderboard.product_id, Product.name
+        ).having(
+            order_column > 0
+        ).order_by(
+            order_column.desc()
+        ).limit(limit).all()
+
+    order_column = ProductLeaderboard.revenue if metric == "revenue" else ProductLeaderboard.quantity
+    return db.query(
+        ProductLeaderboard.product_id,
+        Product.name.label("product_name"),
+        ProductLeaderboard.revenue,
+        ProductLeaderboard.quantity
+    ).join(
+        Product, ProductLeaderboard.product_id == Product.id
+    ).filter(
+        ProductLeaderboard.scope == warehouse_id,
+        ProductLeaderboard.window_days == window,
+        order_column > 0
+    ).order_by(
+        order_column.desc()
+    ).limit(limit).all()
+
+
+def rebuild_leaderboards(db: Session, today: Optional[date] = None) -> int:
+    """
+    Recompute buckets and window totals from sales orders.
+
+    Returns:
+        Number of leaderboard rows written
+    """
+    today = today or date.today()
+    first_day = today - timedelta(days=max(WINDOWS) - 1)
+    day_expr = func.date(SalesOrder.order_date)
+
+    buckets = db.query(
+        SalesOrderItem.product_id,
+        SalesOrder.warehouse_id,
+        day_expr.label("day"),
+        func.sum(SalesOrderItem.line_total).label("revenue"),
+        func.sum(SalesOrderItem.quantity).label("quantity")
+    ).join(
+        SalesOrder, SalesOrderItem.sales_order_id == SalesOrder.id
+    ).filter(
+        SalesOrder.order_date >= datetime.combine(first_day, datetime.min.time()),
+        SalesOrder.order_date < datetime.combine(today + timedelta(days=1), datetime.min.time()),
+        SalesOrder.status != OrderStatus.CANCELLED
+    ).group_by(
+        SalesOrderItem.product_id, SalesOrder.warehouse_id, day_expr
+    ).all()
+
+    daily_rows = []
+    boards = defaultdict(lambda: [0.0, 0])
+    for b in buckets:
+        # DATE() comes back as a date on MySQL and as a string on SQLite
+        day = date.fromisoformat(str(b.day)[:10])
+        revenue, quantity = float(b.revenue or 0), int(b.quantity or 0)
+        daily_rows.append({
+            "product_id": b.product_id, "warehouse_id": b.warehouse_id, "day": day,
+            "revenue": revenue, "quantity": quantity
+        })
+        for window in WINDOWS:
+            if day > today - timedelta(days=window):
+                totals = boards[(b.warehouse_id, window, b.product_id)]
+                totals[0] += revenue
+                totals[1] += quantity
+
+    board_rows = [
+        {"scope": scope, "window_days": window, "product_id": product_id, "revenue": revenue, "quantity": quantity}
+        for (scope, window, product_id), (revenue, quantity) in boards.items()
+    ]
+
+    db.query(ProductSalesDaily).delete(synchronize_session=False)
+    db.query(ProductLeaderboard).delete(synchronize_session=False)
+    db.query(LeaderboardWindow).delete(synchronize_session=False)
+    for rows, model in ((daily_rows, ProductSalesDaily), (board_rows, ProductLeaderboard)):
+        for start in range(0, len(rows), 5000):
+            db.execute(insert(model), rows[start:start + 5000])
+    db.execute(insert(LeaderboardWindow), [
+        {"window_days": window, "expired_through": today - timedelta(days=window)} for window in WINDOWS
+    ])
+    db.commit()
+
+    return len(board_rows)
@@ -0,0 +1,312 @@
+"""
+Compaction of old inventory transactions.
+
+inventory_transactions is append-only. compact_transactions() takes each
+closed month older than TRANSACTION_RETENTION_MONTHS and does three things
+in one database transaction:
+
+- writes the month's rows to a gzip JSON-lines file under
+  TRANSACTION_ARCHIVE_DIR, recorded in inventory_transaction_archives
+- rolls the rows up into one inventory_monthly_summaries row per
+  (product, warehouse)
+- deletes them from the live table
+
+The live table then holds only recent months. Range-partitioning the table
+in PostgreSQL is not an option: cost_layers.transaction_id references
+inventory_transactions.id, and a partitioned table cannot keep id unique
+on its own. Cost layers that pointed at archived rows keep their quantities
+and costs, but their transaction_id is cleared. The archive file still has
+the row.
+
+Readers that go further back than the live table:
+
+- movements_since() gives the net movement after a moment. It combines
+  live rows, the summaries of later months, and the archive of the
+  moment's own month.
+- last_sales() falls back to the summaries.
+
+The retention never drops below the analytics and forecasting windows, so
+their range scans stay on live rows.
+
+Each archive file is written under a temporary name and renamed once the
+database commit succeeds. A crash between the two is repaired on the next
+run: a temporary file with an archive record is renamed, and one without
+a record is deleted.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.gst import period_bounds
+from app.models.models import (
+    CostLayer, InventoryMonthlySummary, InventoryTransaction, InventoryTransactionArchive, TransactionType
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+TMP_SUFFIX = ".tmp"
+
+ARCHIVED_COLUMNS = [
+    "id", "product_id", "warehouse_id", "transaction_type", "quantity",
+    "reference_id", "notes", "created_at", "created_by"
+]
+
+Pair = Tuple[str, str]
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def retention_cutoff(today: Optional[date] = None) -> date:
+    """First day of the oldest month that stays live."""
+    today = today or date.today()
+    cutoff = _add_months(_month_start(today), -settings.TRANSACTION_RETENTION_MONTHS)
+    # Analytics and forecasting scan these windows on the live table
+    window_days = max(settings.ANALYTICS_PERIOD_DAYS, settings.FORECAST_HISTORY_DAYS)
+    return min(cutoff, _month_start(today - timedelta(days=window_days)))
+
+
+def live_from(db: Session) -> Optional[datetime]:
+    """Start of the month after the newest archived one (None if nothing is archived)."""
+    period = db.query(func.max(InventoryTransactionArchive.period)).scalar()
+    return period_bounds(period)[1] if period else None
+
+
+def _archive_path(file_name: str) -> str:
+    return os.path.join(settings.TRANSACTION_ARCHIVE_DIR, file_name)
+
+
+def read_archive(file_name: str) -> Iterator[dict]:
+    """Rows of one archive file, with created_at parsed back to a datetime."""
+    with gzip.open(_archive_path(file_name), "rt", encoding="utf-8") as archive:
+        for line in archive:
+            row = json.loads(line)
+            row["created_at"] = datetime.fromisoformat(row["created_at"]) if row["created_at"] else None
+            yield row
+
+
+def _recover(db: Session) -> None:
+    directory = settings.TRANSACTION_ARCHIVE_DIR
+    if not os.path.isdir(directory):
+        return
+    leftovers = [name for name in os.listdir(directory) if name.endswith(TMP_SUFFIX)]
+    if not leftovers:
+        return
+    recorded = {
+        name for (name,) in db.query(InventoryTransactionArchive.file_name).filter(
+            InventoryTransactionArchive.file_name.in_([name[:-len(TMP_SUFFIX)] for name in leftovers])
+        )
+    }
+    for name in leftovers:
+        final = name[:-len(TMP_SUFFIX)]
+        if final in recorded:
+            os.replace(_archive_path(name), _archive_path(final))
+            logger.info(f"Finished archive {final} left over by an interrupted compaction")
+        else:
+            os.remove(_archive_path(name))
+
+
+def _file_name(db: Session, period: str) -> str:
+    # A month archived again (rows that arrived late) gets a numbered part
+    parts = db.query(func.count(InventoryTransactionArchive.id)).filter(
+        InventoryTransactionArchive.period == period
+    ).scalar() or 0
+    suffix = f".{parts + 1}" if parts else ""
+    return f"inventory_transactions_{period}{suffix}.jsonl.gz"
+
+
+def compact_period(db: Session, period: str) -> int:
+    """
+    Archive and roll up one month of transactions; the caller commits.
+
+    Returns:
+        Number of transactions archived (0 if the month has none, or still
+        has stock issues pending from the coalescer)
+    """
+    start, end = period_bounds(period)
+    in_period = (InventoryTransaction.created_at >= start) & (InventoryTransaction.created_at < end)
+
+    if db.query(InventoryTransaction.id).filter(in_period, InventoryTransaction.stock_pending.is_(True)).first():
+        logger.warning(f"Not compacting {period}: it has pending stock issues")
+        return 0
+
+    os.makedirs(settings.TRANSACTION_ARCHIVE_DIR, exist_ok=True)
+    file_name = _file_name(db, period)
+    tmp_path = _archive_path(file_name + TMP_SUFFIX)
+
+    totals: Dict[Pair, dict] = {}
+    count = 0
+    digest = hashlib.sha256()
+    query = db.query(*[getattr(InventoryTransaction, c) for c in ARCHIVED_COLUMNS]).filter(
+        in_period
+    ).order_by(InventoryTransaction.created_at, InventoryTransaction.id)
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for row in query.yield_per(BATCH_SIZE):
+                record = dict(zip(ARCHIVED_COLUMNS, row))
+                record["transaction_type"] = getattr(row.transaction_type, "value", row.transaction_type)
+                record["created_at"] = row.created_at.isoformat() if row.created_at else None
+                line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+                archive.write(line)
+                digest.update(line)
+                count += 1
+
+                total = totals.setdefault((row.product_id, row.warehouse_id), {
+                    "quantity_in": 0, "quantity_out": 0, "transaction_count": 0, "last_sale_at": None
+                })
+                if row.quantity > 0:
+                    total["quantity_in"] += row.quantity
+                else:
+                    total["quantity_out"] -= row.quantity
+                total["transaction_count"] += 1
+                if row.transaction_type == TransactionType.SALE:
+                    total["last_sale_at"] = row.created_at  # Rows come in created_at order
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not count:
+        os.remove(tmp_path)
+        return 0
+
+    # Merge into the month's rollup (it already exists if the month had an earlier part)
+    existing = {
+        (s.product_id, s.warehouse_id): s
+        for s in db.query(InventoryMonthlySummary).filter(InventoryMonthlySummary.period == period)
+    }
+    new_rows = []
+    for (product_id, warehouse_id), total in totals.items():
+        summary = existing.get((product_id, warehouse_id))
+        if summary is None:
+            new_rows.append({
+                "period": period,
+                "product_id": product_id,
+                "warehouse_id": warehouse_id,
+                "net_quantity": total["quantity_in"] - total["quantity_out"],
+                **total
+            })
+            continue
+        summary.quantity_in += total["quantity_in"]
+        summary.quantity_out += total["quantity_out"]
+        summary.net_quantity = summary.quantity_in - summary.quantity_out
+        summary.transaction_count += total["transaction_count"]
+        if total["last_sale_at"] is not None:
+            summary.last_sale_at = max(filter(None, [summary.last_sale_at, total["last_sale_at"]]))
+    for i in range(0, len(new_rows), BATCH_SIZE):
+        db.execute(insert(InventoryMonthlySummary), new_rows[i:i + BATCH_SIZE])
+
+    archived_ids = select(InventoryTransaction.id).where(in_period)
+    db.query(CostLayer).filter(CostLayer.transaction_id.in_(archived_ids)).update(
+        {"transaction_id": None}, synchronize_session=False
+    )
+    db.query(InventoryTransaction).filter(in_period).delete(synchronize_session=False)
+    db.add(InventoryTransactionArchive(
+        period=period, file_name=file_name, row_count=count, sha256=digest.hexdigest()
+    ))
+    return count
+
+
+def compact_transactions(db: Session, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Compact every month before the retention cutoff that still has live
+    rows, oldest first, committing after each month.
+
+    Returns:
+        Transactions archived per period
+    """
+    _recover(db)
+    cutoff = retention_cutoff(today)
+    first = db.query(func.min(InventoryTransaction.created_at)).filter(
+        InventoryTransaction.created_at < datetime.combine(cutoff, datetime.min.time())
+    ).scalar()
+
+    compacted = {}
+    cursor = _month_start(first.date()) if first is not None else cutoff
+    while cursor < cutoff:
+        period = cursor.strftime("%Y-%m")
+        try:
+            count = compact_period(db, period)
+            db.commit()
+        except Exception:
+            db.rollback()
+            _recover(db)
+            raise
+        if count:
+            _recover(db)
+            compacted[period] = count
+        cursor = _add_months(cursor, 1)
+    return compacted
+
+
+def movements_since(db: Session, since: datetime) -> Dict[Pair, int]:
+    """Net quantity moved per (product, warehouse) after `since`."""
+    movements = {
+        (product_id, warehouse_id): int(quantity or 0)
+        for product_id, warehouse_id, quantity in db.query(
+            InventoryTransaction.product_id,
+            InventoryTransaction.warehouse_id,
+            func.sum(InventoryTransaction.quantity)
+        ).filter(
+            InventoryTransaction.created_at > since
+        ).group_by(InventoryTransaction.product_id, InventoryTransaction.warehouse_id)
+    }
+    boundary = live_from(db)
+    if boundary is None or since >= boundary:
+        return movements
+
+    # Whole archived months after the one `since` falls in
+    period = since.strftime("%Y-%m")
+    for product_id, warehouse_id, quantity in db.query(
+        InventoryMonthlySummary.product_id,
+        InventoryMonthlySummary.warehouse_id,
+        func.sum(InventoryMonthlySummary.net_quantity)
+    ).filter(
+        InventoryMonthlySummary.period > period
+    ).group_by(InventoryMonthlySummary.product_id, InventoryMonthlySummary.warehouse_id):
+        key = (product_id, warehouse_id)
+        movements[key] = movements.get(key, 0) + int(quantity or 0)
+
+    # The rest of that month, from its archive
+    for (file_name,) in db.query(InventoryTransactionArchive.file_name).filter(
+        InventoryTransactionArchive.period == period
+    ):
+        for row in read_archive(file_name):
+            created_at = row["created_at"]
+            if created_at.tzinfo is not None and since.tzinfo is None:
+                created_at = created_at.astimezone().replace(tzinfo=None)
+            if created_at > since:
+                key = (row["product_id"], row["warehouse_id"])
+                movements[key] = movements.get(key, 0) + row["quantity"]
+    return movements
+
+
+def last_sales(db: Session, pairs: List[Pair]) -> Dict[Pair, datetime]:
+    """Last archived sale per pair, for pairs with no sale left in the live table."""
+    wanted = set(pairs)
+    result = {}
+    if not wanted:
+        return result
+    for product_id, warehouse_id, last_sale_at in db.query(
+        InventoryMonthlySummary.product_id,
+        InventoryMonthlySummary.warehouse_id,
+        func.max(InventoryMonthlySummary.last_sale_at)
+    ).filter(
+        InventoryMonthlySummary.last_sale_at.isnot(None)
+    ).group_by(InventoryMonthlySummary.product_id, InventoryMonthlySummary.warehouse_id):
+        if (product_id, warehouse_id) in wanted:
+            result[(product_id, warehouse_id)] = last_sale_at
+    return result
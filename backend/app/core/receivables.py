@@ -0,0 +1,168 @@
+"""
+Customer receivables ledger.
+
+Every sales order contributes its open amount (total less payments, zero
+once paid or cancelled) to Customer.outstanding_balance and to a
+customer_receivables row keyed by (customer, due date). Both are adjusted by
+the delta whenever an order is created, its payment changes or it is
+cancelled, so the credit check is a single-row read and aging only groups
+the compact receivables table instead of scanning sales_orders.
+"""
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    Customer, CustomerReceivable, OrderStatus, PaymentStatus, SalesOrder
+)
+
+AGING_BUCKETS = ("days_0_30", "days_31_60", "days_61_90", "days_over_90")
+
+Snapshot = Tuple[float, Optional[date]]
+
+
+def open_amount(order: SalesOrder) -> float:
+    """Amount still receivable on an order."""
+    if order.status == OrderStatus.CANCELLED or order.payment_status == PaymentStatus.PAID:
+        return 0.0
+    return max(0.0, (order.total_amount or 0.0) - (order.amount_paid or 0.0))
+
+
+def receivable_due_date(order: SalesOrder) -> date:
+    """Explicit due date, otherwise invoice/order date plus the default terms."""
+    if order.due_date:
+        return order.due_date.date()
+    issued = order.invoice_date or order.order_date or datetime.now()
+    return issued.date() + timedelta(days=settings.RECEIVABLES_DEFAULT_TERMS_DAYS)
+
+
+def snapshot(order: SalesOrder) -> Snapshot:
+    """Capture an order's receivable before it is modified."""
+    amount = open_amount(order)
+    return amount, receivable_due_date(order) if amount else None
+
+
+def lock_customer(db: Session, customer_id: str) -> Optional[Customer]:
+    """
+    Fetch a customer row for update so balance changes serialize.
+
+    The row is refreshed from the locked read, so a customer loaded earlier
+    in the session sees the balance as of the lock.
+    """
+    return db.query(Customer).filter(
+        Customer.id == customer_id
+    ).with_for_update().populate_existing().first()
+
+
+def needs_lock(customer: Customer, amount: float) -> bool:
+    """Whether a new order of `amount` receivable must lock the customer row."""
+    return amount > 0 or bool(customer.credit_limit)
+
+
+def check_credit(customer: Customer, amount: float) -> bool:
+    """Whether `amount` of new receivables fits the customer's credit limit (0 = unlimited)."""
+    if not customer.credit_limit or amount <= 0:
+        return True
+    return (customer.outstanding_balance or 0.0) + amount <= customer.credit_limit + 0.005
+
+
+def post_order(db: Session, order: SalesOrder, before: Snapshot = (0.0, None)) -> float:
+    """
+    Move an order's receivable from its `before` snapshot to its current state.
+
+    Pass no snapshot for a new order. The customer row should already be
+    locked by the caller (see lock_customer).
+
+    Returns:
+        Change in the customer's outstanding balance
+    """
+    old_amount, old_due = before
+    new_amount, new_due = snapshot(order)
+    if old_amount == new_amount and old_due == new_due:
+        return 0.0
+
+    if old_amount:
+        _adjust_bucket(db, order.customer_id, old_due, -old_amount)
+    if new_amount:
+        _adjust_bucket(db, order.customer_id, new_due, new_amount)
+
+    delta = new_amount - old_amount
+    customer = db.query(Customer).filter(Customer.id == order.customer_id).first()
+    customer.outstanding_balance = (customer.outstanding_balance or 0.0) + delta
+    return delta
+
+
+def _adjust_bucket(db: Session, customer_id: str, due_date: date, amount: float) -> None:
+    row = db.query(CustomerReceivable).filter(
+        CustomerReceivable.customer_id == customer_id,
+        CustomerReceivable.due_date == due_date
+    ).with_for_update().first()
+
+    if row is None:
+        db.add(CustomerReceivable(customer_id=customer_id, due_date=due_date, amount=amount))
+    elif abs(row.amount + amount) < 0.005:
+        db.delete(row)
+    else:
+        row.amount += amount
+    # Sessions don't autoflush; the next lookup of this key must see the change
+    db.flush()
+
+
+def aging_bucket_columns(as_of: date):
+    """SUM(CASE ...) columns splitting receivables into AGING_BUCKETS by days past due."""
+    amount = CustomerReceivable.amount
+    due = CustomerReceivable.due_date
+    return [
+        func.sum(case((due >= as_of - timedelta(days=30), amount), else_=0.0)).label("days_0_30"),
+        func.sum(case(
+            ((due < as_of - timedelta(days=30)) & (due >= as_of - timedelta(days=60)), amount), else_=0.0
+        )).label("days_31_60"),
+        func.sum(case(
+            ((due < as_of - timedelta(days=60)) & (due >= as_of - timedelta(days=90)), amount), else_=0.0
+        )).label("days_61_90"),
+        func.sum(case((due < as_of - timedelta(days=90), amount), else_=0.0)).label("days_over_90"),
+    ]
+
+
+def rebuild_receivables(db: Session) -> int:
+    """
+    Recompute balances and receivables from sales_orders.
+
+    Used once after upgrading and as a reconciliation job; the request
+    paths keep both up to date incrementally.
+
+    Returns:
+        Number of receivable rows written
+    """
+    buckets = {}
+    balances = {}
+    for order in db.query(SalesOrder).filter(
+        SalesOrder.status != OrderStatus.CANCELLED,
+        SalesOrder.payment_status != PaymentStatus.PAID
+    ).yield_per(5000):
+        amount, due = snapshot(order)
+        if not amount:
+            continue
+        key = (order.customer_id, due)
+        buckets[key] = buckets.get(key, 0.0) + amount
+        balances[order.customer_id] = balances.get(order.customer_id, 0.0) + amount
+
+    rows = [
+        {"customer_id": customer_id, "due_date": due, "amount": amount}
+        for (customer_id, due), amount in buckets.items()
+    ]
+
+    db.query(CustomerReceivable).delete(synchronize_session=False)
+    for start in range(0, len(rows), 5000):
+        db.execute(insert(CustomerReceivable), rows[start:start + 5000])
+    db.query(Customer).update({Customer.outstanding_balance: 0.0}, synchronize_session=False)
+    for customer_id, balance in balances.items():
+        db.query(Customer).filter(Customer.id == customer_id).update(
+            {Customer.outstanding_balance: balance}, synchronize_session=False
+        )
+    db.commit()
+
+    return len(rows)
@@ -0,0 +1,113 @@
+"""
+Execution guard for heavy reports.
+
+Heavy report endpoints take their session from heavy_report(name) instead
+of get_db. That session runs on a dedicated connection with a statement
+timeout (MySQL MAX_EXECUTION_TIME, SQLite progress handler) and holds one
+of REPORT_MAX_CONCURRENT slots for the duration of the request. When every
+slot is taken the request fails fast with 503 and Retry-After instead of
+queueing for a pooled connection that checkouts also need.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+
+# MySQL: ER_QUERY_TIMEOUT, ER_QUERY_INTERRUPTED
+MYSQL_TIMEOUT_ERRORS = {3024, 1317}
+# SQLite VM instructions between deadline checks
+SQLITE_PROGRESS_STEPS = 10000
+
+_report_slots = threading.BoundedSemaphore(settings.REPORT_MAX_CONCURRENT)
+
+
+def statement_timeout(name: str) -> float:
+    """Statement timeout in seconds for a report (0 disables it)."""
+    return settings.report_statement_timeouts.get(name, settings.REPORT_STATEMENT_TIMEOUT_SECONDS)
+
+
+def is_statement_timeout(exc: OperationalError) -> bool:
+    """Whether a database error was raised by a statement timeout."""
+    orig = getattr(exc, "orig", None)
+    code = orig.args[0] if orig is not None and orig.args else None
+    return code in MYSQL_TIMEOUT_ERRORS or "interrupted" in str(orig)
+
+
+@contextmanager
+def report_slot(name: str) -> Iterator[None]:
+    """Hold a heavy report slot, or raise 503 if none is free."""
+    if not _report_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Too many reports running; retry {name} shortly",
+            headers={"Retry-After": str(settings.REPORT_RETRY_AFTER_SECONDS)}
+        )
+    try:
+        yield
+    finally:
+        _report_slots.release()
+
+
+@contextmanager
+def timed_session(name: str) -> Iterator[Session]:
+    """Session on a dedicated connection whose statements are time limited."""
+    timeout = statement_timeout(name)
+    connection = engine.connect()
+    dialect = engine.dialect.name
+    deadline = [0.0]
+
+    def reset_deadline(*args):
+        deadline[0] = time.monotonic() + timeout
+
+    try:
+        if timeout and dialect == "mysql":
+            connection.exec_driver_sql(f"SET SESSION MAX_EXECUTION_TIME = {int(timeout * 1000)}")
+        elif timeout and dialect == "sqlite":
+            event.listen(connection, "before_cursor_execute", reset_deadline)
+            connection.connection.driver_connection.set_progress_handler(
+                lambda: time.monotonic() > deadline[0], SQLITE_PROGRESS_STEPS
+            )
+
+        db = SessionLocal(bind=connection)
+        try:
+            yield db
+        finally:
+            db.close()
+    finally:
+        # The connection goes back to the pool, so undo the limit
+        if timeout and not connection.invalidated:
+            if dialect == "mysql":
+                connection.exec_driver_sql("SET SESSION MAX_EXECUTION_TIME = 0")
+            elif dialect == "sqlite":
+                event.remove(connection, "before_cursor_execute", reset_deadline)
+                connection.connection.driver_connection.set_progress_handler(None, 0)
+        connection.close()
+
+
+def heavy_report(name: str):
+    """
+    Dependency factory replacing get_db for heavy report endpoints.
+
+    Example:
+        db: Session = Depends(heavy_report("stock-inventory"))
+    """
+    def dependency():
+        with report_slot(name), timed_session(name) as db:
+            yield db
+    return dependency
+
+
+def heavy_report_slot(name: str):
+    """Dependency holding a report slot for endpoints that manage their own sessions."""
+    def dependency():
+        with report_slot(name):
+            yield
+    return dependency
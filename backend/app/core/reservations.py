@@ -0,0 +1,370 @@
+"""
+Stock reservation ledger.
+
+A reservation is a hold on stock in one warehouse by an owner (a POS cart,
+an online checkout or a sales order, e.g. "order:<id>") with a quantity per
+product and an expiry. Holds live in a reservation store rather than on
+inventory rows: an in-process store by default, or Redis when
+RESERVATION_STORE is "redis" (needed with more than one worker). Placing,
+replacing and releasing a hold never writes to `inventory`.
+
+Available stock is quantity_on_hand minus inventory.quantity_reserved
+(holds placed before the ledger existed) minus the active holds, and minus
+sales the stock coalescer has admitted but not yet flushed. Expired
+holds are swept in batches before every read and by the
+`reservations-sweep` job; sweeping only touches the store.
+
+Sales orders record their hold's expiry in reservation_expires_at, so the
+database stays the record of what they hold. restore_order_holds() runs at
+startup and places any missing order hold again: the memory store starts
+empty after every restart, and Redis may have lost its data. The memory
+store is per process, so the app refuses to start with it when
+WEB_CONCURRENCY is above 1.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.stock_coalescer import pending_issues
+from app.models.models import Inventory, OrderStatus, SalesOrder, SalesOrderItem
+
+LOOKUP_CHUNK = 1000
+
+
+def reservation_key(product_id: str, warehouse_id: str) -> str:
+    return f"{product_id}:{warehouse_id}"
+
+
+def order_owner(order_id: str) -> str:
+    return f"order:{order_id}"
+
+
+class MemoryReservationStore:
+    """Per-process holds; they are lost if the worker restarts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._holds: Dict[str, dict] = {}
+        self._held: Dict[str, int] = {}
+        self._expiry: List[Tuple[float, str]] = []  # Heap; stale entries are skipped
+
+    def _drop(self, owner: str) -> Dict[str, int]:
+        hold = self._holds.pop(owner, None)
+        if hold is None:
+            return {}
+        for key, quantity in hold["lines"].items():
+            self._held[key] -= quantity
+            if self._held[key] <= 0:
+                del self._held[key]
+        return hold["lines"]
+
+    def reserve(self, owner: str, warehouse_id: str, lines: Dict[str, int], limits: Dict[str, int], expires_at: float) -> List[str]:
+        with self._lock:
+            current = self._holds.get(owner, {}).get("lines", {})
+            short = [
+                key for key, quantity in lines.items()
+                if self._held.get(key, 0) - current.get(key, 0) + quantity > limits.get(key, 0)
+            ]
+            if short:
+                return short
+            self._drop(owner)
+            self._holds[owner] = {"warehouse_id": warehouse_id, "lines": dict(lines), "expires_at": expires_at}
+            for key, quantity in lines.items():
+                self._held[key] = self._held.get(key, 0) + quantity
+            heapq.heappush(self._expiry, (expires_at, owner))
+            return []
+
+    def extend(self, owner: str, expires_at: float) -> bool:
+        with self._lock:
+            hold = self._holds.get(owner)
+            if hold is None:
+                return False
+            hold["expires_at"] = expires_at
+            heapq.heappush(self._expiry, (expires_at, owner))
+            return True
+
+    def release(self, owner: str) -> Dict[str, int]:
+        with self._lock:
+            return self._drop(owner)
+
+    def get(self, owner: str) -> Optional[dict]:
+        hold = self._holds.get(owner)
+        return {"owner": owner, **hold, "lines": dict(hold["lines"])} if hold else None
+
+    def held(self, keys: Iterable[str]) -> Dict[str, int]:
+        return {key: self._held[key] for key in keys if key in self._held}
+
+    def sweep(self, now: float, limit: int) -> int:
+        expired = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now and expired < limit:
+                expires_at, owner = heapq.heappop(self._expiry)
+                hold = self._holds.get(owner)
+                if hold is not None and hold["expires_at"] == expires_at:
+                    self._drop(owner)
+                    expired += 1
+        return expired
+
+
+# Holds are a hash per owner ("_warehouse" and "_expires" plus one field per
+# product key), a hash of held totals per key and a sorted set of owners by
+# expiry. Scripts keep the three consistent.
+RESERVE_SCRIPT = """
+local owner_key, totals_key, expiry_key = KEYS[1], KEYS[2], KEYS[3]
+local current = redis.call('HGETALL', owner_key)
+local old = {}
+for i = 1, #current, 2 do old[current[i]] = tonumber(current[i + 1]) end
+local short = {}
+for i = 4, #ARGV, 3 do
+    local key, quantity, limit = ARGV[i], tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2])
+    local held = tonumber(redis.call('HGET', totals_key, key) or '0') - (old[key] or 0)
+    if held + quantity > limit then table.insert(short, key) end
+end
+if #short > 0 then return short end
+for key, quantity in pairs(old) do
+    if string.sub(key, 1, 1) ~= '_' then redis.call('HINCRBY', totals_key, key, -quantity) end
+end
+redis.call('DEL', owner_key)
+redis.call('HSET', owner_key, '_warehouse', ARGV[2], '_expires', ARGV[3])
+for i = 4, #ARGV, 3 do
+    redis.call('HSET', owner_key, ARGV[i], ARGV[i + 1])
+    redis.call('HINCRBY', totals_key, ARGV[i], ARGV[i + 1])
+end
+redis.call('ZADD', expiry_key, ARGV[3], ARGV[1])
+return {}
+"""
+
+RELEASE_SCRIPT = """
+local prefix, totals_key, expiry_key = ARGV[1], KEYS[1], KEYS[2]
+local owners = {}
+if ARGV[2] == 'owner' then
+    owners = {ARGV[3]}
+else
+    owners = redis.call('ZRANGEBYSCORE', expiry_key, '-inf', ARGV[3], 'LIMIT', 0, tonumber(ARGV[4]))
+end
+local released = {}
+for _, owner in ipairs(owners) do
+    local current = redis.call('HGETALL', prefix .. owner)
+    for i = 1, #current, 2 do
+        if string.sub(current[i], 1, 1) ~= '_' then
+            redis.call('HINCRBY', totals_key, current[i], -tonumber(current[i + 1]))
+            table.insert(released, current[i])
+            table.insert(released, current[i + 1])
+        end
+    end
+    redis.call('DEL', prefix .. owner)
+    redis.call('ZREM', expiry_key, owner)
+end
+if ARGV[2] == 'owner' then return released end
+return #owners
+"""
+
+
+class RedisReservationStore:
+    """Holds in Redis, shared by all workers."""
+
+    PREFIX = "reservation:"
+    TOTALS = "reservations:held"
+    EXPIRY = "reservations:expiry"
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._reserve = self._redis.register_script(RESERVE_SCRIPT)
+        self._release = self._redis.register_script(RELEASE_SCRIPT)
+
+    def reserve(self, owner: str, warehouse_id: str, lines: Dict[str, int], limits: Dict[str, int], expires_at: float) -> List[str]:
+        args = [owner, warehouse_id, expires_at]
+        for key, quantity in lines.items():
+            args.extend([key, quantity, limits.get(key, 0)])
+        return self._reserve(keys=[self.PREFIX + owner, self.TOTALS, self.EXPIRY], args=args)
+
+    def extend(self, owner: str, expires_at: float) -> bool:
+        if not self._redis.exists(self.PREFIX + owner):
+            return False
+        pipe = self._redis.pipeline()
+        pipe.hset(self.PREFIX + owner, "_expires", expires_at)
+        pipe.zadd(self.EXPIRY, {owner: expires_at})
+        pipe.execute()
+        return True
+
+    def release(self, owner: str) -> Dict[str, int]:
+        released = self._release(keys=[self.TOTALS, self.EXPIRY], args=[self.PREFIX, "owner", owner])
+        return {released[i]: int(released[i + 1]) for i in range(0, len(released), 2)}
+
+    def get(self, owner: str) -> Optional[dict]:
+        fields = self._redis.hgetall(self.PREFIX + owner)
+        if not fields:
+            return None
+        return {
+            "owner": owner,
+            "warehouse_id": fields.pop("_warehouse"),
+            "expires_at": float(fields.pop("_expires")),
+            "lines": {key: int(quantity) for key, quantity in fields.items()}
+        }
+
+    def held(self, keys: Iterable[str]) -> Dict[str, int]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._redis.hmget(self.TOTALS, keys)
+        return {key: int(value) for key, value in zip(keys, values) if value and int(value) > 0}
+
+    def sweep(self, now: float, limit: int) -> int:
+        return int(self._release(keys=[self.TOTALS, self.EXPIRY], args=[self.PREFIX, "sweep", now, limit]))
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def sweep_expired(limit: Optional[int] = None) -> int:
+    """Release up to `limit` expired holds (default RESERVATION_SWEEP_BATCH)."""
+    return reservation_store.sweep(time.time(), limit or settings.RESERVATION_SWEEP_BATCH)
+
+
+def held_quantities(pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    """Active holds per (product_id, warehouse_id); pairs without holds are omitted."""
+    pairs = list(pairs)
+    if not pairs:
+        return {}
+    sweep_expired()
+    held = reservation_store.held(reservation_key(*pair) for pair in pairs)
+    return {pair: held[reservation_key(*pair)] for pair in pairs if reservation_key(*pair) in held}
+
+
+def available_stock(db: Session, warehouse_id: str, product_ids: List[str]) -> Dict[str, dict]:
+    """On hand (less pending coalesced issues), reserved (legacy plus ledger holds) and available per product."""
+    stock = {product_id: {"quantity_on_hand": 0, "quantity_reserved": 0} for product_id in product_ids}
+    for chunk in _chunks(list(stock)):
+        for product_id, on_hand, reserved in db.query(
+            Inventory.product_id, Inventory.quantity_on_hand, Inventory.quantity_reserved
+        ).filter(
+            Inventory.warehouse_id == warehouse_id,
+            Inventory.product_id.in_(chunk)
+        ):
+            stock[product_id] = {"quantity_on_hand": on_hand or 0, "quantity_reserved": reserved or 0}
+    for (product_id, _), quantity in held_quantities((product_id, warehouse_id) for product_id in stock).items():
+        stock[product_id]["quantity_reserved"] += quantity
+    for (product_id, _), quantity in pending_issues(db, ((product_id, warehouse_id) for product_id in stock)).items():
+        stock[product_id]["quantity_on_hand"] -= quantity
+    for values in stock.values():
+        values["available"] = values["quantity_on_hand"] - values["quantity_reserved"]
+    return stock
+
+
+def reserve_stock(
+    db: Session,
+    owner: str,
+    warehouse_id: str,
+    quantities: Dict[str, int],
+    ttl_seconds: Optional[int] = None
+) -> Tuple[Optional[float], List[str]]:
+    """
+    Place or replace the owner's hold, all or nothing.
+
+    Each product must have on hand minus pending coalesced issues minus
+    legacy reservations minus other owners' holds of at least the requested
+    quantity. Placing a hold again
+    for the same owner replaces it, so a cart can be re-posted as it changes.
+
+    Returns:
+        (expires_at as epoch seconds, []) on success, or (None, short
+        product ids)
+    """
+    sweep_expired()
+    limits = {}
+    for chunk in _chunks(list(quantities)):
+        for product_id, on_hand, reserved in db.query(
+            Inventory.product_id, Inventory.quantity_on_hand, Inventory.quantity_reserved
+        ).filter(
+            Inventory.warehouse_id == warehouse_id,
+            Inventory.product_id.in_(chunk)
+        ):
+            limits[reservation_key(product_id, warehouse_id)] = (on_hand or 0) - (reserved or 0)
+    for (product_id, _), quantity in pending_issues(db, ((product_id, warehouse_id) for product_id in quantities)).items():
+        limits[reservation_key(product_id, warehouse_id)] = limits.get(reservation_key(product_id, warehouse_id), 0) - quantity
+
+    expires_at = time.time() + (ttl_seconds or settings.RESERVATION_TTL_SECONDS)
+    short = reservation_store.reserve(
+        owner, warehouse_id,
+        {reservation_key(product_id, warehouse_id): quantity for product_id, quantity in quantities.items()},
+        limits, expires_at
+    )
+    if short:
+        return None, [key.split(":", 1)[0] for key in short]
+    return expires_at, []
+
+
+def extend_reservation(owner: str, ttl_seconds: Optional[int] = None) -> Optional[float]:
+    """Push an active hold's expiry out; None if the owner holds nothing."""
+    expires_at = time.time() + (ttl_seconds or settings.RESERVATION_TTL_SECONDS)
+    return expires_at if reservation_store.extend(owner, expires_at) else None
+
+
+def release_reservation(owner: str) -> Dict[str, int]:
+    """Release the owner's hold; returns the released quantity per product."""
+    return {key.split(":", 1)[0]: quantity for key, quantity in reservation_store.release(owner).items()}
+
+
+def get_reservation(owner: str) -> Optional[dict]:
+    """The owner's active hold with quantities per product, or None."""
+    sweep_expired()
+    hold = reservation_store.get(owner)
+    if hold is None:
+        return None
+    hold["lines"] = {key.split(":", 1)[0]: quantity for key, quantity in hold["lines"].items()}
+    return hold
+
+
+def restore_order_holds(db: Session) -> int:
+    """
+    Place again the holds of unfulfilled orders that are missing from the store.
+
+    The stock check is skipped: the order took its stock when it was placed.
+
+    Returns:
+        Number of orders whose hold was restored
+    """
+    now = datetime.now(timezone.utc)
+    orders: Dict[str, dict] = {}
+    for order_id, warehouse_id, expires, product_id, quantity in db.query(
+        SalesOrder.id, SalesOrder.warehouse_id, SalesOrder.reservation_expires_at,
+        SalesOrderItem.product_id, func.sum(SalesOrderItem.quantity)
+    ).join(
+        SalesOrderItem, SalesOrderItem.sales_order_id == SalesOrder.id
+    ).filter(
+        SalesOrder.status.notin_([OrderStatus.DELIVERED, OrderStatus.CANCELLED]),
+        SalesOrder.reservation_expires_at > now
+    ).group_by(
+        SalesOrder.id, SalesOrder.warehouse_id, SalesOrder.reservation_expires_at, SalesOrderItem.product_id
+    ):
+        if expires.tzinfo is None:
+            expires = expires.replace(tzinfo=timezone.utc)  # Stored as UTC
+        order = orders.setdefault(order_id, {"warehouse_id": warehouse_id, "expires_at": expires.timestamp(), "lines": {}})
+        order["lines"][reservation_key(product_id, warehouse_id)] = int(quantity)
+
+    restored = 0
+    for order_id, order in orders.items():
+        owner = order_owner(order_id)
+        if reservation_store.get(owner) is not None:
+            continue
+        lines = order["lines"]
+        held = reservation_store.held(lines)
+        limits = {key: held.get(key, 0) + quantity for key, quantity in lines.items()}
+        reservation_store.reserve(owner, order["warehouse_id"], lines, limits, order["expires_at"])
+        restored += 1
+    return restored
+
+
+reservation_store = (
+    RedisReservationStore(settings.REDIS_URL) if settings.RESERVATION_STORE == "redis"
+    else MemoryReservationStore()
+)
@@ -0,0 +1,321 @@
+"""
+In-memory columnar cube of sales lines for ad-hoc pivot queries.
+
+Each non-cancelled sales line is one row. Dimension columns are dictionary
+encoded into integer arrays and measures are float arrays, so arbitrary
+group-bys are a handful of NumPy operations and never touch the database.
+
+The cube is built lazily on first use and refreshed incrementally: lines
+created since the last watermark are appended. Orders updated since the
+last refresh (cancelled, or fulfilled with their actual unit cost) have
+their rows masked out and, unless cancelled, loaded again. Memory is
+bounded by CUBE_MAX_ROWS and CUBE_RETENTION_DAYS; the oldest rows are
+dropped first, and masked rows once they are a quarter of the cube.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    SalesOrder, SalesOrderItem, Product, Category, Warehouse, Customer, OrderStatus
+)
+
+# Dimensions backed by a value dictionary (code -> id) with display labels
+DICTIONARY_DIMENSIONS = ["product", "category", "warehouse", "customer", "tax_rate"]
+# Dimensions stored as plain integers and decoded arithmetically
+DATE_DIMENSIONS = ["month", "day"]
+DIMENSIONS = DICTIONARY_DIMENSIONS + DATE_DIMENSIONS
+
+SUM_MEASURES = ["revenue", "taxable_amount", "tax_amount", "quantity", "cost", "profit"]
+MEASURES = SUM_MEASURES + ["orders", "lines"]
+INTEGER_MEASURES = {"quantity", "orders", "lines"}
+
+
+class _Dictionary:
+    """Value <-> integer code mapping for one dimension."""
+
+    def __init__(self):
+        self.values: List = []
+        self.labels: List[str] = []
+        self.codes: Dict = {}
+
+    def encode(self, value, label: Optional[str] = None) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+            self.labels.append(label if label is not None else str(value))
+        return code
+
+
+class SalesCube:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns: Dict[str, np.ndarray] = {}
+        self._dictionaries: Dict[str, _Dictionary] = {}
+        self._orders = _Dictionary()
+        self._watermark: Optional[datetime] = None
+        self._watermark_ids: set = set()
+        self._updates_since: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._columns = {
+            **{dim: np.empty(0, dtype=np.int32) for dim in DIMENSIONS},
+            **{measure: np.empty(0, dtype=np.float64) for measure in SUM_MEASURES},
+            "order": np.empty(0, dtype=np.int64),
+            "active": np.empty(0, dtype=bool),
+        }
+        self._dictionaries = {dim: _Dictionary() for dim in DICTIONARY_DIMENSIONS}
+        self._orders = _Dictionary()
+        self._watermark = None
+        self._watermark_ids = set()
+        self._updates_since = None
+
+    @property
+    def size(self) -> int:
+        return len(self._columns["active"])
+
+    def ensure_fresh(self, db: Session, max_age_seconds: Optional[float] = None) -> None:
+        """Refresh from the database if the last refresh is older than max_age_seconds."""
+        if max_age_seconds is None:
+            max_age_seconds = settings.CUBE_REFRESH_SECONDS
+        if time.monotonic() - self._refreshed_at < max_age_seconds:
+            return
+        with self._lock:
+            if time.monotonic() - self._refreshed_at < max_age_seconds:
+                return
+            self._refresh(db)
+            self._refreshed_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a full rebuild on next use."""
+        with self._lock:
+            self._reset()
+            self._refreshed_at = 0.0
+
+    def _refresh(self, db: Session) -> None:
+        retention_start = datetime.now() - timedelta(days=settings.CUBE_RETENTION_DAYS)
+        since = self._watermark
+        # updated_at is set by the database clock, so the next check starts from it too
+        updated_since, self._updates_since = self._updates_since, db.scalar(select(func.now()))
+
+        changed = set()
+        if since is not None and updated_since is not None:
+            changed = {
+                order_id for (order_id,) in db.query(SalesOrder.id).filter(SalesOrder.updated_at >= updated_since)
+            }
+            codes = [self._orders.codes[order_id] for order_id in changed if order_id in self._orders.codes]
+            if codes:
+                self._columns["active"] = self._columns["active"] & ~np.isin(self._columns["order"], codes)
+
+        query = db.query(
+            SalesOrderItem.id,
+            SalesOrderItem.created_at,
+            SalesOrderItem.sales_order_id,
+            SalesOrderItem.product_id,
+            Product.name.label("product_name"),
+            Product.category_id,
+            Category.name.label("category_name"),
+            SalesOrder.warehouse_id,
+            Warehouse.name.label("warehouse_name"),
+            SalesOrder.customer_id,
+            Customer.name.label("customer_name"),
+            SalesOrderItem.tax_rate,
+            SalesOrder.order_date,
+            SalesOrderItem.quantity,
+            SalesOrderItem.unit_price,
+            SalesOrderItem.discount,
+            SalesOrderItem.tax_amount,
+            SalesOrderItem.line_total,
+            SalesOrderItem.unit_cost
+        ).join(
+            SalesOrder, SalesOrderItem.sales_order_id == SalesOrder.id
+        ).join(
+            Product, SalesOrderItem.product_id == Product.id
+        ).outerjoin(
+            Category, Product.category_id == Category.id
+        ).join(
+            Warehouse, SalesOrder.warehouse_id == Warehouse.id
+        ).join(
+            Customer, SalesOrder.customer_id == Customer.id
+        ).filter(
+            SalesOrder.status != OrderStatus.CANCELLED,
+            SalesOrder.order_date >= retention_start
+        )
+        if since is not None:
+            new_lines = SalesOrderItem.created_at >= since
+            query = query.filter(or_(new_lines, SalesOrderItem.sales_order_id.in_(changed)) if changed else new_lines)
+
+        rows = [
+            r for r in query.order_by(SalesOrderItem.created_at).yield_per(10000)
+            if r.id not in self._watermark_ids or r.sales_order_id in changed
+        ]
+        if rows:
+            self._append(rows)
+            newest = rows[-1].created_at
+            if since is None or newest > since:
+                self._watermark = newest
+                self._watermark_ids = {r.id for r in rows if r.created_at == newest}
+            elif newest == since:
+                self._watermark_ids |= {r.id for r in rows if r.created_at == newest}
+
+        self._trim(retention_start)
+
+    def _append(self, rows) -> None:
+        d = self._dictionaries
+        n = len(rows)
+        new = {
+            "product": np.fromiter((d["product"].encode(r.product_id, r.product_name) for r in rows), np.int32, n),
+            "category": np.fromiter((d["category"].encode(r.category_id, r.category_name or "Uncategorized") for r in rows), np.int32, n),
+            "warehouse": np.fromiter((d["warehouse"].encode(r.warehouse_id, r.warehouse_name) for r in rows), np.int32, n),
+            "customer": np.fromiter((d["customer"].encode(r.customer_id, r.customer_name) for r in rows), np.int32, n),
+            "tax_rate": np.fromiter((d["tax_rate"].encode(float(r.tax_rate or 0), f"{float(r.tax_rate or 0):g}%") for r in rows), np.int32, n),
+            "day": np.fromiter((r.order_date.toordinal() for r in rows), np.int32, n),
+            "month": np.fromiter((r.order_date.year * 12 + r.order_date.month - 1 for r in rows), np.int32, n),
+            "order": np.fromiter((self._orders.encode(r.sales_order_id) for r in rows), np.int64, n),
+            "active": np.ones(n, dtype=bool),
+        }
+        quantity = np.fromiter((r.quantity or 0 for r in rows), np.float64, n)
+        taxable = quantity * np.fromiter((r.unit_price or 0 for r in rows), np.float64, n) \
+            - np.fromiter((r.discount or 0 for r in rows), np.float64, n)
+        cost = quantity * np.fromiter((r.unit_cost or 0 for r in rows), np.float64, n)
+        new.update({
+            "quantity": quantity,
+            "taxable_amount": taxable,
+            "tax_amount": np.fromiter((r.tax_amount or 0 for r in rows), np.float64, n),
+            "revenue": np.fromiter((r.line_total or 0 for r in rows), np.float64, n),
+            "cost": cost,
+            "profit": taxable - cost,
+        })
+        self._columns = {
+            name: np.concatenate([self._columns[name], new[name]]) for name in self._columns
+        }
+
+    def _trim(self, retention_start: datetime) -> None:
+        # Rows are appended in creation order, so the oldest rows come first
+        keep_from = max(0, self.size - settings.CUBE_MAX_ROWS)
+        retained = np.flatnonzero(self._columns["day"][keep_from:] >= retention_start.toordinal())
+        keep_from += int(retained[0]) if len(retained) else self.size - keep_from
+        if keep_from:
+            self._columns = {name: col[keep_from:] for name, col in self._columns.items()}
+        # Reloaded orders leave their old rows masked; drop them once they add up
+        active = self._columns["active"]
+        if np.count_nonzero(~active) * 4 > self.size:
+            self._columns = {name: col[active] for name, col in self._columns.items()}
+
+    def pivot(
+        self,
+        dimensions: List[str],
+        measures: List[str],
+        filters: Optional[Dict[str, list]] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        sort_by: Optional[str] = None,
+        limit: int = 1000
+    ) -> dict:
+        """
+        Group the cube by `dimensions` and aggregate `measures`.
+
+        Filters map a dictionary dimension to the ids/values to keep; dates
+        are inclusive bounds on the order date.
+        """
+        started = time.perf_counter()
+        # Column dict is replaced (never mutated) on refresh, so this is a consistent snapshot
+        columns = self._columns
+        dictionaries = self._dictionaries
+
+        mask = columns["active"].copy()
+        if start_date:
+            mask &= columns["day"] >= start_date.toordinal()
+        if end_date:
+            mask &= columns["day"] <= end_date.toordinal()
+        for dim, values in (filters or {}).items():
+            if dim == "tax_rate":
+                values = [float(v) for v in values]
+            codes = [dictionaries[dim].codes[v] for v in values if v in dictionaries[dim].codes]
+            mask &= np.isin(columns[dim], codes)
+        rows = np.flatnonzero(mask)
+
+        # Mixed-radix key: one int64 per row identifying its group
+        key = np.zeros(len(rows), dtype=np.int64)
+        bases = []
+        for dim in dimensions:
+            col = columns[dim][rows].astype(np.int64)
+            offset = int(col.min()) if len(col) else 0
+            base = int(col.max()) - offset + 1 if len(col) else 1
+            key = key * base + (col - offset)
+            bases.append((offset, base))
+        groups, inverse = np.unique(key, return_inverse=True)
+
+        aggregates = {}
+        for measure in measures:
+            if measure == "lines":
+                aggregates[measure] = np.bincount(inverse, minlength=len(groups)).astype(np.float64)
+            elif measure == "orders":
+                pairs = np.unique(inverse.astype(np.int64) * (len(self._orders.values) + 1) + columns["order"][rows])
+                aggregates[measure] = np.bincount(
+                    pairs // (len(self._orders.values) + 1), minlength=len(groups)
+                ).astype(np.float64)
+            else:
+                aggregates[measure] = np.bincount(inverse, weights=columns[measure][rows], minlength=len(groups))
+
+        order = np.arange(len(groups))
+        if sort_by:
+            order = np.argsort(-aggregates[sort_by], kind="stable")
+        order = order[:limit]
+
+        # Decode group keys back to per-dimension codes
+        decoded = {}
+        remainder = groups[order]
+        for dim, (offset, base) in reversed(list(zip(dimensions, bases))):
+            decoded[dim] = remainder % base + offset
+            remainder = remainder // base
+
+        return {
+            "dimensions": dimensions,
+            "measures": measures,
+            "total_groups": len(groups),
+            "rows_scanned": len(rows),
+            "columns": {
+                **{dim: _decode(dim, decoded[dim], dictionaries) for dim in dimensions},
+                **{measure: _format(measure, aggregates[measure][order]) for measure in measures},
+            },
+            "query_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.size,
+            "active_rows": int(self._columns["active"].sum()),
+            "memory_bytes": sum(col.nbytes for col in self._columns.values()),
+            "watermark": self._watermark,
+        }
+
+
+def _format(measure: str, values: np.ndarray) -> list:
+    if measure in INTEGER_MEASURES:
+        return values.round().astype(np.int64).tolist()
+    return values.round(2).tolist()
+
+
+def _decode(dim: str, codes: np.ndarray, dictionaries: Dict[str, _Dictionary]) -> List[dict]:
+    if dim == "day":
+        return [{"key": date.fromordinal(int(c)).isoformat(), "label": date.fromordinal(int(c)).isoformat()} for c in codes]
+    if dim == "month":
+        labels = [f"{int(c) // 12}-{int(c) % 12 + 1:02d}" for c in codes]
+        return [{"key": label, "label": label} for label in labels]
+    dictionary = dictionaries[dim]
+    return [{"key": dictionary.values[c], "label": dictionary.labels[c]} for c in codes]
+
+
+# Per-process cube shared by all requests
+sales_cube = SalesCube()
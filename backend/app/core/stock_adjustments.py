@@ -0,0 +1,198 @@
+"""
+Bulk stock adjustments.
+
+A batch of (product, warehouse, delta or counted quantity) lines is
+validated with one lookup per table and applied in the caller's
+transaction: new inventory rows and all transaction records are multi-row
+INSERTs, changed inventory rows are flushed together, and warehouse stats
+get one update per warehouse. Cost layers are still moved line by line,
+since each movement consumes the layers left by the one before it.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.costing import apply_stock_movement
+from app.core.stock_coalescer import stock_coalescer
+from app.core.warehouse_stats import record_stock_changes
+from app.models.models import (
+    Inventory, InventoryTransaction, Product, TransactionType, Warehouse, generate_uuid
+)
+
+LOOKUP_CHUNK = 1000
+
+APPLIED = "applied"
+UNCHANGED = "unchanged"
+ERROR = "error"
+SKIPPED = "skipped"
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def load_products(db: Session, lines: Sequence) -> Dict[str, Product]:
+    """Products by id and by SKU."""
+    ids = list({line.product_id for line in lines if line.product_id})
+    skus = list({line.sku for line in lines if line.sku and not line.product_id})
+    products = {}
+    for chunk in _chunks(ids):
+        for product in db.query(Product).filter(Product.id.in_(chunk)):
+            products[product.id] = product
+    for chunk in _chunks(skus):
+        for product in db.query(Product).filter(Product.sku.in_(chunk)):
+            products[product.sku] = product
+    return products
+
+
+def apply_adjustments(
+    db: Session,
+    lines: Sequence,
+    user_id: Optional[str],
+    notes: Optional[str] = None,
+    atomic: bool = False
+) -> List[dict]:
+    """
+    Validate and apply adjustment lines; the caller commits.
+
+    Each line has product_id or sku, warehouse_id, and either `quantity`
+    (signed delta) or `counted_quantity` (absolute on-hand count, which
+    also stamps last_counted_at). Lines for the same product and warehouse
+    apply in order. Invalid lines are reported and skipped; with `atomic`
+    nothing is applied if any line is invalid.
+
+    Returns:
+        One result dict per line, in input order
+    """
+    products = load_products(db, lines)
+    warehouse_ids = list({line.warehouse_id for line in lines})
+    warehouses = set()
+    for chunk in _chunks(warehouse_ids):
+        warehouses.update(w for (w,) in db.query(Warehouse.id).filter(Warehouse.id.in_(chunk)))
+
+    results: List[dict] = []
+    resolved = []
+    for i, line in enumerate(lines):
+        product = products.get(line.product_id or line.sku)
+        result = {
+            "line": i,
+            "product_id": product.id if product else line.product_id,
+            "sku": product.sku if product else line.sku,
+            "warehouse_id": line.warehouse_id,
+            "status": ERROR,
+            "quantity_before": None,
+            "quantity_after": None,
+            "delta": None,
+            "transaction_id": None,
+            "error": None
+        }
+        results.append(result)
+        if (line.quantity is None) == (line.counted_quantity is None):
+            result["error"] = "Give exactly one of quantity or counted_quantity"
+        elif product is None:
+            result["error"] = "Product not found"
+        elif line.warehouse_id not in warehouses:
+            result["error"] = "Warehouse not found"
+        elif line.counted_quantity is not None and line.counted_quantity < 0:
+            result["error"] = "Counted quantity cannot be negative"
+        else:
+            resolved.append((line, product, result))
+
+    # Take unflushed coalesced sales off on hand first: a count already
+    # excludes them, and a removal must not take them again
+    pairs = {(product.id, line.warehouse_id) for line, product, _ in resolved}
+    stock_coalescer.apply_pending(db, pairs)
+
+    # Lock the existing rows of every (product, warehouse) in the batch
+    inventory: Dict[tuple, Inventory] = {}
+    for chunk in _chunks(list({product_id for product_id, _ in pairs})):
+        for row in db.query(Inventory).filter(
+            Inventory.product_id.in_(chunk),
+            Inventory.warehouse_id.in_(list({warehouse_id for _, warehouse_id in pairs}))
+        ).order_by(Inventory.product_id, Inventory.warehouse_id).with_for_update():
+            if (row.product_id, row.warehouse_id) in pairs:
+                inventory[(row.product_id, row.warehouse_id)] = row
+
+    # Run the lines against the running quantities
+    on_hand: Dict[tuple, int] = {key: row.quantity_on_hand or 0 for key, row in inventory.items()}
+    opening = dict(on_hand)
+    counted = set()
+    movements = []
+    for line, product, result in resolved:
+        key = (product.id, line.warehouse_id)
+        before = on_hand.get(key, 0)
+        delta = line.counted_quantity - before if line.counted_quantity is not None else line.quantity
+        if before + delta < 0:
+            result["error"] = f"Insufficient stock: {before} on hand, adjustment {delta}"
+            continue
+        on_hand[key] = before + delta
+        result.update(status=APPLIED if delta else UNCHANGED, quantity_before=before, quantity_after=before + delta, delta=delta)
+        if line.counted_quantity is not None:
+            counted.add(key)
+        if delta:
+            result["transaction_id"] = generate_uuid()
+            movements.append((line, product, before, result))
+
+    if atomic and any(r["status"] == ERROR for r in results):
+        for r in results:
+            if r["status"] != ERROR:
+                r.update(status=SKIPPED, transaction_id=None)
+        return results
+
+    now = datetime.now()
+    new_rows = []
+    for key, quantity in on_hand.items():
+        row = inventory.get(key)
+        if row is None:
+            new_rows.append({
+                "id": generate_uuid(),
+                "product_id": key[0],
+                "warehouse_id": key[1],
+                "quantity_on_hand": quantity,
+                "quantity_reserved": 0,
+                "last_counted_at": now if key in counted else None,
+                "updated_by": user_id
+            })
+        else:
+            row.quantity_on_hand = quantity
+            row.updated_by = user_id
+            if key in counted:
+                row.last_counted_at = now
+    for chunk in _chunks(new_rows):
+        db.execute(insert(Inventory), chunk)
+
+    transactions = [
+        {
+            "id": result["transaction_id"],
+            "product_id": product.id,
+            "warehouse_id": line.warehouse_id,
+            "transaction_type": TransactionType.ADJUSTMENT,
+            "quantity": result["delta"],
+            "notes": line.notes or notes or (
+                f"Stock count: {line.counted_quantity}" if line.counted_quantity is not None else None
+            ),
+            "created_by": user_id
+        }
+        for line, product, _, result in movements
+    ]
+    for chunk in _chunks(transactions):
+        db.execute(insert(InventoryTransaction), chunk)
+    db.flush()
+
+    # Keep cost layers in step with the stock movements
+    for line, product, before, result in movements:
+        apply_stock_movement(
+            db, product, line.warehouse_id, result["delta"], before,
+            unit_cost=line.unit_cost, transaction_id=result["transaction_id"]
+        )
+
+    by_id = {product.id: product for product in products.values()}
+    record_stock_changes(db, [
+        (warehouse_id, by_id[product_id], opening.get((product_id, warehouse_id)), quantity)
+        for (product_id, warehouse_id), quantity in on_hand.items()
+    ])
+
+    return results
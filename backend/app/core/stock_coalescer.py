@@ -0,0 +1,295 @@
+"""
+Write coalescing of fulfilment issues for hot SKUs.
+
+With STOCK_COALESCING on, a (product, warehouse) that sees at least
+COALESCE_HOT_PER_MINUTE issues within a minute is hot. A fulfilment line
+for a hot pair does not lock its inventory, cost valuation or warehouse
+stats rows. Instead it is admitted against an in-memory headroom counter:
+on hand at the last refresh, less units admitted since, less
+COALESCE_SAFETY_MARGIN. Its SALE transaction is then inserted with
+stock_pending set. Every COALESCE_FLUSH_MS a flusher thread applies the
+pending transactions in one group commit. Each pair gets one locked
+inventory update for the summed quantity, its cost layers are issued for
+the total, and the transactions are marked applied.
+
+Crash recovery: pending transactions are the journal. They commit together
+with the order, so an admitted issue is never lost if the process dies
+before a flush. The next flush applies them, whether it comes from any
+worker's flusher, the startup hook or `python jobs.py stock-flush`.
+
+Coalesced lines are costed at the average cost when they are admitted. FIFO
+COGS is booked on the valuation when the flush issues the layers. Other
+workers' admissions are not visible in this process's counter, so with
+several workers the safety margin should cover what each can admit
+between flushes.
+
+Until a flush, an admitted issue is in the ledger but not yet off
+quantity_on_hand, while the order's hold is already released. Stock checks
+outside the coalescer therefore subtract pending_issues(), and writers that
+check or overwrite on hand first apply_pending() for their pairs in their
+own transaction.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.costing import issue_stock
+from app.core.database import SessionLocal
+from app.core.warehouse_stats import record_stock_change
+from app.models.models import Inventory, InventoryTransaction, Product, StockValuation
+
+logger = logging.getLogger(__name__)
+
+HOT_WINDOW_SECONDS = 60
+
+Pair = Tuple[str, str]
+
+
+class StockCoalescer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._windows: Dict[Pair, list] = {}  # [window start, issues in window]
+        self._base: Dict[Pair, int] = {}  # On hand less pending issues at the last refresh
+        self._admitted: Dict[Pair, int] = {}  # Units admitted since the refresh
+        self._inflight: Dict[Pair, int] = {}  # Admitted in transactions not yet committed
+        self._unflushed = False
+        self._flusher: Optional[threading.Thread] = None
+        self.admissions = 0
+        self.fallbacks = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    def _is_hot(self, pair: Pair, now: float) -> bool:
+        window = self._windows.get(pair)
+        if window is None or now - window[0] >= HOT_WINDOW_SECONDS:
+            window = self._windows[pair] = [now, 0]
+        window[1] += 1
+        return window[1] >= settings.COALESCE_HOT_PER_MINUTE
+
+    @staticmethod
+    def _pending_totals(db: Session, pairs: List[Pair]) -> Dict[Pair, int]:
+        """Summed (negative) quantity of pending issues per pair."""
+        totals = {pair: 0 for pair in pairs}
+        for product_id, warehouse_id, quantity in db.query(
+            InventoryTransaction.product_id,
+            InventoryTransaction.warehouse_id,
+            func.sum(InventoryTransaction.quantity)
+        ).filter(
+            InventoryTransaction.stock_pending.is_(True),
+            InventoryTransaction.product_id.in_({p for p, _ in pairs})
+        ).group_by(InventoryTransaction.product_id, InventoryTransaction.warehouse_id):
+            if (product_id, warehouse_id) in totals:
+                totals[(product_id, warehouse_id)] = quantity or 0
+        return totals
+
+    def admit(self, db: Session, product_id: str, warehouse_id: str, quantity: int) -> bool:
+        """
+        Try to admit an issue without touching the stock rows.
+
+        Returns False when coalescing is off, the pair is not hot or the
+        headroom is used up; the caller then takes the locked path.
+        """
+        if not settings.STOCK_COALESCING:
+            return False
+        pair = (product_id, warehouse_id)
+        with self._lock:
+            hot = self._is_hot(pair, time.monotonic())
+            base = self._base.get(pair)
+        if not hot:
+            return False
+
+        if base is None:
+            on_hand = db.query(Inventory.quantity_on_hand).filter(
+                Inventory.product_id == product_id,
+                Inventory.warehouse_id == warehouse_id
+            ).scalar()
+            if on_hand is None:
+                return False
+            base = on_hand + self._pending_totals(db, [pair])[pair]
+            with self._lock:
+                self._base.setdefault(pair, base)
+
+        with self._lock:
+            admitted = self._admitted.get(pair, 0)
+            if self._base[pair] - admitted - quantity < settings.COALESCE_SAFETY_MARGIN:
+                self.fallbacks += 1
+                return False
+            self._admitted[pair] = admitted + quantity
+            self._inflight[pair] = self._inflight.get(pair, 0) + quantity
+            self.admissions += 1
+        self._ensure_flusher()
+        return True
+
+    def committed(self, admissions: List[Tuple[Pair, int]]) -> None:
+        """The transaction holding these admissions committed."""
+        with self._lock:
+            for pair, quantity in admissions:
+                self._inflight[pair] -= quantity
+            self._unflushed = True
+
+    def revert(self, admissions: List[Tuple[Pair, int]]) -> None:
+        """The transaction holding these admissions rolled back."""
+        with self._lock:
+            for pair, quantity in admissions:
+                self._inflight[pair] -= quantity
+                self._admitted[pair] -= quantity
+
+    @staticmethod
+    def estimate_unit_cost(db: Session, product: Product, warehouse_id: str) -> float:
+        """Average cost of the stock, read without locking the valuation."""
+        valuation = db.query(StockValuation.quantity, StockValuation.total_value).filter(
+            StockValuation.product_id == product.id,
+            StockValuation.warehouse_id == warehouse_id
+        ).first()
+        if valuation and valuation.quantity and valuation.quantity > 0:
+            return valuation.total_value / valuation.quantity
+        return product.cost_price or 0.0
+
+    @staticmethod
+    def _apply_pair(db: Session, product_id: str, warehouse_id: str) -> Optional[Tuple[int, int]]:
+        """Take a pair's pending issues off on hand; (new on hand, rows applied), or None."""
+        inventory = db.query(Inventory).filter(
+            Inventory.product_id == product_id,
+            Inventory.warehouse_id == warehouse_id
+        ).with_for_update().first()
+        rows = db.query(InventoryTransaction.id, InventoryTransaction.quantity).filter(
+            InventoryTransaction.product_id == product_id,
+            InventoryTransaction.warehouse_id == warehouse_id,
+            InventoryTransaction.stock_pending.is_(True)
+        ).with_for_update().all()
+        if inventory is None or not rows:
+            return None
+        delta = sum(quantity for _, quantity in rows)
+        product = db.query(Product).filter(Product.id == product_id).first()
+        before = inventory.quantity_on_hand or 0
+        issue_stock(db, product, warehouse_id, -delta, before)
+        record_stock_change(db, warehouse_id, product, before, before + delta)
+        inventory.quantity_on_hand = before + delta
+        db.query(InventoryTransaction).filter(
+            InventoryTransaction.id.in_([row_id for row_id, _ in rows])
+        ).update({"stock_pending": False}, synchronize_session=False)
+        return inventory.quantity_on_hand, len(rows)
+
+    def apply_pending(self, db: Session, pairs: Iterable[Pair]) -> None:
+        """
+        Apply the pending issues of these pairs in the caller's transaction.
+
+        Writers that check or overwrite on hand (adjustments, counts and
+        transfers) call this before they read it. Otherwise a count would
+        already exclude units the next flush takes off again, and a
+        transfer could move units that are already sold. The headroom
+        counters need no change, since these units were already admitted.
+        """
+        wanted = pending_issues(db, pairs)
+        for product_id, warehouse_id in sorted(wanted):
+            self._apply_pair(db, product_id, warehouse_id)
+        db.flush()
+
+    def flush(self, db: Session) -> int:
+        """
+        Apply every pending issue in the database, in one commit.
+
+        Returns:
+            Number of transactions applied
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._unflushed = False
+            pairs = db.query(
+                InventoryTransaction.product_id, InventoryTransaction.warehouse_id
+            ).filter(
+                InventoryTransaction.stock_pending.is_(True)
+            ).distinct().order_by(
+                InventoryTransaction.product_id, InventoryTransaction.warehouse_id
+            ).all()
+
+            applied = 0
+            on_hand: Dict[Pair, int] = {}
+            for product_id, warehouse_id in pairs:
+                result = self._apply_pair(db, product_id, warehouse_id)
+                if result is not None:
+                    on_hand[(product_id, warehouse_id)], rows = result
+                    applied += rows
+            db.commit()
+
+            # Re-base the counters; issues committed since the flush started
+            # are still pending, and in-flight ones are still admitted
+            if on_hand:
+                with self._lock:
+                    pending = self._pending_totals(db, list(on_hand))
+                    for pair, quantity in on_hand.items():
+                        self._base[pair] = quantity + pending[pair]
+                        self._admitted[pair] = self._inflight.get(pair, 0)
+            with self._lock:
+                now = time.monotonic()
+                self._windows = {
+                    pair: window for pair, window in self._windows.items()
+                    if now - window[0] < HOT_WINDOW_SECONDS
+                }
+                self.flushes += 1
+                self.flushed_rows += applied
+            return applied
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run, name="stock-coalescer", daemon=True)
+                self._flusher.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(settings.COALESCE_FLUSH_MS / 1000)
+            if not self._unflushed:
+                continue
+            db = SessionLocal()
+            try:
+                self.flush(db)
+            except Exception:
+                db.rollback()
+                logger.exception("Stock coalescer flush failed; pending issues are kept for the next flush")
+                with self._lock:
+                    self._unflushed = True
+            finally:
+                db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.STOCK_COALESCING,
+                "hot_pairs": sum(1 for w in self._windows.values() if w[1] >= settings.COALESCE_HOT_PER_MINUTE),
+                "admissions": self.admissions,
+                "fallbacks": self.fallbacks,
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+                "inflight_units": sum(self._inflight.values())
+            }
+
+
+def pending_issues(db: Session, pairs: Iterable[Pair]) -> Dict[Pair, int]:
+    """Units issued but not yet taken off quantity_on_hand per pair (pairs without any are omitted)."""
+    wanted = set(pairs)
+    if not wanted:
+        return {}
+    # Pending rows only live until the next flush, so reading them all is cheap
+    pending = {}
+    for product_id, warehouse_id, quantity in db.query(
+        InventoryTransaction.product_id,
+        InventoryTransaction.warehouse_id,
+        func.sum(InventoryTransaction.quantity)
+    ).filter(
+        InventoryTransaction.stock_pending.is_(True)
+    ).group_by(InventoryTransaction.product_id, InventoryTransaction.warehouse_id):
+        if (product_id, warehouse_id) in wanted and quantity:
+            pending[(product_id, warehouse_id)] = -int(quantity)
+    return pending
+
+
+stock_coalescer = StockCoalescer()
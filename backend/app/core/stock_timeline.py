@@ -0,0 +1,232 @@
+"""
+Stock level history of one product.
+
+Levels are anchored on the current on-hand quantity plus any issues still
+pending in the coalescer, which are already in the ledger. They are then
+walked back through inventory_transactions with window functions:
+
+- the window sum over each warehouse's rows since `start` gives the
+  opening level: anchor minus everything moved since then
+- the running sum in created_at order gives the level after each
+  movement. created_at has one-second precision and ids are random, so
+  movements in the same second are peers of the window: they share the
+  level after all of them and are reported as one point
+
+Both come from one query on idx_inventory_txn_pair_created. Long ranges are
+bucketed. The database groups by day and returns each day's net, in/out
+and level range; days are then merged into n-day buckets so a series never
+exceeds `max_points`.
+
+History reaches back only as far as the live ledger. Months compacted by
+app.core.ledger_archive are not walked.
+"""
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.core.ledger_archive import live_from
+from app.models.models import Inventory, InventoryTransaction, Warehouse
+
+MOVEMENT = "movement"
+DAY = "day"
+AUTO = "auto"
+
+
+def _anchors(db: Session, product_id: str, warehouse_ids: Optional[List[str]]) -> Dict[str, dict]:
+    query = db.query(Inventory.warehouse_id, Warehouse.name, Inventory.quantity_on_hand).join(
+        Warehouse, Inventory.warehouse_id == Warehouse.id
+    ).filter(Inventory.product_id == product_id)
+    if warehouse_ids:
+        query = query.filter(Inventory.warehouse_id.in_(warehouse_ids))
+    anchors = {
+        warehouse_id: {"name": name, "level": quantity or 0}
+        for warehouse_id, name, quantity in query.order_by(Warehouse.name)
+    }
+    if anchors:
+        for warehouse_id, pending in db.query(
+            InventoryTransaction.warehouse_id, func.sum(InventoryTransaction.quantity)
+        ).filter(
+            InventoryTransaction.product_id == product_id,
+            InventoryTransaction.warehouse_id.in_(list(anchors)),
+            InventoryTransaction.stock_pending.is_(True)
+        ).group_by(InventoryTransaction.warehouse_id):
+            anchors[warehouse_id]["level"] += pending or 0
+    return anchors
+
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def as_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Aware datetimes in local time without tzinfo, like datetime.now() and the ledger."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def stock_timeline(
+    db: Session,
+    product_id: str,
+    start: datetime,
+    end: datetime,
+    warehouse_ids: Optional[List[str]] = None,
+    bucket: str = AUTO,
+    max_points: int = 500
+) -> dict:
+    """
+    Level series per warehouse between `start` and `end`.
+
+    `bucket` is "movement" (one point per transaction), "day" (daily,
+    merged into n-day buckets past `max_points`) or "auto" (movements when
+    every series fits in `max_points`, otherwise days).
+    """
+    start, end = as_local_naive(start), as_local_naive(end)
+    history_from = None
+    boundary = live_from(db)
+    if boundary is not None and start < boundary:
+        start = history_from = boundary
+
+    anchors = _anchors(db, product_id, warehouse_ids)
+    if not anchors:
+        return {"product_id": product_id, "start": start, "end": end, "bucket": MOVEMENT,
+                "history_from": history_from, "series": []}
+
+    scope = (
+        (InventoryTransaction.product_id == product_id)
+        & InventoryTransaction.warehouse_id.in_(list(anchors))
+        & (InventoryTransaction.created_at >= start)
+    )
+    if bucket == AUTO:
+        busiest = db.query(func.count(InventoryTransaction.id)).filter(
+            scope, InventoryTransaction.created_at <= end
+        ).group_by(InventoryTransaction.warehouse_id).order_by(func.count(InventoryTransaction.id).desc()).first()
+        bucket = DAY if busiest and busiest[0] > max_points else MOVEMENT
+
+    ledger = db.query(
+        InventoryTransaction.id,
+        InventoryTransaction.warehouse_id,
+        InventoryTransaction.created_at,
+        InventoryTransaction.transaction_type,
+        InventoryTransaction.quantity,
+        InventoryTransaction.reference_id,
+        func.sum(InventoryTransaction.quantity).over(
+            partition_by=InventoryTransaction.warehouse_id,
+            order_by=InventoryTransaction.created_at
+        ).label("running"),
+        func.sum(InventoryTransaction.quantity).over(
+            partition_by=InventoryTransaction.warehouse_id
+        ).label("total")
+    ).filter(scope).subquery()
+
+    series = {
+        warehouse_id: {
+            "warehouse_id": warehouse_id,
+            "warehouse_name": anchor["name"],
+            "opening_level": anchor["level"],  # Until a row says otherwise: nothing moved since start
+            "closing_level": anchor["level"],
+            "points": []
+        }
+        for warehouse_id, anchor in anchors.items()
+    }
+
+    if bucket == MOVEMENT:
+        for r in db.query(ledger).filter(ledger.c.created_at <= end).order_by(
+            ledger.c.warehouse_id, ledger.c.created_at, ledger.c.id
+        ):
+            s = series[r.warehouse_id]
+            opening = anchors[r.warehouse_id]["level"] - int(r.total)
+            s["opening_level"] = opening
+            s["closing_level"] = opening + int(r.running)
+            transaction_type = getattr(r.transaction_type, "value", r.transaction_type)
+            points = s["points"]
+            if points and points[-1]["at"] == r.created_at:
+                # Same second: one point, typed only if every movement agrees
+                point = points[-1]
+                point["quantity"] += r.quantity
+                point["movements"] += 1
+                if point["transaction_type"] != transaction_type:
+                    point["transaction_type"] = None
+                if point["reference_id"] != r.reference_id:
+                    point["reference_id"] = None
+                continue
+            points.append({
+                "at": r.created_at,
+                "level": s["closing_level"],
+                "quantity": r.quantity,
+                "transaction_type": transaction_type,
+                "reference_id": r.reference_id,
+                "movements": 1
+            })
+        label = MOVEMENT
+    else:
+        day = func.date(ledger.c.created_at)
+        days = db.query(
+            ledger.c.warehouse_id,
+            day.label("day"),
+            func.count().label("movements"),
+            func.sum(ledger.c.quantity).label("quantity"),
+            func.sum(case((ledger.c.quantity > 0, ledger.c.quantity), else_=0)).label("quantity_in"),
+            func.sum(case((ledger.c.quantity < 0, -ledger.c.quantity), else_=0)).label("quantity_out"),
+            func.min(ledger.c.running).label("min_running"),
+            func.max(ledger.c.running).label("max_running"),
+            func.max(ledger.c.total).label("total")
+        ).filter(ledger.c.created_at <= end).group_by(ledger.c.warehouse_id, day).order_by(
+            ledger.c.warehouse_id, day
+        ).all()
+
+        span = max((end.date() - start.date()).days + 1, 1)
+        width = max(1, math.ceil(span / max_points))
+        for r in days:
+            s = series[r.warehouse_id]
+            opening = anchors[r.warehouse_id]["level"] - int(r.total)
+            if not s["points"]:
+                s["opening_level"] = s["closing_level"] = opening
+            level_before = s["closing_level"]
+            s["closing_level"] = level_before + int(r.quantity)
+            bucket_start = start.date() + timedelta(days=(_as_date(r.day) - start.date()).days // width * width)
+            points = s["points"]
+            if points and points[-1]["at"].date() == bucket_start:
+                point = points[-1]
+            else:
+                point = {
+                    "at": datetime.combine(bucket_start, datetime.min.time()),
+                    "quantity": 0, "quantity_in": 0, "quantity_out": 0, "movements": 0,
+                    "min_level": None, "max_level": None
+                }
+                points.append(point)
+            point["level"] = s["closing_level"]
+            point["quantity"] += int(r.quantity)
+            point["quantity_in"] += int(r.quantity_in)
+            point["quantity_out"] += int(r.quantity_out)
+            point["movements"] += r.movements
+            low = min(opening + int(r.min_running), level_before)
+            high = max(opening + int(r.max_running), level_before)
+            point["min_level"] = low if point["min_level"] is None else min(point["min_level"], low)
+            point["max_level"] = high if point["max_level"] is None else max(point["max_level"], high)
+        label = f"{width}d"
+
+    # A warehouse with no movements in range may still have moved after `end`
+    quiet = [warehouse_id for warehouse_id, s in series.items() if not s["points"]]
+    if quiet:
+        for warehouse_id, moved in db.query(
+            InventoryTransaction.warehouse_id, func.sum(InventoryTransaction.quantity)
+        ).filter(
+            InventoryTransaction.product_id == product_id,
+            InventoryTransaction.warehouse_id.in_(quiet),
+            InventoryTransaction.created_at >= start
+        ).group_by(InventoryTransaction.warehouse_id):
+            level = anchors[warehouse_id]["level"] - int(moved or 0)
+            series[warehouse_id]["opening_level"] = series[warehouse_id]["closing_level"] = level
+
+    return {
+        "product_id": product_id,
+        "start": start,
+        "end": end,
+        "bucket": label,
+        "history_from": history_from,
+        "series": list(series.values())
+    }
@@ -0,0 +1,238 @@
+"""
+Multi-line stock transfers between two warehouses.
+
+A transfer document is applied in the caller's transaction. The inventory
+rows of every product on it, in both warehouses, are locked up front in
+one canonical (product_id, warehouse_id) order, so two transfers touching
+the same rows from opposite directions queue behind each other instead of
+deadlocking. Only stock that is not held (legacy quantity_reserved or
+reservation ledger holds) can leave the source. Quantities then move with one UPDATE per chunk of rows,
+missing destination rows and all transaction records are multi-row
+INSERTs, and warehouse stats get one update per warehouse. Cost layers
+still move line by line.
+"""
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import Session
+
+from app.core.costing import issue_stock, receive_stock
+from app.core.reservations import held_quantities
+from app.core.stock_adjustments import load_products
+from app.core.stock_coalescer import stock_coalescer
+from app.core.warehouse_stats import record_stock_changes
+from app.models.models import (
+    Inventory, InventoryTransaction, StockTransfer, StockTransferLine, TransactionType, Warehouse, generate_uuid
+)
+
+LOOKUP_CHUNK = 1000
+
+# Shape expected by transfer_stock
+TransferLine = namedtuple("TransferLine", "product_id sku quantity")
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _move(db: Session, deltas: Dict[str, int], user_id: Optional[str]) -> None:
+    """Add signed deltas to inventory rows by id, one UPDATE per chunk."""
+    ids = sorted(deltas)
+    for chunk in _chunks(ids):
+        db.execute(
+            update(Inventory)
+            .where(Inventory.id.in_(chunk))
+            .values(
+                quantity_on_hand=Inventory.quantity_on_hand + case(
+                    {row_id: deltas[row_id] for row_id in chunk}, value=Inventory.id
+                ),
+                updated_by=user_id
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def transfer_stock(
+    db: Session,
+    from_warehouse_id: str,
+    to_warehouse_id: str,
+    lines: Sequence,
+    user_id: Optional[str],
+    notes: Optional[str] = None
+) -> Tuple[Optional[StockTransfer], List[dict]]:
+    """
+    Validate and apply a transfer document; the caller commits.
+
+    Each line has product_id or sku and a positive quantity; lines for the
+    same product are merged. The transfer is all or nothing.
+
+    Returns:
+        (transfer, []) when applied, or (None, errors) with one error dict
+        per invalid line
+    """
+    errors: List[dict] = []
+    if from_warehouse_id == to_warehouse_id:
+        return None, [{"line": None, "error": "Cannot transfer to the same warehouse"}]
+    found = {w for (w,) in db.query(Warehouse.id).filter(Warehouse.id.in_([from_warehouse_id, to_warehouse_id]))}
+    for warehouse_id in (from_warehouse_id, to_warehouse_id):
+        if warehouse_id not in found:
+            errors.append({"line": None, "error": f"Warehouse {warehouse_id} not found"})
+
+    products = load_products(db, lines)
+    quantities: Dict[str, int] = {}
+    by_id = {}
+    for i, line in enumerate(lines):
+        product = products.get(line.product_id or line.sku)
+        if product is None:
+            errors.append({"line": i, "product_id": line.product_id, "sku": line.sku, "error": "Product not found"})
+        elif line.quantity <= 0:
+            errors.append({"line": i, "product_id": product.id, "sku": product.sku, "error": "Quantity must be positive"})
+        else:
+            quantities[product.id] = quantities.get(product.id, 0) + line.quantity
+            by_id[product.id] = product
+    if errors:
+        return None, errors
+
+    # Take unflushed coalesced sales off on hand, then lock both sides of
+    # every product in canonical order
+    product_ids = sorted(quantities)
+    stock_coalescer.apply_pending(db, [
+        (product_id, warehouse_id) for product_id in product_ids for warehouse_id in (from_warehouse_id, to_warehouse_id)
+    ])
+    rows: Dict[Tuple[str, str], tuple] = {}
+    for chunk in _chunks(product_ids):
+        for row in db.query(
+            Inventory.id, Inventory.product_id, Inventory.warehouse_id, Inventory.quantity_on_hand, Inventory.quantity_reserved
+        ).filter(
+            Inventory.product_id.in_(chunk),
+            Inventory.warehouse_id.in_([from_warehouse_id, to_warehouse_id])
+        ).order_by(Inventory.product_id, Inventory.warehouse_id).with_for_update():
+            rows[(row.product_id, row.warehouse_id)] = row
+
+    # Stock held for orders and carts stays where it is
+    held = held_quantities((product_id, from_warehouse_id) for product_id in product_ids)
+    for product_id in product_ids:
+        source = rows.get((product_id, from_warehouse_id))
+        available = (
+            (source.quantity_on_hand or 0) - (source.quantity_reserved or 0) - held.get((product_id, from_warehouse_id), 0)
+            if source else 0
+        )
+        if available < quantities[product_id]:
+            errors.append({
+                "line": None,
+                "product_id": product_id,
+                "sku": by_id[product_id].sku,
+                "error": f"Insufficient stock: {max(available, 0)} available, transfer {quantities[product_id]}"
+            })
+    if errors:
+        return None, errors
+
+    transfer = StockTransfer(
+        id=generate_uuid(),
+        from_warehouse_id=from_warehouse_id,
+        to_warehouse_id=to_warehouse_id,
+        notes=notes,
+        created_by=user_id
+    )
+    db.add(transfer)
+
+    deltas: Dict[str, int] = {}
+    new_rows = []
+    stock_changes = []
+    for product_id in product_ids:
+        quantity = quantities[product_id]
+        source = rows[(product_id, from_warehouse_id)]
+        dest = rows.get((product_id, to_warehouse_id))
+        deltas[source.id] = -quantity
+        stock_changes.append((from_warehouse_id, by_id[product_id], source.quantity_on_hand, source.quantity_on_hand - quantity))
+        if dest is None:
+            new_rows.append({
+                "id": generate_uuid(),
+                "product_id": product_id,
+                "warehouse_id": to_warehouse_id,
+                "quantity_on_hand": quantity,
+                "quantity_reserved": 0,
+                "updated_by": user_id
+            })
+            stock_changes.append((to_warehouse_id, by_id[product_id], None, quantity))
+        else:
+            deltas[dest.id] = quantity
+            stock_changes.append((to_warehouse_id, by_id[product_id], dest.quantity_on_hand, (dest.quantity_on_hand or 0) + quantity))
+    _move(db, deltas, user_id)
+    for chunk in _chunks(new_rows):
+        db.execute(insert(Inventory), chunk)
+
+    transactions = []
+    inbound_ids = {}
+    for product_id in product_ids:
+        inbound_ids[product_id] = generate_uuid()
+        transactions.append({
+            "id": generate_uuid(),
+            "product_id": product_id,
+            "warehouse_id": from_warehouse_id,
+            "transaction_type": TransactionType.TRANSFER,
+            "quantity": -quantities[product_id],
+            "reference_id": transfer.id,
+            "notes": f"Transfer to warehouse {to_warehouse_id}. {notes or ''}",
+            "created_by": user_id
+        })
+        transactions.append({
+            "id": inbound_ids[product_id],
+            "product_id": product_id,
+            "warehouse_id": to_warehouse_id,
+            "transaction_type": TransactionType.TRANSFER,
+            "quantity": quantities[product_id],
+            "reference_id": transfer.id,
+            "notes": f"Transfer from warehouse {from_warehouse_id}. {notes or ''}",
+            "created_by": user_id
+        })
+    db.flush()
+    for chunk in _chunks(transactions):
+        db.execute(insert(InventoryTransaction), chunk)
+
+    # Move cost layers: the destination receives at the source's issue cost
+    transfer_lines = []
+    total_value = 0.0
+    for product_id in product_ids:
+        quantity = quantities[product_id]
+        product = by_id[product_id]
+        source = rows[(product_id, from_warehouse_id)]
+        dest = rows.get((product_id, to_warehouse_id))
+        cost = issue_stock(db, product, from_warehouse_id, quantity, source.quantity_on_hand, is_cogs=False)
+        receive_stock(
+            db, product, to_warehouse_id, quantity,
+            unit_cost=cost / quantity,
+            on_hand_before=(dest.quantity_on_hand or 0) if dest else 0,
+            transaction_id=inbound_ids[product_id]
+        )
+        total_value += cost
+        transfer_lines.append({
+            "id": generate_uuid(),
+            "transfer_id": transfer.id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "unit_cost": cost / quantity
+        })
+    for chunk in _chunks(transfer_lines):
+        db.execute(insert(StockTransferLine), chunk)
+
+    record_stock_changes(db, stock_changes)
+
+    transfer.line_count = len(transfer_lines)
+    transfer.total_units = sum(quantities.values())
+    transfer.total_value = total_value
+
+    return transfer, []
+
+
+def transfer_changes(db: Session, transfer: StockTransfer) -> List[tuple]:
+    """(product_id, warehouse_id, delta, on_hand) per side of each line, for change events."""
+    changes = []
+    for product_id, quantity in db.query(StockTransferLine.product_id, StockTransferLine.quantity).filter(
+        StockTransferLine.transfer_id == transfer.id
+    ):
+        changes.append((product_id, transfer.from_warehouse_id, -quantity, None))
+        changes.append((product_id, transfer.to_warehouse_id, quantity, None))
+    return changes
@@ -0,0 +1,196 @@
+"""
+Per-warehouse stock statistics read model.
+
+warehouse_stats holds, per warehouse, the number of SKUs with an inventory
+row, total units, stock value at cost price and the number of SKUs at or
+below their reorder point. Writers apply deltas in the same transaction as
+the inventory or product change, so the valuation report and warehouse
+summaries read one row per warehouse. reconcile_warehouse_stats() rebuilds
+the table from inventory and reports any drift.
+
+Deltas are summed per warehouse on the session and written just before it
+commits, as one `UPDATE ... SET col = col + :delta` per warehouse in
+warehouse id order. A stats row is therefore only locked for the commit
+itself, not for the whole fulfilment or transfer, and concurrent writers
+never lock two warehouses in opposite order. Warehouses get their row when
+they are created; a warehouse without one (created before the table, or
+outside the API) gets it inserted on its first movement.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, event, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.models import Inventory, Product, Warehouse, WarehouseStats
+
+STAT_FIELDS = ("sku_count", "total_units", "total_value", "low_stock_count")
+PENDING_KEY = "warehouse_stats"  # session.info entry holding unwritten deltas
+
+
+def _contribution(quantity: Optional[int], cost_price: Optional[float], reorder_point: Optional[int]) -> Dict[str, float]:
+    quantity = quantity or 0
+    return {
+        "sku_count": 1,
+        "total_units": quantity,
+        "total_value": quantity * (cost_price or 0.0),
+        "low_stock_count": 1 if quantity <= (reorder_point or 0) else 0,
+    }
+
+
+def _apply(db: Session, warehouse_id: str, delta: Dict[str, float]) -> None:
+    if not any(delta.values()):
+        return
+    pending = db.info.setdefault(PENDING_KEY, {})
+    totals = pending.setdefault(warehouse_id, dict.fromkeys(STAT_FIELDS, 0))
+    for field, value in delta.items():
+        totals[field] += value
+
+
+def _increment(db: Session, warehouse_id: str, delta: Dict[str, float], now: datetime) -> bool:
+    result = db.execute(
+        update(WarehouseStats)
+        .where(WarehouseStats.warehouse_id == warehouse_id)
+        .values(
+            updated_at=now,
+            **{field: func.coalesce(getattr(WarehouseStats, field), 0) + value for field, value in delta.items()}
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _write_pending(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    session.flush()
+    now = datetime.utcnow()
+    for warehouse_id in sorted(pending):
+        delta = pending[warehouse_id]
+        if not any(delta.values()) or _increment(session, warehouse_id, delta, now):
+            continue
+        try:
+            with session.begin_nested():
+                session.execute(insert(WarehouseStats).values(warehouse_id=warehouse_id, updated_at=now, **delta))
+        except IntegrityError:
+            # Another transaction inserted the row first
+            _increment(session, warehouse_id, delta, now)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def record_stock_change(
+    db: Session,
+    warehouse_id: str,
+    product: Product,
+    quantity_before: Optional[int],
+    quantity_after: int
+) -> None:
+    """
+    Apply an on-hand change of one inventory row.
+
+    Pass quantity_before=None when the inventory row is new.
+    """
+    after = _contribution(quantity_after, product.cost_price, product.reorder_point)
+    if quantity_before is None:
+        delta = after
+    else:
+        before = _contribution(quantity_before, product.cost_price, product.reorder_point)
+        delta = {field: after[field] - before[field] for field in STAT_FIELDS}
+    _apply(db, warehouse_id, delta)
+
+
+def record_stock_changes(
+    db: Session,
+    changes: Iterable[Tuple[str, Product, Optional[int], int]]
+) -> None:
+    """
+    Apply many inventory row changes, one stats update per warehouse.
+
+    Each change is (warehouse_id, product, quantity_before, quantity_after)
+    as for record_stock_change.
+    """
+    deltas: Dict[str, Dict[str, float]] = {}
+    for warehouse_id, product, quantity_before, quantity_after in changes:
+        delta = deltas.setdefault(warehouse_id, dict.fromkeys(STAT_FIELDS, 0))
+        after = _contribution(quantity_after, product.cost_price, product.reorder_point)
+        before = (
+            dict.fromkeys(STAT_FIELDS, 0) if quantity_before is None
+            else _contribution(quantity_before, product.cost_price, product.reorder_point)
+        )
+        for field in STAT_FIELDS:
+            delta[field] += after[field] - before[field]
+    for warehouse_id, delta in deltas.items():
+        _apply(db, warehouse_id, delta)
+
+
+def record_product_change(
+    db: Session,
+    product: Product,
+    old_cost_price: Optional[float],
+    old_reorder_point: Optional[int]
+) -> None:
+    """Revalue a product's stock in every warehouse after a cost or reorder point change."""
+    if old_cost_price == product.cost_price and old_reorder_point == product.reorder_point:
+        return
+    for inv in db.query(Inventory.warehouse_id, Inventory.quantity_on_hand).filter(
+        Inventory.product_id == product.id
+    ).all():
+        before = _contribution(inv.quantity_on_hand, old_cost_price, old_reorder_point)
+        after = _contribution(inv.quantity_on_hand, product.cost_price, product.reorder_point)
+        _apply(db, inv.warehouse_id, {field: after[field] - before[field] for field in STAT_FIELDS})
+
+
+def reconcile_warehouse_stats(db: Session) -> int:
+    """
+    Rebuild warehouse_stats from inventory.
+
+    Returns:
+        Number of warehouses whose stored stats had drifted
+    """
+    actual = {
+        r.warehouse_id: {
+            "sku_count": int(r.sku_count or 0),
+            "total_units": int(r.total_units or 0),
+            "total_value": float(r.total_value or 0),
+            "low_stock_count": int(r.low_stock_count or 0),
+        }
+        for r in db.query(
+            Inventory.warehouse_id,
+            func.count(Inventory.id).label("sku_count"),
+            func.sum(Inventory.quantity_on_hand).label("total_units"),
+            func.sum(Inventory.quantity_on_hand * func.coalesce(Product.cost_price, 0.0)).label("total_value"),
+            func.sum(case((Inventory.quantity_on_hand <= func.coalesce(Product.reorder_point, 0), 1), else_=0)).label("low_stock_count")
+        ).join(
+            Product, Inventory.product_id == Product.id
+        ).group_by(Inventory.warehouse_id).all()
+    }
+
+    stored = {
+        s.warehouse_id: s
+        for s in db.query(WarehouseStats).with_for_update().all()
+    }
+    now = datetime.utcnow()
+    drifted = 0
+    for (warehouse_id,) in db.query(Warehouse.id).all():
+        values = actual.get(warehouse_id, dict.fromkeys(STAT_FIELDS, 0))
+        stats = stored.get(warehouse_id)
+        if stats is None:
+            stats = WarehouseStats(warehouse_id=warehouse_id)
+            db.add(stats)
+        if any(abs((getattr(stats, field) or 0) - values[field]) > 0.005 for field in STAT_FIELDS):
+            drifted += 1
+        for field in STAT_FIELDS:
+            setattr(stats, field, values[field])
+        stats.updated_at = now
+        stats.reconciled_at = now
+    db.commit()
+
+    return drifted
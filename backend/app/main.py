@@ -2,15 +2,20 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
 import os
 import logging
 
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.core.db_retry import is_retryable
+from app.core.report_guard import is_statement_timeout
 # Import routers
 from app.api.routes import (
     auth, products, inventory, sales, customers,
-    reports, alerts, warehouses, audit, invoices
+    reports, alerts, warehouses, audit, invoices, forecasting, analytics, cycle_counts,
+    stock_transfers, reservations, events
 )
 
 # Configure logging
@@ -32,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
 # Create upload directory if it doesn't exist
@@ -43,6 +49,24 @@ if os.path.exists(settings.UPLOAD_DIR):
 
 
 # Exception handlers
+@app.exception_handler(OperationalError)
+async def operational_error_handler(request: Request, exc: OperationalError):
+    if is_statement_timeout(exc):
+        logger.warning(f"Statement timeout on {request.url.path}")
+        return JSONResponse(
+            status_code=504,
+            content={"detail": "Report exceeded its time limit; narrow the date range or filters"}
+        )
+    if is_retryable(exc):
+        logger.warning(f"Lock conflict persisted on {request.url.path}: {exc.orig}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Stock is busy; retry shortly"},
+            headers={"Retry-After": str(settings.DB_RETRY_AFTER_SECONDS)}
+        )
+    return await global_exception_handler(request, exc)
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {str(exc)}", exc_info=True)
@@ -60,6 +84,27 @@ async def startup_event():
     # In production, use Alembic migrations
     if settings.DEBUG:
         Base.metadata.create_all(bind=engine)
+    if settings.RESERVATION_STORE == "memory" and settings.WEB_CONCURRENCY > 1:
+        raise RuntimeError(
+            f"RESERVATION_STORE=memory keeps stock holds per process and cannot be shared by "
+            f"{settings.WEB_CONCURRENCY} workers; set RESERVATION_STORE=redis"
+        )
+    from app.core.database import SessionLocal
+    from app.core.reservations import restore_order_holds
+    db = SessionLocal()
+    try:
+        if settings.STOCK_COALESCING:
+            # Apply issues a previous process admitted but never flushed
+            from app.core.stock_coalescer import stock_coalescer
+            applied = stock_coalescer.flush(db)
+            if applied:
+                logger.info(f"Applied {applied} pending stock issues")
+        # Order holds do not survive a restart of the memory store
+        restored = restore_order_holds(db)
+        if restored:
+            logger.info(f"Restored stock holds of {restored} open sales orders")
+    finally:
+        db.close()
     logger.info("Application started successfully")
 
 
@@ -67,6 +112,10 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application...")
+    from app.core.analytics_store import analytics_store
+    if analytics_store.enabled:
+        # A DuckDB sync killed mid-write aborts the process on exit
+        await run_in_threadpool(analytics_store.stop)
 
 
 # Health check endpoint
@@ -86,6 +135,12 @@ app.include_router(alerts.router, prefix=f"{settings.API_PREFIX}/alerts", tags=[
 app.include_router(warehouses.router, prefix=f"{settings.API_PREFIX}/warehouses", tags=["Warehouses"])
 app.include_router(invoices.router, prefix=f"{settings.API_PREFIX}/invoices", tags=["Invoices"])
 app.include_router(audit.router, prefix=f"{settings.API_PREFIX}/audit", tags=["Audit"])
+app.include_router(forecasting.router, prefix=f"{settings.API_PREFIX}/forecasting", tags=["Forecasting"])
+app.include_router(analytics.router, prefix=f"{settings.API_PREFIX}/analytics", tags=["Analytics"])
+app.include_router(cycle_counts.router, prefix=f"{settings.API_PREFIX}/cycle-counts", tags=["Cycle Counts"])
+app.include_router(stock_transfers.router, prefix=f"{settings.API_PREFIX}/stock-transfers", tags=["Stock Transfers"])
+app.include_router(reservations.router, prefix=f"{settings.API_PREFIX}/reservations", tags=["Reservations"])
+app.include_router(events.router, prefix=f"{settings.API_PREFIX}/events", tags=["Events"])
 
 
 # Root endpoint
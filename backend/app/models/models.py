@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, Enum, ForeignKey, Index
+from sqlalchemy import Column, String, Integer, Float, Boolean, Date, DateTime, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -61,6 +61,12 @@ class AlertStatus(str, enum.Enum):
     RESOLVED = "resolved"
 
 
+class CycleCountStatus(str, enum.Enum):
+    OPEN = "open"
+    CLOSED = "closed"
+    CANCELLED = "cancelled"
+
+
 # Models
 class User(Base):
     __tablename__ = "users"
@@ -225,12 +231,323 @@ class InventoryTransaction(Base):
     quantity = Column(Integer, nullable=False)
     reference_id = Column(String(36), nullable=True)
     notes = Column(Text, nullable=True)
+    # Sale admitted by the stock coalescer and not yet applied to inventory
+    stock_pending = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
     
     # Relationships
     product = relationship("Product", back_populates="inventory_transactions")
     warehouse = relationship("Warehouse", back_populates="inventory_transactions")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_inventory_txn_pending', 'stock_pending'),
+        Index('idx_inventory_txn_created', 'created_at'),
+        Index('idx_inventory_txn_pair_created', 'product_id', 'warehouse_id', 'created_at'),
+    )
+
+
+class CostLayer(Base):
+    __tablename__ = "cost_layers"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    sequence = Column(Integer, nullable=False)  # Receipt order within (product, warehouse)
+    transaction_id = Column(String(36), ForeignKey("inventory_transactions.id"), nullable=True)
+    quantity_received = Column(Integer, nullable=False)
+    quantity_remaining = Column(Integer, nullable=False)
+    unit_cost = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_cost_layer_fifo', 'product_id', 'warehouse_id', 'sequence', unique=True),
+    )
+
+
+class StockValuation(Base):
+    __tablename__ = "stock_valuations"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    quantity = Column(Integer, default=0)
+    total_value = Column(Float, default=0.0)
+    quantity_issued = Column(Integer, default=0)
+    cogs_total = Column(Float, default=0.0)  # Cumulative cost of goods issued
+    last_layer_sequence = Column(Integer, default=0)
+    fifo_head_sequence = Column(Integer, default=1)  # Oldest layer that may still be open
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    product = relationship("Product")
+    warehouse = relationship("Warehouse")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_valuation_product_warehouse', 'product_id', 'warehouse_id', unique=True),
+    )
+    
+    @property
+    def average_cost(self) -> float:
+        return self.total_value / self.quantity if self.quantity else 0.0
+
+
+class ReorderSuggestion(Base):
+    __tablename__ = "reorder_suggestions"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    daily_demand = Column(Float, default=0.0)  # Exponentially smoothed units/day
+    moving_average = Column(Float, default=0.0)
+    demand_std = Column(Float, default=0.0)
+    quantity_on_hand = Column(Integer, default=0)
+    suggested_reorder_point = Column(Integer, default=0)
+    suggested_reorder_quantity = Column(Integer, default=0)
+    days_of_cover = Column(Float, nullable=True)  # NULL when there is no demand
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_reorder_product_warehouse', 'product_id', 'warehouse_id', unique=True),
+        Index('idx_reorder_warehouse_cover', 'warehouse_id', 'days_of_cover'),
+    )
+
+
+class InventoryAnalytics(Base):
+    __tablename__ = "inventory_analytics"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    period_days = Column(Integer, nullable=False)
+    revenue = Column(Float, default=0.0)
+    revenue_share = Column(Float, default=0.0)  # Share of warehouse revenue
+    units_sold = Column(Integer, default=0)
+    abc_class = Column(String(1), nullable=False)
+    xyz_class = Column(String(1), nullable=False)
+    demand_cv = Column(Float, nullable=True)  # Coefficient of variation of daily demand
+    quantity_on_hand = Column(Integer, default=0)
+    average_stock = Column(Float, default=0.0)
+    turnover = Column(Float, nullable=True)  # Annualized units sold / average stock
+    last_sale_at = Column(DateTime(timezone=True), nullable=True)
+    days_since_last_sale = Column(Integer, nullable=True)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_analytics_product_warehouse', 'product_id', 'warehouse_id', unique=True),
+        Index('idx_analytics_class', 'warehouse_id', 'abc_class', 'xyz_class'),
+        Index('idx_analytics_last_sale', 'days_since_last_sale'),
+    )
+
+
+class GstMonthlySummary(Base):
+    __tablename__ = "gst_monthly_summaries"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    period = Column(String(7), nullable=False)  # YYYY-MM
+    hsn_sac = Column(String(50), nullable=False)
+    tax_rate = Column(Float, nullable=False)
+    supply_type = Column(String(10), nullable=False)  # intra | inter
+    quantity = Column(Integer, default=0)
+    taxable_value = Column(Float, default=0.0)
+    igst = Column(Float, default=0.0)
+    cgst = Column(Float, default=0.0)
+    sgst = Column(Float, default=0.0)
+    total_value = Column(Float, default=0.0)
+    line_count = Column(Integer, default=0)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_gst_summary_key', 'period', 'hsn_sac', 'tax_rate', 'supply_type', unique=True),
+    )
+
+
+class GstClosedPeriod(Base):
+    __tablename__ = "gst_closed_periods"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    period = Column(String(7), unique=True, nullable=False)  # YYYY-MM
+    line_count = Column(Integer, default=0)
+    taxable_value = Column(Float, default=0.0)
+    tax_total = Column(Float, default=0.0)
+    closed_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+
+
+class ProductSalesDaily(Base):
+    __tablename__ = "product_sales_daily"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    revenue = Column(Float, default=0.0)
+    quantity = Column(Integer, default=0)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_sales_daily_key', 'product_id', 'warehouse_id', 'day', unique=True),
+        Index('idx_sales_daily_day', 'day'),
+    )
+
+
+class ProductLeaderboard(Base):
+    __tablename__ = "product_leaderboards"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    scope = Column(String(36), nullable=False)  # Warehouse ID
+    window_days = Column(Integer, nullable=False)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    revenue = Column(Float, default=0.0)
+    quantity = Column(Integer, default=0)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_leaderboard_key', 'scope', 'window_days', 'product_id', unique=True),
+        Index('idx_leaderboard_revenue', 'scope', 'window_days', 'revenue'),
+        Index('idx_leaderboard_quantity', 'scope', 'window_days', 'quantity'),
+    )
+
+
+class LeaderboardWindow(Base):
+    __tablename__ = "leaderboard_windows"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    window_days = Column(Integer, unique=True, nullable=False)
+    expired_through = Column(Date, nullable=False)  # Daily buckets up to this day are out of the window
+
+
+class WarehouseStats(Base):
+    __tablename__ = "warehouse_stats"
+    
+    # Maintained incrementally by app.core.warehouse_stats
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), unique=True, nullable=False)
+    sku_count = Column(Integer, default=0)
+    total_units = Column(Integer, default=0)
+    total_value = Column(Float, default=0.0)  # Units at product cost price
+    low_stock_count = Column(Integer, default=0)  # SKUs at or below reorder point
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    reconciled_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class CycleCountSession(Base):
+    __tablename__ = "cycle_count_sessions"
+    
+    # Scans are buffered by app.core.cycle_counts until the session closes
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    status = Column(Enum(CycleCountStatus), nullable=False, default=CycleCountStatus.OPEN)
+    notes = Column(Text, nullable=True)
+    scan_count = Column(Integer, default=0)
+    line_count = Column(Integer, default=0)
+    variance_units = Column(Integer, default=0)  # Net counted minus expected
+    variance_value = Column(Float, default=0.0)  # At product cost price
+    unknown_codes = Column(Text, nullable=True)  # JSON list of codes that matched no product
+    opened_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+    opened_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    warehouse = relationship("Warehouse")
+    lines = relationship("CycleCountLine", back_populates="session")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_cycle_count_warehouse_status', 'warehouse_id', 'status'),
+    )
+
+
+class CycleCountLine(Base):
+    __tablename__ = "cycle_count_lines"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    session_id = Column(String(36), ForeignKey("cycle_count_sessions.id"), nullable=False, index=True)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    expected_quantity = Column(Integer, default=0)  # On hand when the session closed
+    counted_quantity = Column(Integer, default=0)
+    variance = Column(Integer, default=0)
+    unit_cost = Column(Float, default=0.0)
+    variance_value = Column(Float, default=0.0)
+    
+    # Relationships
+    session = relationship("CycleCountSession", back_populates="lines")
+    product = relationship("Product")
+
+
+class StockTransfer(Base):
+    __tablename__ = "stock_transfers"
+
+    # Its inventory transactions carry the transfer id as reference_id
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    from_warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    to_warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    notes = Column(Text, nullable=True)
+    line_count = Column(Integer, default=0)
+    total_units = Column(Integer, default=0)
+    total_value = Column(Float, default=0.0)  # Cost moved out of the source warehouse
+    created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    from_warehouse = relationship("Warehouse", foreign_keys=[from_warehouse_id])
+    to_warehouse = relationship("Warehouse", foreign_keys=[to_warehouse_id])
+    lines = relationship("StockTransferLine", back_populates="transfer")
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_stock_transfer_created', 'created_at'),
+    )
+
+
+class StockTransferLine(Base):
+    __tablename__ = "stock_transfer_lines"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    transfer_id = Column(String(36), ForeignKey("stock_transfers.id"), nullable=False, index=True)
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_cost = Column(Float, default=0.0)  # Issue cost at the source warehouse
+
+    # Relationships
+    transfer = relationship("StockTransfer", back_populates="lines")
+    product = relationship("Product")
+
+
+class InventoryMonthlySummary(Base):
+    __tablename__ = "inventory_monthly_summaries"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    period = Column(String(7), nullable=False)  # YYYY-MM
+    product_id = Column(String(36), ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
+    quantity_in = Column(Integer, default=0)
+    quantity_out = Column(Integer, default=0)
+    net_quantity = Column(Integer, default=0)
+    transaction_count = Column(Integer, default=0)
+    last_sale_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_inventory_summary_key', 'period', 'product_id', 'warehouse_id', unique=True),
+    )
+
+
+class InventoryTransactionArchive(Base):
+    __tablename__ = "inventory_transaction_archives"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    period = Column(String(7), nullable=False, index=True)  # YYYY-MM
+    file_name = Column(String(255), unique=True, nullable=False)  # Under TRANSACTION_ARCHIVE_DIR
+    row_count = Column(Integer, default=0)
+    sha256 = Column(String(64), nullable=False)  # Of the uncompressed JSON lines
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class Customer(Base):
@@ -251,6 +568,23 @@ class Customer(Base):
     sales_orders = relationship("SalesOrder", back_populates="customer")
 
 
+class CustomerReceivable(Base):
+    __tablename__ = "customer_receivables"
+    
+    # Open receivables per customer per due date; aging buckets are due date ranges
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    customer_id = Column(String(36), ForeignKey("customers.id"), nullable=False)
+    due_date = Column(Date, nullable=False)
+    amount = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_receivable_customer_due', 'customer_id', 'due_date', unique=True),
+        Index('idx_receivable_due', 'due_date'),
+    )
+
+
 class SalesOrder(Base):
     __tablename__ = "sales_orders"
     
@@ -264,11 +598,15 @@ class SalesOrder(Base):
     discount_amount = Column(Float, default=0.0)
     total_amount = Column(Float, default=0.0)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.UNPAID)
+    amount_paid = Column(Float, default=0.0)
     warehouse_id = Column(String(36), ForeignKey("warehouses.id"), nullable=False)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+    # Expiry of the order's hold in the reservation ledger; NULL for orders
+    # that reserved stock on inventory.quantity_reserved
+    reservation_expires_at = Column(DateTime(timezone=True), nullable=True)
     
     # Billing Address (Customer)
     billing_name = Column(String(255), nullable=True)
@@ -303,6 +641,11 @@ class SalesOrder(Base):
     warehouse = relationship("Warehouse", back_populates="sales_orders")
     creator = relationship("User", back_populates="sales_orders", foreign_keys=[created_by])
     items = relationship("SalesOrderItem", back_populates="sales_order", cascade="all, delete-orphan")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_sales_order_date_status', 'order_date', 'status'),
+    )
 
 
 class SalesOrderItem(Base):
@@ -317,11 +660,19 @@ class SalesOrderItem(Base):
     tax_rate = Column(Float, default=18.0)  # GST percentage for this item
     tax_amount = Column(Float, default=0.0)  # Calculated tax amount
     line_total = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=True)  # Cost snapshot at sale (cost layers on fulfilment)
+    unit_cost_inc_tax = Column(Float, nullable=True)  # Cost snapshot including GST
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     sales_order = relationship("SalesOrder", back_populates="items")
     product = relationship("Product", back_populates="sales_order_items")
+    
+    # Indexes
+    __table_args__ = (
+        # Covers profit reporting without touching products
+        Index('idx_order_item_profit', 'sales_order_id', 'product_id', 'quantity', 'unit_price', 'discount', 'unit_cost', 'unit_cost_inc_tax'),
+    )
 
 
 class PurchaseOrder(Base):
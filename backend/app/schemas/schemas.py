@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Optional, List, Dict
+from datetime import datetime, date
 from enum import Enum
 
 
@@ -44,6 +44,12 @@ class AlertStatusEnum(str, Enum):
     RESOLVED = "resolved"
 
 
+class CycleCountStatusEnum(str, Enum):
+    OPEN = "open"
+    CLOSED = "closed"
+    CANCELLED = "cancelled"
+
+
 # User Schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -201,13 +207,74 @@ class InventoryResponse(InventoryBase):
         from_attributes = True
 
 
+class InventoryProductTotals(BaseModel):
+    product_id: str
+    product_name: str
+    product_sku: str
+    product_cost_price: float
+    product_selling_price: float
+    reorder_point: Optional[int] = 0
+    warehouse_count: int
+    quantity_on_hand: int
+    quantity_reserved: int
+    last_updated_at: Optional[datetime] = None
+
+
 class InventoryAdjustment(BaseModel):
     product_id: str
     warehouse_id: str
     quantity: int
+    unit_cost: Optional[float] = None  # Cost of received units; defaults to product cost price
+    notes: Optional[str] = None
+
+
+class BulkAdjustmentLine(BaseModel):
+    product_id: Optional[str] = None
+    sku: Optional[str] = None  # Alternative to product_id for count sheets
+    warehouse_id: str
+    quantity: Optional[int] = None  # Signed delta
+    counted_quantity: Optional[int] = None  # Absolute count; the delta is derived
+    unit_cost: Optional[float] = None
     notes: Optional[str] = None
 
 
+class BulkInventoryAdjustment(BaseModel):
+    lines: List[BulkAdjustmentLine] = Field(..., min_length=1, max_length=10000)
+    notes: Optional[str] = None  # Default for lines without notes
+    atomic: bool = False  # Apply nothing if any line is invalid
+
+
+class StockTimelinePoint(BaseModel):
+    at: datetime  # Movement time, or bucket start
+    level: int  # On hand after the movement, or at the end of the bucket
+    quantity: int  # Net movement
+    transaction_type: Optional[str] = None  # Movements only
+    reference_id: Optional[str] = None
+    # Buckets only
+    min_level: Optional[int] = None
+    max_level: Optional[int] = None
+    quantity_in: Optional[int] = None
+    quantity_out: Optional[int] = None
+    movements: int = 1
+
+
+class StockTimelineSeries(BaseModel):
+    warehouse_id: str
+    warehouse_name: str
+    opening_level: int
+    closing_level: int
+    points: List[StockTimelinePoint]
+
+
+class StockTimeline(BaseModel):
+    product_id: str
+    start: datetime
+    end: datetime
+    bucket: str  # "movement" or "<n>d"
+    history_from: Optional[datetime] = None  # Set when start was before the live ledger
+    series: List[StockTimelineSeries]
+
+
 # Category Schemas
 class CategoryBase(BaseModel):
     name: str
@@ -256,6 +323,162 @@ class WarehouseResponse(WarehouseBase):
         from_attributes = True
 
 
+class WarehouseSummary(BaseModel):
+    warehouse_id: str
+    warehouse_name: str
+    location: Optional[str] = None
+    is_active: bool = True
+    sku_count: int = 0
+    total_units: int = 0
+    total_value: float = 0.0
+    low_stock_count: int = 0
+    updated_at: Optional[datetime] = None
+
+
+# Cycle Count Schemas
+class CycleCountCreate(BaseModel):
+    warehouse_id: str
+    notes: Optional[str] = None
+
+
+class CycleCountScan(BaseModel):
+    code: str = Field(..., min_length=1)  # Barcode or SKU
+    quantity: int = 1
+
+
+class CycleCountScanBatch(BaseModel):
+    scans: List[CycleCountScan] = Field(..., min_length=1, max_length=5000)
+
+
+class CycleCountClose(BaseModel):
+    zero_uncounted: bool = False  # Unscanned stock in the warehouse counts as zero
+    apply: bool = True  # Post the counts as stock adjustments
+
+
+class CycleCountLineResponse(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    product_sku: Optional[str] = None
+    expected_quantity: int
+    counted_quantity: int
+    variance: int
+    unit_cost: float
+    variance_value: float
+
+
+class CycleCountSessionResponse(BaseModel):
+    id: str
+    warehouse_id: str
+    status: CycleCountStatusEnum
+    notes: Optional[str] = None
+    scan_count: int = 0
+    line_count: int = 0
+    variance_units: int = 0
+    variance_value: float = 0.0
+    unknown_codes: List[str] = []
+    opened_by: Optional[str] = None
+    opened_at: Optional[datetime] = None
+    closed_by: Optional[str] = None
+    closed_at: Optional[datetime] = None
+
+
+class CycleCountSessionDetail(CycleCountSessionResponse):
+    tallies: Dict[str, int] = {}  # Live code tallies while open
+    lines: List[CycleCountLineResponse] = []
+
+
+# Stock Transfer Schemas
+class StockTransferLineCreate(BaseModel):
+    product_id: Optional[str] = None
+    sku: Optional[str] = None  # Alternative to product_id for pick lists
+    quantity: int = Field(..., gt=0)
+
+
+class StockTransferCreate(BaseModel):
+    from_warehouse_id: str
+    to_warehouse_id: str
+    lines: List[StockTransferLineCreate] = Field(..., min_length=1, max_length=10000)
+    notes: Optional[str] = None
+
+
+class StockTransferLineResponse(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    product_sku: Optional[str] = None
+    quantity: int
+    unit_cost: float
+
+
+class StockTransferResponse(BaseModel):
+    id: str
+    from_warehouse_id: str
+    to_warehouse_id: str
+    notes: Optional[str] = None
+    line_count: int
+    total_units: int
+    total_value: float
+    created_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class StockTransferDetail(StockTransferResponse):
+    lines: List[StockTransferLineResponse] = []
+
+
+# Reservation Schemas
+class ReservationLine(BaseModel):
+    product_id: str
+    quantity: int = Field(..., gt=0)
+
+
+class ReservationCreate(BaseModel):
+    owner: str = Field(..., min_length=1, max_length=100)  # e.g. "cart:<id>" or "checkout:<id>"
+    warehouse_id: str
+    lines: List[ReservationLine] = Field(..., min_length=1, max_length=1000)
+    ttl_seconds: Optional[int] = Field(None, gt=0, le=604800)  # Default RESERVATION_TTL_SECONDS
+
+
+class ReservationExtend(BaseModel):
+    ttl_seconds: Optional[int] = Field(None, gt=0, le=604800)
+
+
+class ReservationResponse(BaseModel):
+    owner: str
+    warehouse_id: str
+    expires_at: datetime
+    lines: Dict[str, int]  # Quantity held per product id
+
+
+class StockAvailability(BaseModel):
+    product_id: str
+    quantity_on_hand: int
+    quantity_reserved: int  # Legacy reservations plus active holds
+    available: int
+
+
+class AvailabilityLookup(BaseModel):
+    product_ids: List[str] = Field(default_factory=list, max_length=1000)
+    skus: List[str] = Field(default_factory=list, max_length=1000)
+    warehouse_id: Optional[str] = None  # All active warehouses when omitted
+
+
+class ProductAvailability(BaseModel):
+    product_id: str
+    sku: str
+    quantity_on_hand: int
+    quantity_reserved: int  # Legacy reservations plus active holds
+    available: int  # Never negative in any one warehouse
+
+
+class BulkAvailability(BaseModel):
+    warehouse_id: Optional[str] = None
+    items: List[ProductAvailability]
+    not_found: List[str]  # Requested ids and SKUs that match no product
+
+
 # Customer Schemas
 class CustomerBase(BaseModel):
     name: str
@@ -352,6 +575,7 @@ class SalesOrderCreate(BaseModel):
 class SalesOrderUpdate(BaseModel):
     status: Optional[OrderStatusEnum] = None
     payment_status: Optional[PaymentStatusEnum] = None
+    amount_paid: Optional[float] = Field(None, ge=0)
     notes: Optional[str] = None
 
 
@@ -369,6 +593,7 @@ class SalesOrderResponse(BaseModel):
     discount_amount: float
     total_amount: float
     payment_status: PaymentStatusEnum
+    amount_paid: Optional[float] = 0.0
     items: List[SalesOrderItemResponse] = []
 
     class Config:
@@ -419,7 +644,7 @@ class InventoryValueReport(BaseModel):
     warehouse_name: str
     total_products: int
     total_quantity: int
-    total_value: float
+    total_value: float  # At current product cost price, not cost layers
 
 
 class SalesSummaryReport(BaseModel):
@@ -429,6 +654,16 @@ class SalesSummaryReport(BaseModel):
     average_order_value: float
 
 
+class PivotQuery(BaseModel):
+    dimensions: List[str] = Field(default_factory=list, max_length=4)
+    measures: List[str] = Field(default_factory=lambda: ["revenue", "quantity", "orders"], min_length=1)
+    filters: Dict[str, List[str]] = Field(default_factory=dict)
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    sort_by: Optional[str] = None
+    limit: int = Field(1000, ge=1, le=10000)
+
+
 class ProductPerformance(BaseModel):
     product_id: str
     product_name: str
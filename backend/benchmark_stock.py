@@ -0,0 +1,148 @@
+"""
+Contention benchmark for sales order fulfilment on one hot SKU.
+
+Seeds a product with plenty of stock, creates a batch of single-line orders
+for it and fulfils them from concurrent threads through the real fulfil
+route, once on the locked path and once with write coalescing. Then it
+checks that every issue reached inventory and reports throughput and
+latency for both runs.
+
+Run it against a scratch PostgreSQL database (SQLite serialises writers, so
+it shows no contention):
+    DATABASE_URL=postgresql://... python benchmark_stock.py [orders] [threads]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.core.costing import get_stock_valuation
+from app.core.database import SessionLocal
+from app.core.stock_coalescer import stock_coalescer
+from app.core.warehouse_stats import record_stock_change
+from app.models.models import (
+    Customer, Inventory, InventoryTransaction, Product, SalesOrder, SalesOrderItem, User, UserRole, Warehouse,
+    generate_uuid
+)
+from app.api.routes.sales import fulfill_sales_order
+
+
+def seed(orders: int) -> dict:
+    db = SessionLocal()
+    tag = generate_uuid()[:8]
+    user = User(email=f"bench-{tag}@example.com", password_hash="-", full_name="Benchmark", role=UserRole.ADMIN)
+    warehouse = Warehouse(name=f"Benchmark {tag}")
+    customer = Customer(customer_number=f"BENCH-{tag}", name="Benchmark customer")
+    product = Product(sku=f"BENCH-{tag}", name="Benchmark SKU", cost_price=10.0, selling_price=15.0)
+    db.add_all([user, warehouse, customer, product])
+    db.flush()
+    db.add(Inventory(product_id=product.id, warehouse_id=warehouse.id, quantity_on_hand=orders * 4, quantity_reserved=0))
+    get_stock_valuation(db, product, warehouse.id, orders * 4)
+    record_stock_change(db, warehouse.id, product, None, orders * 4)
+
+    order_ids = {"locked": [], "coalesced": []}
+    for run in order_ids:
+        for i in range(orders):
+            order = SalesOrder(
+                order_number=f"BENCH-{tag}-{run[0]}{i:06d}",
+                customer_id=customer.id,
+                warehouse_id=warehouse.id,
+                total_amount=15.0,
+                reservation_expires_at=datetime.now() + timedelta(days=1)
+            )
+            db.add(order)
+            db.flush()
+            db.add(SalesOrderItem(
+                sales_order_id=order.id, product_id=product.id, quantity=1,
+                unit_price=15.0, line_total=15.0
+            ))
+            order_ids[run].append(order.id)
+    db.commit()
+    ids = {"user": user.id, "product": product.id, "warehouse": warehouse.id, "orders": order_ids}
+    db.close()
+    return ids
+
+
+def fulfil_all(order_ids: list, user_id: str, threads: int) -> list:
+    latencies = []
+    queue = list(order_ids)
+    lock = threading.Lock()
+
+    def worker():
+        db = SessionLocal()
+        user = db.query(User).filter(User.id == user_id).first()
+        loop = asyncio.new_event_loop()
+        while True:
+            with lock:
+                if not queue:
+                    break
+                order_id = queue.pop()
+            started = time.perf_counter()
+            try:
+                loop.run_until_complete(fulfill_sales_order(order_id, db, user))
+            except Exception as exc:
+                db.rollback()
+                print(f"  fulfil failed: {exc}")
+            latencies.append(time.perf_counter() - started)
+        loop.close()
+        db.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+def report(name: str, latencies: list, elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:>10}: {len(latencies) / elapsed:8.1f} fulfilments/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(f"Seeding {orders} orders per run on one SKU ({threads} threads)...")
+    ids = seed(orders)
+
+    settings.STOCK_COALESCING = False
+    started = time.perf_counter()
+    latencies = fulfil_all(ids["orders"]["locked"], ids["user"], threads)
+    report("locked", latencies, time.perf_counter() - started)
+
+    settings.STOCK_COALESCING = True
+    settings.COALESCE_HOT_PER_MINUTE = 1
+    started = time.perf_counter()
+    latencies = fulfil_all(ids["orders"]["coalesced"], ids["user"], threads)
+    report("coalesced", latencies, time.perf_counter() - started)
+
+    db = SessionLocal()
+    stock_coalescer.flush(db)
+    on_hand = db.query(Inventory.quantity_on_hand).filter(
+        Inventory.product_id == ids["product"], Inventory.warehouse_id == ids["warehouse"]
+    ).scalar()
+    pending = db.query(InventoryTransaction).filter(
+        InventoryTransaction.product_id == ids["product"], InventoryTransaction.stock_pending.is_(True)
+    ).count()
+    expected = orders * 4 - orders * 2
+    print(f"on hand {on_hand} (expected {expected}), pending issues {pending}")
+    print(f"coalescer: {stock_coalescer.stats()}")
+    db.close()
+    if on_hand != expected or pending:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Command line runner for scheduled batch jobs.
+
+Usage (e.g. from cron):
+    python jobs.py forecast
+    python jobs.py analytics
+    python jobs.py gst
+    python jobs.py receivables
+    python jobs.py leaderboards
+    python jobs.py leaderboards-roll
+    python jobs.py warehouse-stats
+    python jobs.py analytics-sync
+    python jobs.py reservations-sweep
+    python jobs.py stock-flush
+    python jobs.py ledger-compact
+"""
+import sys
+import os
+import time
+
+# Add current directory to path to import app modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+
+
+def forecast(db):
+    from app.core.forecasting import run_forecast
+    count = run_forecast(db)
+    return f"{count} reorder suggestions written"
+
+
+def analytics(db):
+    from app.core.analytics import run_inventory_analytics
+    count = run_inventory_analytics(db)
+    return f"{count} analytics rows written"
+
+
+def gst(db):
+    from app.core.gst import close_gst_periods
+    periods = close_gst_periods(db)
+    return f"{len(periods)} GST periods closed"
+
+
+def receivables(db):
+    from app.core.receivables import rebuild_receivables
+    count = rebuild_receivables(db)
+    return f"{count} receivable rows rebuilt"
+
+
+def leaderboards(db):
+    from app.core.leaderboards import rebuild_leaderboards
+    count = rebuild_leaderboards(db)
+    return f"{count} leaderboard rows rebuilt"
+
+
+def leaderboards_roll(db):
+    from app.core.leaderboards import roll_windows
+    if not roll_windows(db):
+        return "windows already current (or leaderboards not built)"
+    db.commit()
+    return "windows rolled to today"
+
+
+def warehouse_stats(db):
+    from app.core.warehouse_stats import reconcile_warehouse_stats
+    drifted = reconcile_warehouse_stats(db)
+    return f"warehouse stats reconciled ({drifted} warehouses had drifted)"
+
+
+def analytics_sync(db):
+    from app.core.analytics_store import analytics_store
+    if not analytics_store.enabled:
+        return "skipped (ANALYTICS_DUCKDB_PATH not set or duckdb not installed)"
+    copied = analytics_store.sync(db)
+    return ", ".join(f"{count} {table}" for table, count in copied.items())
+
+
+def reservations_sweep(db):
+    from app.core.config import settings
+    from app.core.reservations import sweep_expired
+    if settings.RESERVATION_STORE != "redis":
+        return "skipped (in-process reservations are swept by the API workers)"
+    total = 0
+    while True:
+        expired = sweep_expired()
+        total += expired
+        if expired < settings.RESERVATION_SWEEP_BATCH:
+            break
+    return f"{total} expired reservations released"
+
+
+def stock_flush(db):
+    from app.core.stock_coalescer import stock_coalescer
+    applied = stock_coalescer.flush(db)
+    return f"{applied} pending stock issues applied"
+
+
+def ledger_compact(db):
+    from app.core.ledger_archive import compact_transactions
+    compacted = compact_transactions(db)
+    if not compacted:
+        return "nothing to compact"
+    return ", ".join(f"{period}: {count} transactions archived" for period, count in compacted.items())
+
+
+JOBS = {
+    "forecast": forecast,
+    "analytics": analytics,
+    "gst": gst,
+    "receivables": receivables,
+    "leaderboards": leaderboards,
+    "leaderboards-roll": leaderboards_roll,
+    "warehouse-stats": warehouse_stats,
+    "analytics-sync": analytics_sync,
+    "reservations-sweep": reservations_sweep,
+    "stock-flush": stock_flush,
+    "ledger-compact": ledger_compact,
+}
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in JOBS:
+        print(f"Usage: python jobs.py [{'|'.join(JOBS)}]")
+        sys.exit(1)
+
+    name = sys.argv[1]
+    db = SessionLocal()
+    started = time.monotonic()
+    try:
+        result = JOBS[name](db)
+        print(f"{name}: {result} in {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        db.rollback()
+        print(f"{name} failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
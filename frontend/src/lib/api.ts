@@ -52,9 +52,22 @@ export const productsAPI = {
 export const inventoryAPI = {
   getAll: (params?: any) => apiClient.get('/inventory', { params }),
   adjust: (data: any) => apiClient.post('/inventory/adjust', data),
+  bulkAdjust: (data: any) => apiClient.post('/inventory/adjust/bulk', data),
   transfer: (data: any) => apiClient.post('/inventory/transfer', data),
   getTransactions: (params?: any) => apiClient.get('/inventory/transactions', { params }),
-  getProductInventory: (productId: string) => apiClient.get(`/inventory/product/${productId}/warehouses`)
+  getProductInventory: (productId: string) => apiClient.get(`/inventory/product/${productId}/warehouses`),
+  // Cached for a few seconds server-side; for display, not for accepting orders
+  getAvailability: (data: { product_ids?: string[]; skus?: string[]; warehouse_id?: string }) =>
+    apiClient.post('/inventory/availability', data),
+  getProductTimeline: (productId: string, params?: { start?: string; end?: string; warehouse_id?: string[]; bucket?: 'auto' | 'movement' | 'day'; max_points?: number }) =>
+    apiClient.get(`/inventory/product/${productId}/timeline`, { params, paramsSerializer: { indexes: null } }),
+  getStockMatrix: (params?: any) => apiClient.get('/inventory/matrix', { params })
+};
+
+export const stockTransfersAPI = {
+  getAll: (params?: any) => apiClient.get('/stock-transfers', { params }),
+  getById: (id: string) => apiClient.get(`/stock-transfers/${id}`),
+  create: (data: any) => apiClient.post('/stock-transfers', data)
 };
 
 export const salesAPI = {
@@ -81,10 +94,15 @@ export const alertsAPI = {
 };
 
 export const reportsAPI = {
+  dashboard: () => apiClient.get('/reports/dashboard'),
   inventoryValue: (params?: any) => apiClient.get('/reports/inventory-valuation', { params }),
   salesSummary: (startDate: string, endDate: string) => apiClient.get('/reports/sales-summary', { params: { start_date: startDate, end_date: endDate } }),
   productPerformance: (startDate: string, endDate: string) => apiClient.get('/reports/product-performance', { params: { start_date: startDate, end_date: endDate } }),
+  salesTimeseries: (params: { start_date?: string; end_date?: string; bucket?: string; split_by?: string; warehouse_id?: string }) =>
+    apiClient.get('/reports/sales-timeseries', { params }),
   lowStock: () => apiClient.get('/reports/low-stock-summary'),
+  receivablesAging: (params?: { as_of?: string; customer_id?: string; skip?: number; limit?: number }) =>
+    apiClient.get('/reports/receivables-aging', { params }),
   getGSTSummary: (startDate: string, endDate: string) =>
     apiClient.get('/reports/gst-summary', {
       params: { start_date: startDate, end_date: endDate }
@@ -99,6 +117,11 @@ export const reportsAPI = {
       params: { start_date: startDate, end_date: endDate, format: 'excel' },
       responseType: 'blob'
     }),
+  downloadGSTR1: (financialYear: string, format: 'json' | 'csv' = 'json') =>
+    apiClient.get('/reports/gstr1', {
+      params: { financial_year: financialYear, format },
+      responseType: 'blob'
+    }),
   getDetailedSalesReport: (startDate: string, endDate: string) =>
     apiClient.get('/reports/detailed-sales-report', {
       params: { start_date: startDate, end_date: endDate }
@@ -121,8 +144,55 @@ export const reportsAPI = {
 
 export const warehousesAPI = {
   getAll: (params?: any) => apiClient.get("/warehouses", { params }),
+  getSummary: () => apiClient.get("/warehouses/summary"),
   getById: (id: string) => apiClient.get(`/warehouses/${id}`),
   create: (data: any) => apiClient.post("/warehouses", data),
   update: (id: string, data: any) => apiClient.put(`/warehouses/${id}`, data),
   delete: (id: string) => apiClient.delete(`/warehouses/${id}`)
 };
+
+export const cycleCountsAPI = {
+  getAll: (params?: any) => apiClient.get('/cycle-counts', { params }),
+  getById: (id: string) => apiClient.get(`/cycle-counts/${id}`),
+  open: (data: { warehouse_id: string; notes?: string }) => apiClient.post('/cycle-counts', data),
+  addScans: (id: string, scans: { code: string; quantity?: number }[]) =>
+    apiClient.post(`/cycle-counts/${id}/scans`, { scans }),
+  close: (id: string, data?: { zero_uncounted?: boolean; apply?: boolean }) =>
+    apiClient.post(`/cycle-counts/${id}/close`, data || {}),
+  cancel: (id: string) => apiClient.post(`/cycle-counts/${id}/cancel`)
+};
+
+export const reservationsAPI = {
+  getAvailability: (warehouseId: string, productIds: string[]) =>
+    apiClient.get('/reservations/availability', {
+      params: { warehouse_id: warehouseId, product_id: productIds },
+      paramsSerializer: { indexes: null }
+    }),
+  get: (owner: string) => apiClient.get(`/reservations/${encodeURIComponent(owner)}`),
+  reserve: (data: { owner: string; warehouse_id: string; lines: { product_id: string; quantity: number }[]; ttl_seconds?: number }) =>
+    apiClient.post('/reservations', data),
+  extend: (owner: string, ttlSeconds?: number) =>
+    apiClient.post(`/reservations/${encodeURIComponent(owner)}/extend`, { ttl_seconds: ttlSeconds }),
+  release: (owner: string) => apiClient.delete(`/reservations/${encodeURIComponent(owner)}`)
+};
+
+export type ChangeEventType = 'stock' | 'order' | 'alert' | 'resync';
+
+export const eventsAPI = {
+  // EventSource cannot send headers, so the token goes in the query string.
+  // It reconnects by itself; refetch on 'open' and 'resync' to catch up.
+  subscribe: (
+    onEvent: (type: ChangeEventType, data: any) => void,
+    options: { types?: Exclude<ChangeEventType, 'resync'>[]; warehouseId?: string } = {}
+  ) => {
+    const params = new URLSearchParams({ token: localStorage.getItem('access_token') || '' });
+    if (options.types?.length) params.set('types', options.types.join(','));
+    if (options.warehouseId) params.set('warehouse_id', options.warehouseId);
+    const source = new EventSource(`${API_URL}/events/?${params}`);
+    (['stock', 'order', 'alert', 'resync'] as ChangeEventType[]).forEach((type) =>
+      source.addEventListener(type, (event) => onEvent(type, JSON.parse((event as MessageEvent).data)))
+    );
+    return source;
+  },
+  getStats: () => apiClient.get('/events/stats')
+};
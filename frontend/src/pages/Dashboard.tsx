@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { productsAPI, salesAPI, reportsAPI, alertsAPI } from '../lib/api';
+import { reportsAPI } from '../lib/api';
 
 const Dashboard: React.FC = () => {
   const navigate = useNavigate();
@@ -24,42 +24,21 @@ const Dashboard: React.FC = () => {
   const fetchDashboardData = async () => {
     setLoading(true);
     try {
-      // Fetch all dashboard data in parallel
-      const [
-        productsRes,
-        inventoryRes,
-        ordersRes,
-        salesRes,
-        lowStockRes,
-        performanceRes
-      ] = await Promise.all([
-        productsAPI.getAll(),
-        reportsAPI.inventoryValue(),
-        salesAPI.getAll({ limit: 5 }),
-        reportsAPI.salesSummary(getTodayDate(), getTodayDate()),
-        reportsAPI.lowStock(),
-        reportsAPI.productPerformance(getLastMonthDate(), getTodayDate())
-      ]);
-
-      // Calculate inventory value
-      const warehouses = inventoryRes.data || [];
-      const totalValue = warehouses.reduce((sum: number, wh: any) => sum + (wh.total_value || 0), 0);
-
-      // Count pending orders
-      const pending = ordersRes.data.filter((o: any) => o.order_status === 'confirmed' || o.order_status === 'pending').length;
+      // All widgets are computed server-side in a single request
+      const { data } = await reportsAPI.dashboard();
 
       setStats({
-        totalProducts: productsRes.data.length,
-        inventoryValue: totalValue,
-        todayOrders: salesRes.data.total_orders || 0,
-        todayRevenue: salesRes.data.total_revenue || 0,
-        lowStockCount: lowStockRes.data.products?.length || 0,
-        pendingOrders: pending
+        totalProducts: data.total_products || 0,
+        inventoryValue: data.inventory_value?.total_value || 0,
+        todayOrders: data.today_sales?.total_orders || 0,
+        todayRevenue: data.today_sales?.total_revenue || 0,
+        lowStockCount: data.low_stock?.total_low_stock_products || 0,
+        pendingOrders: data.pending_orders || 0
       });
 
-      setRecentOrders(ordersRes.data.slice(0, 5));
-      setLowStockProducts((lowStockRes.data.products || []).slice(0, 5));
-      setTopProducts(performanceRes.data.slice(0, 5));
+      setRecentOrders(data.recent_orders || []);
+      setLowStockProducts(data.low_stock?.products || []);
+      setTopProducts(data.top_products || []);
 
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
@@ -68,16 +47,6 @@ const Dashboard: React.FC = () => {
     }
   };
 
-  const getTodayDate = () => {
-    return new Date().toISOString().split('T')[0];
-  };
-
-  const getLastMonthDate = () => {
-    const date = new Date();
-    date.setMonth(date.getMonth() - 1);
-    return date.toISOString().split('T')[0];
-  };
-
   const getStatusBadge = (status: string) => {
     const colors: any = {
       pending: 'badge-warning',
@@ -14,8 +14,12 @@ interface InventoryItem {
   last_updated_at: string;
 }
 
+const INVENTORY_PAGE_SIZE = 100;
+
 const InventoryPage: React.FC = () => {
   const [inventory, setInventory] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [products, setProducts] = useState<any[]>([]);
   const [transactions, setTransactions] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
@@ -37,12 +41,13 @@ const InventoryPage: React.FC = () => {
     try {
       setLoading(true);
       const [invResponse, prodResponse, transResponse] = await Promise.all([
-        inventoryAPI.getAll(),
+        inventoryAPI.getAll({ limit: INVENTORY_PAGE_SIZE }),
         productsAPI.getAll(),
         inventoryAPI.getTransactions({ limit: 50 })
       ]);
 
       setInventory(invResponse.data);
+      setNextCursor(invResponse.headers['x-next-cursor'] || null);
       setProducts(prodResponse.data);
       setTransactions(transResponse.data);
     } catch (error) {
@@ -52,6 +57,20 @@ const InventoryPage: React.FC = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await inventoryAPI.getAll({ limit: INVENTORY_PAGE_SIZE, cursor: nextCursor });
+      setInventory(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Failed to load more inventory:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getProductName = (productId: string) => {
     const product = products.find(p => p.id === productId);
     return product ? `${product.name} (${product.sku})` : productId;
@@ -220,6 +239,13 @@ const InventoryPage: React.FC = () => {
               </tbody>
             </table>
           )}
+          {!loading && nextCursor && (
+            <div style={{ textAlign: 'center', padding: '1rem' }}>
+              <button className="btn btn-outline" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
@@ -1,23 +1,142 @@
-import React, { useState, useRef, useEffect } from 'react';
+import React, { useState, useRef, useEffect, useCallback } from 'react';
+import { cycleCountsAPI, warehousesAPI } from '../lib/api';
+
+// Scans are sent in batches so a fast scanner does not issue one request per code
+const FLUSH_INTERVAL_MS = 1000;
+const FLUSH_BATCH_SIZE = 200;
 
 const QuickScan: React.FC = () => {
   const [barcode, setBarcode] = useState('');
+  const [warehouses, setWarehouses] = useState<any[]>([]);
+  const [warehouseId, setWarehouseId] = useState('');
+  const [session, setSession] = useState<any | null>(null);
+  const [tallies, setTallies] = useState<Record<string, number>>({});
+  const [scanCount, setScanCount] = useState(0);
+  const [lastScan, setLastScan] = useState('');
+  const [zeroUncounted, setZeroUncounted] = useState(false);
+  const [result, setResult] = useState<any | null>(null);
+  const [busy, setBusy] = useState(false);
   const inputRef = useRef<HTMLInputElement>(null);
+  const pending = useRef<string[]>([]);
+  // Batches are sent one at a time; this is the last one queued
+  const inFlight = useRef<Promise<void>>(Promise.resolve());
 
   useEffect(() => {
     // Auto-focus the input when component mounts
     inputRef.current?.focus();
+    warehousesAPI.getAll().then(res => {
+      setWarehouses(res.data);
+      if (res.data.length > 0) setWarehouseId(res.data[0].id);
+    }).catch(error => console.error('Failed to fetch warehouses:', error));
   }, []);
 
+  useEffect(() => {
+    if (!warehouseId) return;
+    // Resume the warehouse's open session, if any
+    cycleCountsAPI.getAll({ warehouse_id: warehouseId, status_filter: 'open' }).then(async res => {
+      if (res.data.length > 0) {
+        const detail = await cycleCountsAPI.getById(res.data[0].id);
+        setSession(detail.data);
+        setTallies(detail.data.tallies || {});
+        setScanCount(detail.data.scan_count);
+      } else {
+        setSession(null);
+        setTallies({});
+        setScanCount(0);
+      }
+    }).catch(error => console.error('Failed to fetch cycle counts:', error));
+  }, [warehouseId]);
+
+  const flush = useCallback(() => {
+    inFlight.current = inFlight.current.then(async () => {
+      if (!session || pending.current.length === 0) return;
+      const codes = pending.current.splice(0, pending.current.length);
+      try {
+        const res = await cycleCountsAPI.addScans(session.id, codes.map(code => ({ code })));
+        setScanCount(res.data.scan_count);
+      } catch (error) {
+        console.error('Failed to send scans:', error);
+        pending.current.unshift(...codes);  // Retried on the next flush
+      }
+    });
+    return inFlight.current;
+  }, [session]);
+
+  useEffect(() => {
+    const timer = setInterval(flush, FLUSH_INTERVAL_MS);
+    return () => clearInterval(timer);
+  }, [flush]);
+
   const handleScan = (e: React.FormEvent) => {
     e.preventDefault();
-    if (barcode) {
-      alert('Scanned: ' + barcode);
+    const code = barcode.trim();
+    if (code) {
+      if (session) {
+        pending.current.push(code);
+        setTallies(prev => ({ ...prev, [code]: (prev[code] || 0) + 1 }));
+        if (pending.current.length >= FLUSH_BATCH_SIZE) flush();
+      }
+      setLastScan(code);
       setBarcode('');
       inputRef.current?.focus();
     }
   };
 
+  const handleOpen = async () => {
+    try {
+      setBusy(true);
+      const res = await cycleCountsAPI.open({ warehouse_id: warehouseId });
+      setSession(res.data);
+      setTallies({});
+      setScanCount(0);
+      setResult(null);
+      inputRef.current?.focus();
+    } catch (error: any) {
+      alert(error.response?.data?.detail || 'Failed to start cycle count');
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  const handleClose = async () => {
+    if (!session || !confirm('Close this count and adjust stock to the counted quantities?')) return;
+    try {
+      setBusy(true);
+      // Waits for a batch already on its way, then sends the rest
+      await flush();
+      if (pending.current.length > 0) {
+        alert('Some scans could not be sent yet; try closing again');
+        return;
+      }
+      const res = await cycleCountsAPI.close(session.id, { zero_uncounted: zeroUncounted });
+      setResult(res.data);
+      setSession(null);
+      setTallies({});
+    } catch (error: any) {
+      const detail = error.response?.data?.detail;
+      alert(detail?.message || detail || 'Failed to close cycle count');
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  const handleCancel = async () => {
+    if (!session || !confirm('Discard all scans in this count?')) return;
+    try {
+      setBusy(true);
+      pending.current = [];
+      await inFlight.current;
+      pending.current = [];  // Drop a failed batch the in-flight send put back
+      await cycleCountsAPI.cancel(session.id);
+      setSession(null);
+      setTallies({});
+    } catch (error: any) {
+      alert(error.response?.data?.detail || 'Failed to cancel cycle count');
+    } finally {
+      setBusy(false);
+    }
+  };
+
   return (
     <div>
       <h1 className="text-2xl font-bold mb-6">Quick Scan</h1>
@@ -26,6 +145,30 @@ const QuickScan: React.FC = () => {
           USB barcode scanners work via keyboard emulation. Simply focus the input below and scan!
         </p>
 
+        <div className="mb-4">
+          <label className="label">Warehouse</label>
+          <select
+            className="input"
+            value={warehouseId}
+            onChange={(e) => setWarehouseId(e.target.value)}
+            disabled={busy}
+          >
+            {warehouses.map(w => (
+              <option key={w.id} value={w.id}>{w.name}</option>
+            ))}
+          </select>
+        </div>
+
+        {session ? (
+          <div className="alert alert-info mb-4">
+            <strong>Cycle count in progress</strong> — {scanCount} scans recorded, {Object.keys(tallies).length} codes
+          </div>
+        ) : (
+          <button className="btn btn-primary mb-4" onClick={handleOpen} disabled={busy || !warehouseId}>
+            Start Cycle Count
+          </button>
+        )}
+
         <form onSubmit={handleScan}>
           <div className="mb-4">
             <label className="label">Scan or Enter Barcode</label>
@@ -47,10 +190,67 @@ const QuickScan: React.FC = () => {
           </div>
         </form>
 
-        {barcode && (
+        {lastScan && (
+          <div className="mt-4">
+            <div className="card-header">Last Scan</div>
+            <p>
+              <strong>{lastScan}</strong>
+              {session ? ` — counted ${tallies[lastScan] || 0}` : ' (start a cycle count to record scans)'}
+            </p>
+          </div>
+        )}
+
+        {session && (
+          <div className="mt-4">
+            <label style={{ display: 'flex', alignItems: 'center', gap: '0.5rem', marginBottom: '1rem' }}>
+              <input
+                type="checkbox"
+                checked={zeroUncounted}
+                onChange={(e) => setZeroUncounted(e.target.checked)}
+              />
+              Full count: set unscanned products in this warehouse to zero
+            </label>
+            <div className="flex gap-2">
+              <button className="btn btn-primary" onClick={handleClose} disabled={busy}>
+                Close &amp; Reconcile
+              </button>
+              <button className="btn btn-outline" onClick={handleCancel} disabled={busy}>
+                Cancel Count
+              </button>
+            </div>
+          </div>
+        )}
+
+        {result && (
           <div className="mt-4">
-            <div className="card-header">Product Info</div>
-            <p className="text-gray-500">Product details will appear here after scan</p>
+            <div className="card-header">Count Result</div>
+            <p>
+              {result.line_count} products counted, net variance {result.variance_units} units
+              (₹{Number(result.variance_value).toFixed(2)})
+            </p>
+            {result.unknown_codes.length > 0 && (
+              <p className="text-red-600">Unknown codes: {result.unknown_codes.join(', ')}</p>
+            )}
+            <table className="table">
+              <thead>
+                <tr>
+                  <th>Product</th>
+                  <th>Expected</th>
+                  <th>Counted</th>
+                  <th>Variance</th>
+                </tr>
+              </thead>
+              <tbody>
+                {result.lines.filter((line: any) => line.variance !== 0).map((line: any) => (
+                  <tr key={line.product_id}>
+                    <td>{line.product_name} ({line.product_sku})</td>
+                    <td>{line.expected_quantity}</td>
+                    <td>{line.counted_quantity}</td>
+                    <td className={line.variance < 0 ? 'text-red-600' : 'text-green-600'}>{line.variance}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
           </div>
         )}
       </div>